@@ -0,0 +1,135 @@
+# Class-wide analytics over marks.
+#
+# Everything is computed with GROUP BY aggregates or a single columnar fetch
+# into a NumPy array; no per-row ORM objects are built. Only the current term's
+# marks are read (app.terms). Results are cached per term and subject and
+# invalidated by mark_written(), which the mark write paths call.
+# With read replicas, results computed within REPLICA_STICKY_SECONDS of a write
+# are not cached, since the replica may not have replayed that write yet.
+import time
+from collections import defaultdict
+from typing import Optional
+import numpy as np
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import Session
+from .cache import LRUCache
+from .config import settings
+from .models import Mark, Student, Subject
+from .terms import current_term_id
+
+PASS_MARK = 40
+BREAKDOWN_COLUMNS = {
+    "division": Student.division_id,
+    "batch": Student.batch,
+    "elective": Student.elective,
+}
+
+analytics_cache = LRUCache(maxsize=512, ttl=settings.ANALYTICS_CACHE_TTL)
+# per-subject write versions; bumping one orphans that subject's cache entries
+_versions = defaultdict(int)
+_global_version = 0
+# monotonic time of the last write per subject (None: any subject)
+_written_at = {}
+_REPLICA_WINDOW = settings.REPLICA_STICKY_SECONDS if settings.DATABASE_REPLICA_URLS else 0
+
+
+def mark_written(subject_id: int) -> None:
+    global _global_version
+    _versions[subject_id] += 1
+    _global_version += 1
+    if _REPLICA_WINDOW:
+        _written_at[subject_id] = _written_at[None] = time.monotonic()
+
+def _cached(key: tuple, compute, subject_id: Optional[int] = None):
+    value = analytics_cache.get(key)
+    if value is None:
+        value = compute()
+        if not _REPLICA_WINDOW or time.monotonic() - _written_at.get(subject_id, float("-inf")) >= _REPLICA_WINDOW:
+            analytics_cache.set(key, value)
+    return value
+
+def _pass_count():
+    return func.sum(case((Mark.marks >= PASS_MARK, 1), else_=0))
+
+def _subject_summary(db: Session, term_id: int, subject_id: int, toppers: int) -> Optional[dict]:
+    subj = db.execute(select(Subject.id, Subject.code, Subject.name).where(Subject.id == subject_id)).first()
+    if subj is None:
+        return None
+    in_subject = (Mark.term_id == term_id, Mark.subject_id == subject_id)
+    marks = np.fromiter(db.scalars(select(Mark.marks).where(*in_subject)), dtype=np.int16)
+    grades = db.execute(
+        select(Mark.grade, func.count()).where(*in_subject).group_by(Mark.grade)
+    ).all()
+    top = db.execute(
+        select(Student.id.label("student_id"), Student.roll_no, Student.name, Mark.marks, Mark.grade)
+        .join(Mark, Mark.student_id == Student.id)
+        .where(*in_subject)
+        .order_by(Mark.marks.desc(), Student.id)
+        .limit(toppers)
+    ).all()
+    count = int(marks.size)
+    stats = {"count": count, "mean": None, "median": None, "stddev": None, "min": None, "max": None,
+             "p25": None, "p75": None, "pass_rate": None}
+    if count:
+        p25, median, p75 = np.percentile(marks, [25, 50, 75])
+        stats.update(
+            mean=round(float(marks.mean()), 2),
+            median=float(median),
+            stddev=round(float(marks.std()), 2),
+            min=int(marks.min()),
+            max=int(marks.max()),
+            p25=float(p25),
+            p75=float(p75),
+            pass_rate=round(float(np.count_nonzero(marks >= PASS_MARK)) / count, 4),
+        )
+    return {
+        "subject": dict(subj._mapping),
+        **stats,
+        "grade_distribution": {grade: n for grade, n in grades},
+        "toppers": [dict(r._mapping) for r in top],
+    }
+
+def subject_summary(db: Session, subject_id: int, toppers: int = 10) -> Optional[dict]:
+    term_id = current_term_id(db)
+    key = ("summary", term_id, subject_id, _versions[subject_id], toppers)
+    return _cached(key, lambda: _subject_summary(db, term_id, subject_id, toppers), subject_id)
+
+def _subject_breakdown(db: Session, term_id: int, subject_id: int, by: str) -> list:
+    column = BREAKDOWN_COLUMNS[by]
+    rows = db.execute(
+        select(column.label("group"), func.count(Mark.id), func.avg(Mark.marks), func.min(Mark.marks),
+               func.max(Mark.marks), func.avg(Mark.grade_points), _pass_count())
+        .join(Student, Student.id == Mark.student_id)
+        .where(Mark.term_id == term_id, Mark.subject_id == subject_id)
+        .group_by(column)
+        .order_by(column)
+    ).all()
+    return [
+        {"group": group, "count": n, "mean": round(float(avg), 2), "min": lo, "max": hi,
+         "mean_grade_points": round(float(avg_gp), 2), "pass_rate": round(int(passed) / n, 4)}
+        for group, n, avg, lo, hi, avg_gp, passed in rows
+    ]
+
+def subject_breakdown(db: Session, subject_id: int, by: str) -> list:
+    term_id = current_term_id(db)
+    key = ("breakdown", term_id, subject_id, _versions[subject_id], by)
+    return _cached(key, lambda: _subject_breakdown(db, term_id, subject_id, by), subject_id)
+
+def _overview(db: Session, term_id: int) -> list:
+    rows = db.execute(
+        select(Subject.id, Subject.code, Subject.name, func.count(Mark.id), func.avg(Mark.marks),
+               func.min(Mark.marks), func.max(Mark.marks), _pass_count())
+        .outerjoin(Mark, and_(Mark.subject_id == Subject.id, Mark.term_id == term_id))
+        .group_by(Subject.id, Subject.code, Subject.name)
+        .order_by(Subject.id)
+    ).all()
+    return [
+        {"subject_id": sid, "code": code, "name": name, "count": n,
+         "mean": round(float(avg), 2) if n else None, "min": lo, "max": hi,
+         "pass_rate": round(int(passed) / n, 4) if n else None}
+        for sid, code, name, n, avg, lo, hi, passed in rows
+    ]
+
+def overview(db: Session) -> list:
+    term_id = current_term_id(db)
+    return _cached(("overview", term_id, _global_version), lambda: _overview(db, term_id))
@@ -0,0 +1,38 @@
+# Admin API calls from the command-line tools (python -m app.grading / app.terms
+# with --api URL). A change made through a running server is followed by the
+# same cache invalidation as the admin routes; one made directly on the
+# database is not (every worker keeps its in-process caches until they expire).
+import getpass
+import json
+import os
+import urllib.error
+import urllib.request
+from typing import Optional
+
+
+def _request(base_url: str, method: str, path: str, body: Optional[dict] = None, token: str = None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url.rstrip("/") + path, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as exc:
+        raise SystemExit(f"{method} {path}: {exc.code} {exc.read().decode(errors='replace')}")
+
+class AdminApi:
+    # logs in on the first call; the password comes from SRMS_ADMIN_PASSWORD
+    # or a prompt
+    def __init__(self, base_url: str, username: str):
+        self.base_url = base_url
+        self.username = username
+        self._token = None
+
+    def call(self, method: str, path: str, body: Optional[dict] = None):
+        if self._token is None:
+            password = os.getenv("SRMS_ADMIN_PASSWORD") or getpass.getpass(f"password for {self.username}: ")
+            self._token = _request(self.base_url, "POST", "/auth/login",
+                                   {"username": self.username, "password": password})["access_token"]
+        return _request(self.base_url, method, path, body, self._token)
@@ -0,0 +1,41 @@
+# Analytics latency over a synthetic dataset (default 2,500 students x 40
+# subjects = 100k marks) in an in-memory SQLite database.
+# Usage (from backend/): python -m app.bench.analytics [students] [subjects]
+import sys
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app import analytics
+from app.seed import seed_synthetic
+
+
+def _time(label: str, fn, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        analytics.analytics_cache.clear()
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    started = time.perf_counter()
+    for _ in range(1000):
+        fn()
+    cached = (time.perf_counter() - started) / 1000
+    print(f"{label:<28} uncached {best * 1000:8.2f} ms   cached {cached * 1e6:8.2f} us")
+
+def run(n_students: int, n_subjects: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    seed_synthetic(db, n_students, n_subjects)
+    print(f"\n{n_students * n_subjects:,} marks")
+    _time("overview", lambda: analytics.overview(db))
+    _time("subject summary", lambda: analytics.subject_summary(db, 1))
+    for by in analytics.BREAKDOWN_COLUMNS:
+        _time(f"breakdown by {by}", lambda: analytics.subject_breakdown(db, 1, by))
+    db.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*(args + [2500, 40][len(args):]))
@@ -0,0 +1,41 @@
+# Export throughput and peak Python memory against the student count, over
+# synthetic datasets in a temporary SQLite file.
+# Usage (from backend/): python -m app.bench.export [students ...]
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from sqlalchemy import create_engine
+from app.database import Base, SessionLocal
+from app import export
+from app.seed import seed_synthetic
+
+
+def _measure(label: str, body, students: int):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in body)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} {students:>7} students  {students / elapsed:>9,.0f}/s  {size / 1e6:8.2f} MB out"
+          f"  peak {peak / 1e6:6.2f} MB")
+
+def run(sizes):
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            Base.metadata.create_all(engine)
+            SessionLocal.configure(bind=engine)
+            db = SessionLocal()
+            seed_synthetic(db, n, 10)
+            db.close()
+            _measure("csv", export.results_csv(), n)
+            _measure("xlsx", export.results_xlsx(), n)
+            _measure("marksheets", export.marksheets_zip(), n)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or [1000, 5000])
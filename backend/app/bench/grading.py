@@ -0,0 +1,50 @@
+# Grading throughput: the per-mark if-chain against the NumPy grader, then a
+# full re-grade (set-based UPDATE + results refresh) over a synthetic dataset
+# in an in-memory SQLite database.
+# Usage (from backend/): python -m app.bench.grading [marks] [students] [subjects]
+import sys
+import time
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.grading import DEFAULT_GRADER, Scheme, regrade, regrade_marks, set_scheme
+from app.seed import seed_synthetic
+from app.utils import grade_from_marks
+
+
+def _rate(label: str, n: int, fn) -> None:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {n / elapsed:>14,.0f} marks/s  ({elapsed * 1000:.1f} ms)")
+
+def run(n_marks: int, n_students: int, n_subjects: int):
+    marks = np.random.default_rng(0).integers(0, 101, n_marks)
+    values = marks.tolist()
+    print(f"{n_marks:,} marks")
+    _rate("if-chain (per mark)", n_marks, lambda: [grade_from_marks(m) for m in values])
+    _rate("searchsorted (arrays)", n_marks, lambda: DEFAULT_GRADER.grade_array(marks))
+    _rate("searchsorted (tuples)", n_marks, lambda: DEFAULT_GRADER.grade(values))
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    seed_synthetic(db, n_students, n_subjects)
+    total = n_students * n_subjects
+    print(f"\nre-grade of {total:,} marks")
+    subject_ids = list(range(1, n_subjects + 1))
+    _rate("UPDATE ... CASE only", total, lambda: regrade_marks(db, subject_ids))
+    db.commit()
+    _rate("absolute + results", total, lambda: regrade(db))
+    curve = Scheme("relative", (0, 20, 40, 60, 80, 95), ("F", "C", "B", "B+", "A", "A+", "O"),
+                   (0.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0))
+    for subject_id in subject_ids:
+        set_scheme(db, subject_id, curve)
+    _rate("relative + results", total, lambda: regrade(db))
+    db.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    run(*(args + [5_000_000, 2000, 20][len(args):]))
@@ -0,0 +1,26 @@
+# Hashes per second for the batch hashing service against the worker count.
+# Usage (from backend/): python -m app.bench.hashing [count]
+# Set PBKDF2_ROUNDS to compare cost settings.
+import os
+import sys
+import time
+from app.config import settings
+from app.hashing import hash_many
+
+
+def run(count: int):
+    cores = os.cpu_count() or 1
+    print(f"pbkdf2_sha256 rounds={settings.PBKDF2_ROUNDS} cores={cores} hashes={count}")
+    workers = 1
+    while True:
+        started = time.perf_counter()
+        hash_many((f"pw{i}" for i in range(count)), workers=workers)
+        elapsed = time.perf_counter() - started
+        print(f"workers={workers:>3}  {count / elapsed:>9,.1f} hashes/s  ({elapsed:.2f}s)")
+        if workers >= cores:
+            break
+        workers = min(workers * 2, cores)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,204 @@
+# Load / latency benchmark for the API against a local database stand-in.
+#
+# Seeds a synthetic dataset (seed.seed_synthetic: N students x M subjects),
+# drives the hot routes with concurrent clients through httpx's ASGI
+# transport, and reports p50/p95/p99 latency, requests per second and SQL
+# statements per request. Results are written as a JSON baseline; pass
+# --compare to fail when a scenario got slower than an earlier baseline.
+#
+# Usage (from backend/):
+#   python -m app.bench.load --students 2000 --subjects 10 --clients 50
+#   DB_ASYNC=true python -m app.bench.load --name async
+#   python -m app.bench.load --db mysql+pymysql://root:pw@127.0.0.1:3307/srms_bench
+#   python -m app.bench.load --compare bench_results/baseline.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).resolve().parents[2] / "bench_results"
+
+
+def _parse_args(argv):
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--students", type=int, default=1000)
+    p.add_argument("--subjects", type=int, default=10)
+    p.add_argument("--clients", type=int, default=20, help="concurrent clients per scenario")
+    p.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    p.add_argument("--login-requests", type=int, default=50, help="requests for the (CPU-bound) login scenario")
+    p.add_argument("--db", default="", help="SQLAlchemy URL; default is a temporary SQLite file")
+    p.add_argument("--name", default="baseline", help="baseline file name under bench_results/")
+    p.add_argument("--compare", default="", help="baseline JSON to compare against")
+    p.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 / rps regression (fraction)")
+    return p.parse_args(argv)
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+async def _scenario(client, name: str, make_request, total: int, clients: int, counter) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            r = await make_request(client, i)
+            latencies.append(time.perf_counter() - started)
+            if r.status_code >= 400:
+                errors += 1
+
+    queries_before = counter["queries"]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "requests": total,
+        "clients": clients,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "queries_per_request": round((counter["queries"] - queries_before) / total, 2),
+    }
+    print(f"{name:<16} {result['rps']:>9.1f} rps  p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}"
+          f"  p99 {result['p99_ms']:>8.2f} ms  {result['queries_per_request']:>5.2f} q/req  {errors} errors")
+    return result
+
+async def _run(args) -> dict:
+    import httpx
+    from sqlalchemy import event
+    from app.config import settings
+    from app.database import SessionLocal, engine, async_engine
+    from app.main import app
+    from app.migrations import upgrade
+    from app.seed import seed_synthetic
+
+    upgrade()
+    db = SessionLocal()
+    seed_synthetic(db, args.students, args.subjects)
+    db.close()
+
+    counter = {"queries": 0}
+    def count(*_):
+        counter["queries"] += 1
+    event.listen(engine, "before_cursor_execute", count)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def login(username, password):
+            r = await client.post("/auth/login", json={"username": username, "password": password})
+            r.raise_for_status()
+            return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        n_tokens = min(args.students, 50)
+        students = [await login(f"s9{i:07d}", "student123") for i in range(1, n_tokens + 1)]
+        teachers = [await login(f"teacher_syn{i:03d}", "teacher123") for i in range(1, min(args.subjects, 10) + 1)]
+        admin = await login("admin", "admin123")
+        subject_of = {i: i for i in range(len(teachers))}  # synthetic teacher i+1 owns subject i+1
+
+        async def do_login(c, i):
+            return await c.post("/auth/login", json={"username": f"s9{i % n_tokens + 1:07d}", "password": "student123"})
+
+        async def student_marks(c, i):
+            return await c.get("/student/me/marks", headers=students[i % n_tokens])
+
+        async def teacher_mark(c, i):
+            t = i % len(teachers)
+            return await c.post("/teacher/marks", headers=teachers[t], json={
+                "student_id": random.randint(1, args.students), "subject_id": subject_of[t] + 1,
+                "marks": random.randint(0, 100)})
+
+        async def admin_students(c, i):
+            cursor = random.randint(0, max(args.students - 100, 0))
+            return await c.get(f"/admin/students?limit=100&cursor={cursor}", headers=admin)
+
+        async def admin_subjects(c, i):
+            return await c.get("/admin/subjects", headers=admin)
+
+        scenarios = [
+            ("auth_login", do_login, args.login_requests),
+            ("student_marks", student_marks, args.requests),
+            ("teacher_marks", teacher_mark, args.requests),
+            ("admin_students", admin_students, args.requests),
+            ("admin_subjects", admin_subjects, args.requests),
+        ]
+        results = {}
+        for name, fn, total in scenarios:
+            results[name] = await _scenario(client, name, fn, total, args.clients, counter)
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "database": engine.url.render_as_string(hide_password=True),
+        "db_async": settings.DB_ASYNC,
+        "dataset": {"students": args.students, "subjects": args.subjects},
+        "scenarios": results,
+    }
+
+def _compare(current: dict, baseline: dict, tolerance: float) -> int:
+    regressions = 0
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp', '?')}):")
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        p95 = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps = now["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        regressed = p95 > tolerance or rps < -tolerance
+        regressions += regressed
+        print(f"  {name:<16} p95 {p95:+7.1%}  rps {rps:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main(argv=None) -> int:
+    args = _parse_args(argv if argv is not None else sys.argv[1:])
+    # every simulated client shares one address and logs in repeatedly
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    tmp = None
+    if args.db:
+        os.environ["DATABASE_URL"] = args.db
+    elif not os.getenv("DATABASE_URL"):
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    try:
+        report = asyncio.run(_run(args))
+    finally:
+        if tmp:
+            tmp.cleanup()
+    BASELINE_DIR.mkdir(exist_ok=True)
+    out = BASELINE_DIR / f"{args.name}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nwrote {out}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if _compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# Connection-pool stress test: finds the concurrency at which the pool saturates.
+#
+# Each simulated request checks out a connection, runs the student marks lookup
+# and holds the connection for --hold-ms (the rest of a request's DB work),
+# mirroring one API worker process. Concurrency is stepped through --levels;
+# for each level the checkout wait, throughput and pool timeouts are reported.
+# The pool comes from app.database with the DB_POOL_* settings given here, so
+# the numbers apply to the same configuration the API would run with.
+#
+# Usage (from backend/):
+#   python -m app.bench.pool --pool-size 10 --overflow 20 --levels 5,10,20,40,80
+#   python -m app.bench.pool --db mysql+pymysql://root:pw@127.0.0.1:3307/srms_bench --workers 4
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def _parse_args(argv):
+    p = argparse.ArgumentParser(description="connection pool saturation test")
+    p.add_argument("--db", default="", help="SQLAlchemy URL; default is a temporary SQLite file")
+    p.add_argument("--pool-size", type=int, default=10)
+    p.add_argument("--overflow", type=int, default=20)
+    p.add_argument("--timeout", type=float, default=2.0, help="pool checkout timeout (seconds)")
+    p.add_argument("--pre-ping", default="always", choices=("always", "idle", "off"))
+    p.add_argument("--hold-ms", type=float, default=20.0, help="time each request keeps its connection")
+    p.add_argument("--levels", default="1,5,10,20,30,40,60,80", help="comma separated concurrency levels")
+    p.add_argument("--duration", type=float, default=2.0, help="seconds per level")
+    p.add_argument("--workers", type=int, default=1, help="API worker processes sharing the database")
+    return p.parse_args(argv)
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))]
+
+def _level(engine, stmt, clients: int, duration: float, hold: float) -> dict:
+    from sqlalchemy import exc
+    from app.database import pool_stats
+    waits, done, timeouts, peak = [], [0], [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                conn = engine.connect()
+            except exc.TimeoutError:
+                with lock:
+                    timeouts[0] += 1
+                continue
+            waited = time.perf_counter() - started
+            try:
+                conn.execute(stmt, {"sid": 1}).all()
+                time.sleep(hold)
+            finally:
+                conn.close()
+            with lock:
+                waits.append(waited)
+                done[0] += 1
+
+    def watch():
+        while time.perf_counter() < deadline:
+            peak[0] = max(peak[0], pool_stats(engine).get("checked_out", 0))
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)] + [threading.Thread(target=watch)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    waits.sort()
+    return {
+        "clients": clients,
+        "rps": done[0] / elapsed,
+        "wait_p50_ms": _percentile(waits, 50) * 1000,
+        "wait_p95_ms": _percentile(waits, 95) * 1000,
+        "timeouts": timeouts[0],
+        "peak_checked_out": peak[0],
+    }
+
+def run(args) -> None:
+    from sqlalchemy import text
+    from app.database import engine
+    from app.migrations import upgrade
+
+    upgrade()
+    stmt = text("SELECT payload FROM student_results WHERE student_id = :sid")
+    capacity = args.pool_size + args.overflow
+    hold = args.hold_ms / 1000
+    print(f"{engine.url.render_as_string(hide_password=True)}  pool_size={args.pool_size} "
+          f"max_overflow={args.overflow} timeout={args.timeout}s pre_ping={args.pre_ping} hold={args.hold_ms}ms")
+    print(f"{'clients':>7} {'req/s':>9} {'wait p50':>9} {'wait p95':>9} {'timeouts':>8} {'peak out':>8}")
+    saturated = None
+    for clients in (int(x) for x in args.levels.split(",")):
+        r = _level(engine, stmt, clients, args.duration, hold)
+        print(f"{clients:>7} {r['rps']:>9.1f} {r['wait_p50_ms']:>7.2f}ms {r['wait_p95_ms']:>7.2f}ms "
+              f"{r['timeouts']:>8} {r['peak_checked_out']:>8}")
+        # saturated once requests queue for the pool longer than they use the connection
+        if saturated is None and (r["timeouts"] or r["wait_p95_ms"] > args.hold_ms):
+            saturated = clients
+    if saturated is None:
+        print(f"no saturation up to {clients} concurrent requests per worker")
+    else:
+        print(f"pool saturates at ~{saturated} concurrent requests per worker (pool capacity {capacity})")
+    print(f"{args.workers} worker(s) may open up to {args.workers * capacity} connections; "
+          f"keep that below the server's max_connections")
+
+def main(argv=None) -> int:
+    args = _parse_args(argv if argv is not None else sys.argv[1:])
+    # app.database reads the pool configuration from the environment at import
+    os.environ.update(
+        DB_POOL_SIZE=str(args.pool_size),
+        DB_MAX_OVERFLOW=str(args.overflow),
+        DB_POOL_TIMEOUT=str(args.timeout),
+        DB_PRE_PING=args.pre_ping,
+    )
+    tmp = None
+    if args.db:
+        os.environ["DATABASE_URL"] = args.db
+    elif not os.getenv("DATABASE_URL"):
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'pool.db')}"
+    try:
+        run(args)
+    finally:
+        if tmp:
+            tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
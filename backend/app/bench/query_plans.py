@@ -0,0 +1,123 @@
+# Query-plan regression check for the hot routes.
+#
+# Drives every hot route through the ASGI app, captures each SQL statement it
+# issues (SQLAlchemy before_cursor_execute) and EXPLAINs it. Exits non-zero
+# when a statement falls back to a full table scan on a table that route is
+# not allowed to scan, or a route fails (and so never issues its queries).
+# tests/test_query_plans.py runs the SQLite check as part of the test suite.
+#
+# Usage (from backend/):
+#   python -m app.bench.query_plans                     # temporary SQLite stand-in
+#   DATABASE_URL=mysql+pymysql://... python -m app.bench.query_plans --mysql
+# The MySQL run expects an empty database it may create tables in and seed.
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp.name, 'plans.db')}")
+os.environ.setdefault("PBKDF2_ROUNDS", "1000")
+# one client drives every route; the login throttle is not what is measured
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app.seed import seed_synthetic  # noqa: E402
+
+# (method, path, body, tables the route may scan in full)
+HOT_ROUTES = [
+    ("POST", "/auth/login", {"username": "s90000001", "password": "student123"}, ()),
+    ("GET", "/student/me", None, ()),
+    ("GET", "/student/me/marks", None, ()),
+    ("GET", "/teacher/my-subject", None, ()),
+    ("POST", "/teacher/marks", {"student_id": 1, "subject_id": 1, "marks": 77}, ()),
+    ("POST", "/teacher/marks/bulk", [{"student_id": i, "marks": 50 + i % 50} for i in range(1, 51)], ()),
+    ("POST", "/teacher/marks", {"student_id": 1, "subject_id": 1, "marks": 81, "attempt": 2}, ()),
+    ("GET", "/student/me/transcript?limit=5", None, ()),
+    ("GET", "/admin/subjects?limit=2", None, ()),
+    ("GET", "/admin/students?limit=20&cursor=10", None, ()),
+    ("GET", "/admin/students?division_id=2&batch=K3", None, ()),
+    ("GET", "/admin/students/1/transcript?limit=5&cursor=1.2.1", None, ()),
+    ("GET", "/admin/analytics/subjects/1", None, ()),
+    ("GET", "/admin/analytics/subjects/1/breakdown?by=division", None, ()),
+    ("GET", "/admin/analytics/subjects", None, ("subjects",)),
+]
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+class StatementRecorder:
+    def __init__(self):
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINED):
+            self.statements.append((statement, parameters))
+
+    def take(self) -> list:
+        seen, out = set(), []
+        for stmt, params in self.statements:
+            if stmt not in seen:
+                seen.add(stmt)
+                out.append((stmt, params))
+        self.statements = []
+        return out
+
+def sqlite_full_scans(conn, statement, parameters) -> tuple:
+    plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    lines = [row[-1] for row in plan]
+    # "SCAN t" is a full table scan; "SCAN t USING (COVERING) INDEX" walks an index
+    scans = {line.split()[1] for line in lines if line.startswith("SCAN ") and " USING " not in line}
+    return lines, scans
+
+def mysql_full_scans(conn, statement, parameters) -> tuple:
+    plan = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all()
+    lines = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}" for row in plan]
+    scans = {row["table"] for row in plan if row["type"] == "ALL"}
+    return lines, scans
+
+def _token(client: TestClient, username: str, password: str) -> dict:
+    r = client.post("/auth/login", json={"username": username, "password": password})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+def run(mysql: bool = False) -> int:
+    upgrade()
+    db = SessionLocal()
+    seed_synthetic(db, 200, 5)
+    db.close()
+    client = TestClient(app)
+    headers = {
+        "/auth": {},
+        "/student": _token(client, "s90000001", "student123"),
+        "/teacher": _token(client, "teacher_syn001", "teacher123"),
+        "/admin": _token(client, "admin", "admin123"),
+    }
+    recorder = StatementRecorder()
+    explain = mysql_full_scans if mysql else sqlite_full_scans
+    failures = 0
+    for method, path, body, allowed in HOT_ROUTES:
+        auth = next(h for prefix, h in headers.items() if path.startswith(prefix))
+        recorder.take()
+        r = client.request(method, path, json=body, headers=auth)
+        print(f"\n{method} {path} -> {r.status_code}")
+        if r.status_code >= 400:
+            failures += 1
+            print("  FAILED: " + r.text[:200])
+        with engine.connect() as conn:
+            for statement, parameters in recorder.take():
+                lines, scans = explain(conn, statement, parameters)
+                bad = scans - set(allowed)
+                failures += bool(bad)
+                print(("  FULL SCAN " + ", ".join(sorted(bad)) if bad else "  ok") + ": " + " ".join(statement.split())[:110])
+                for line in lines:
+                    print("      " + line)
+    print(f"\n{failures} route(s) or statement(s) failed" if failures else "\nall hot queries use indexes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(mysql="--mysql" in sys.argv[1:]))
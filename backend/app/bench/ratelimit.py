@@ -0,0 +1,144 @@
+# Login flood with and without the rate limiter.
+#
+# Each run is a fresh process (the limiter is configured at import): one user
+# is created, then for --seconds --clients concurrent attackers spread over
+# --ips addresses send --rate wrong passwords per second (in total) for that
+# username to /auth/login through the ASGI app while a separate client keeps making a cheap DB request
+# (/auth/me). Reports attempts, CPU share, password verifies actually run and
+# the bystander's p50 / p95 latency. Also reports the cost of one in-process
+# bucket take and the memory held per bucket.
+# Usage (from backend/): python -m app.bench.ratelimit [--seconds S --rate R --clients C --ips K]
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _parse_args(argv):
+    p = argparse.ArgumentParser(description="login flood against the rate limiter")
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--rate", type=float, default=200, help="login attempts per second")
+    p.add_argument("--clients", type=int, default=20)
+    p.add_argument("--ips", type=int, default=4, help="attacker addresses")
+    p.add_argument("--buckets", type=int, default=100_000, help="buckets for the memory measurement")
+    return p.parse_args(argv)
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q / 100))] * 1000 if samples else 0.0
+
+async def _flood(seconds: float, rate: float, clients: int, ips: int) -> dict:
+    import httpx
+    from app.database import SessionLocal
+    from app.main import app
+    from app.migrations import upgrade
+    from app.models import RoleEnum, User
+    from app.ratelimit import rate_limiter
+    from app.utils import hash_password
+
+    upgrade()
+    db = SessionLocal()
+    db.add(User(username="victim", password_hash=hash_password("right"), role=RoleEnum.admin))
+    db.commit()
+    db.close()
+    verifies = 0
+    import app.main as main
+    original = main.verify_password_async
+
+    async def counted(*args):
+        nonlocal verifies
+        verifies += 1
+        return await original(*args)
+
+    main.verify_password_async = counted
+    async with app.router.lifespan_context(app):
+        attackers = [httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(f"10.0.0.{i + 1}", 1000)),
+                                       base_url="http://bench") for i in range(ips)]
+        bystander = httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=("10.1.0.1", 1000)),
+                                      base_url="http://bench")
+        statuses = {}
+        latencies = []
+        deadline = time.perf_counter() + seconds
+
+        async def attacker(i):
+            # paced like a remote client: the next attempt is due every clients / rate seconds
+            client = attackers[i % ips]
+            due = time.perf_counter() + i / rate
+            while due < deadline:
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                r = await client.post("/auth/login", json={"username": "victim", "password": "wrong"})
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                due += clients / rate
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await bystander.get("/auth/me", params={"token": "victim"})
+                latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        cpu, started = time.process_time(), time.perf_counter()
+        await asyncio.gather(probe(), *(attacker(i) for i in range(clients)))
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu
+        for client in attackers + [bystander]:
+            await client.aclose()
+    return {"limiter": rate_limiter is not None, "seconds": elapsed, "cpu": cpu, "verifies": verifies,
+            "statuses": statuses, "p50": _percentile(latencies, 50), "p95": _percentile(latencies, 95)}
+
+def worker(seconds: float, rate: float, clients: int, ips: int) -> None:
+    # entry point of one run; prints its result as JSON
+    print(json.dumps(asyncio.run(_flood(seconds, rate, clients, ips))))
+
+def _run(enabled: bool, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, RATE_LIMIT_ENABLED=str(enabled).lower(), RATE_LIMIT_URL="",
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'ratelimit.db')}")
+        code = f"from app.bench.ratelimit import worker; worker({args.seconds}, {args.rate}, {args.clients}, {args.ips})"
+        proc = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise SystemExit(proc.stderr)
+    return json.loads(proc.stdout.splitlines()[-1])
+
+def store(n: int) -> None:
+    from app.ratelimit import LocalBuckets
+    keys = [("ip", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}") for i in range(n)]
+    now = time.monotonic()
+    buckets = LocalBuckets(n)
+    started = time.perf_counter()
+    for key in keys:
+        buckets.take_now(key, 20.0, 40, now)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    buckets = LocalBuckets(n)
+    for key in keys:
+        buckets.take_now(key, 20.0, 40, now)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"in-process store: {elapsed / n * 1e6:.2f} us per take, {held / n:.0f} bytes per bucket "
+          f"({n:,} buckets, {held / 2 ** 20:.1f} MiB)")
+
+def main(argv=None) -> int:
+    args = _parse_args(argv if argv is not None else sys.argv[1:])
+    store(args.buckets)
+    print(f"\n{args.seconds:.0f} s of {args.rate:.0f} bad logins/s for one username, "
+          f"{args.clients} clients over {args.ips} address(es)")
+    print(f"{'limiter':<8} {'attempts':>9} {'cpu':>6} {'verifies':>9} {'401':>6} {'429':>7} "
+          f"{'bystander p50':>14} {'p95':>8}")
+    for enabled in (False, True):
+        r = _run(enabled, args)
+        print(f"{'on' if r['limiter'] else 'off':<8} {sum(r['statuses'].values()):>9} "
+              f"{r['cpu'] / r['seconds']:>6.0%} {r['verifies']:>9} {r['statuses'].get('401', 0):>6} "
+              f"{r['statuses'].get('429', 0):>7} {r['p50']:>12.1f}ms {r['p95']:>6.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
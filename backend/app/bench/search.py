@@ -0,0 +1,72 @@
+# Student search latency: the trigram index (app.search) against a
+# case-insensitive LIKE '%q%' scan over name / roll_no / student_code, on N
+# students whose names are recombined from student_data.csv, in an in-memory
+# SQLite database. Reports index build time and per-query p50 / p95.
+# Usage (from backend/): python -m app.bench.search [students] [repeat]
+import csv
+import random
+import sys
+import time
+from pathlib import Path
+from sqlalchemy import create_engine, func, insert, or_, select
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Student
+from app.search import StudentIndex
+
+QUERIES = ("vedika", "ved", "sharma", "vedka bopche", "dik", "a", "9000123", "E2K00000", "pra joshi")
+
+
+def _rows(n: int):
+    csv_path = Path(__file__).resolve().parents[3] / "student_data.csv"
+    names = [r["Name"].split() for r in csv.DictReader(open(csv_path, newline="", encoding="utf-8"))]
+    first = [n[0] for n in names]
+    middle = [n[1] for n in names if len(n) > 2]
+    last = [n[-1] for n in names if len(n) > 1]
+    rng = random.Random(0)
+    for i in range(1, n + 1):
+        yield {"student_code": f"E2K{i:07d}", "roll_no": f"9{i:07d}",
+               "name": f"{rng.choice(first)} {rng.choice(middle)} {rng.choice(last)}",
+               "division_id": i % 8 + 1, "batch": f"K{i % 6 + 1}", "elective": "FJP"}
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.95)] * 1000
+
+def _like(db, q: str):
+    pattern = f"%{q.lower()}%"
+    stmt = select(Student.id).where(or_(func.lower(Student.name).like(pattern), func.lower(Student.roll_no).like(pattern),
+                                        func.lower(Student.student_code).like(pattern))).order_by(Student.id).limit(20)
+    return db.scalars(stmt).all()
+
+def run(n: int, repeat: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    rows = list(_rows(n))
+    for i in range(0, n, 10000):
+        db.execute(insert(Student), rows[i:i + 10000])
+    db.commit()
+    index = StudentIndex(refresh_seconds=3600)
+    started = time.perf_counter()
+    index.apply(index.changes(db))
+    print(f"{n:,} students; index built in {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"({index.stats()['trigrams']} trigrams)")
+    print(f"\n{'query':<14} {'matches':>8} {'index p50':>10} {'p95':>8} {'LIKE p50':>10} {'p95':>8}")
+    for q in QUERIES:
+        indexed, scanned = [], []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            _, total = index.search(q, 0, 20)
+            indexed.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            _like(db, q)
+            scanned.append(time.perf_counter() - t)
+        (ip50, ip95), (lp50, lp95) = _percentiles(indexed), _percentiles(scanned)
+        print(f"{q:<14} {total:>8} {ip50:>8.2f}ms {ip95:>6.2f}ms {lp50:>8.2f}ms {lp95:>6.2f}ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*(args + [100_000, 20][len(args):]))
@@ -0,0 +1,168 @@
+# Startup cost of an API worker.
+#
+# 1. Import-time breakdown of `import app.main` (python -X importtime): self
+#    time summed per top-level package and the slowest app modules.
+# 2. Cold start of --workers processes started at the same moment, the way a
+#    process manager brings up a pool: interpreter + import + lifespan + first
+#    request (engine creation and first connection happen here) against a warm
+#    second request. With --preload (POSIX only) the app is imported once in
+#    this process and the workers are forked from it, as gunicorn does with
+#    WEB_PRELOAD=true.
+#
+# Usage (from backend/):
+#   python -m app.bench.startup --workers 4
+#   python -m app.bench.startup --workers 4 --preload
+#   python -m app.bench.startup --db mysql+pymysql://root:pw@127.0.0.1:3307/srms_bench
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _parse_args(argv):
+    p = argparse.ArgumentParser(description="API worker startup cost")
+    p.add_argument("--db", default="", help="SQLAlchemy URL; default is a temporary SQLite file")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--preload", action="store_true", help="import once, then fork the workers")
+    p.add_argument("--top", type=int, default=12, help="rows per import-time table")
+    return p.parse_args(argv)
+
+def _python(code: str, env: dict, **kwargs) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *kwargs.pop("flags", ()), "-c", code], cwd=BACKEND, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs)
+
+def import_breakdown(env: dict, top: int) -> None:
+    proc = _python("import app.main", env, flags=("-X", "importtime"))
+    _, err = proc.communicate()
+    if proc.returncode:
+        raise SystemExit(err)
+    packages = defaultdict(int)
+    modules = []
+    total = 0
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us)
+        if name.startswith("app."):
+            modules.append((int(cumulative_us), int(self_us), name))
+        if depth == 0:
+            total += int(cumulative_us)
+    print(f"import app.main: {total / 1000:.0f} ms")
+    print(f"\n{'package':<24} {'self ms':>8} {'share':>6}")
+    for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"{name:<24} {us / 1000:>8.1f} {us / total:>6.1%}")
+    print(f"\n{'app module':<32} {'cumul ms':>8} {'self ms':>8}")
+    for cumulative_us, self_us, name in sorted(modules, reverse=True)[:top]:
+        print(f"{name:<32} {cumulative_us / 1000:>8.1f} {self_us / 1000:>8.1f}")
+
+async def _requests(app) -> dict:
+    import httpx
+    timings = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for key in ("first_request", "second_request"):
+                started = time.perf_counter()
+                # unknown user: one indexed lookup, no password hashing
+                await client.post("/auth/login", json={"username": "bench-nobody", "password": "x"})
+                timings[key] = time.perf_counter() - started
+    return timings
+
+def worker() -> None:
+    # entry point of a spawned worker; prints its timings as JSON
+    import asyncio
+    import httpx  # noqa: F401  (bench client, kept out of the import timing)
+    started = time.perf_counter()
+    from app.main import app
+    timings = {"import": time.perf_counter() - started}
+    timings.update(asyncio.run(_requests(app)))
+    timings["ready_at"] = time.time()
+    print(json.dumps(timings))
+
+def _spawned(env: dict, n: int) -> list:
+    started = time.time()
+    procs = [_python("from app.bench.startup import worker; worker()", env) for _ in range(n)]
+    results = []
+    for proc in procs:
+        out, err = proc.communicate()
+        if proc.returncode:
+            raise SystemExit(err)
+        timings = json.loads(out)
+        # interpreter start to first response served
+        timings["ready"] = timings.pop("ready_at") - started
+        results.append(timings)
+    return results
+
+def _forked(n: int) -> list:
+    import asyncio
+    started = time.perf_counter()
+    from app import database
+    from app.main import app
+    imported = time.perf_counter() - started
+    children = []
+    forked_at = time.perf_counter()
+    for _ in range(n):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            database.dispose(close=False)
+            timings = asyncio.run(_requests(app))
+            timings.update({"ready": time.perf_counter() - forked_at, "import": 0.0})
+            os.write(write_fd, json.dumps(timings).encode())
+            os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+    results = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd) as pipe:
+            results.append(json.loads(pipe.read()))
+        os.waitpid(pid, 0)
+    print(f"parent import (once, before fork): {imported * 1000:.0f} ms")
+    return results
+
+def run(args, env: dict) -> None:
+    print(f"{env['DATABASE_URL']}")
+    import_breakdown(env, args.top)
+    print(f"\ncold start, {args.workers} worker(s) {'forked after preload' if args.preload else 'spawned'}")
+    results = _forked(args.workers) if args.preload else _spawned(env, args.workers)
+    print(f"{'worker':>6} {'import':>9} {'1st req':>9} {'2nd req':>9} {'ready':>9}")
+    for i, r in enumerate(results, 1):
+        print(f"{i:>6} {r['import'] * 1000:>7.0f}ms {r['first_request'] * 1000:>7.1f}ms "
+              f"{r['second_request'] * 1000:>7.1f}ms {r['ready'] * 1000:>7.0f}ms")
+    print(f"all workers serving after {max(r['ready'] for r in results) * 1000:.0f} ms")
+
+def main(argv=None) -> int:
+    args = _parse_args(argv if argv is not None else sys.argv[1:])
+    if args.preload and not hasattr(os, "fork"):
+        raise SystemExit("--preload needs os.fork (POSIX)")
+    tmp = None
+    if args.db:
+        os.environ["DATABASE_URL"] = args.db
+    elif not os.getenv("DATABASE_URL"):
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'startup.db')}"
+    env = dict(os.environ)
+    try:
+        migrate = _python("from app.migrations import upgrade; upgrade()", env)
+        _, err = migrate.communicate()
+        if migrate.returncode:
+            raise SystemExit(err)
+        run(args, env)
+    finally:
+        if tmp:
+            tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,84 @@ class Settings(BaseModel):
     MYSQL_HOST: str = os.getenv("MYSQL_HOST", "127.0.0.1")
     MYSQL_PORT: str = os.getenv("MYSQL_PORT", "3306")
     MYSQL_DB: str = os.getenv("MYSQL_DB", "srms_db")
+    # full SQLAlchemy URLs override the MYSQL_* parts (e.g. sqlite:///./srms.db for local runs)
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")
+    # serve routes through an AsyncEngine (aiomysql / aiosqlite) instead of the threadpool
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "false").lower() == "true"
+    # read replicas (comma separated SQLAlchemy URLs) for GET result lookups;
+    # health checked every REPLICA_CHECK_SECONDS, skipped when more than
+    # REPLICA_MAX_LAG seconds behind (MySQL, 0 = no lag check), and bypassed for
+    # REPLICA_STICKY_SECONDS after a client's own write
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    REPLICA_CHECK_SECONDS: float = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+    REPLICA_MAX_LAG: float = float(os.getenv("REPLICA_MAX_LAG", "0"))
+    REPLICA_STICKY_SECONDS: float = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+    # connection pool (QueuePool) sizing; DB_PRE_PING is "always" (ping on every
+    # checkout), "idle" (only connections idle longer than DB_PRE_PING_IDLE seconds) or "off"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    DB_PRE_PING: str = os.getenv("DB_PRE_PING", "always").lower()
+    DB_PRE_PING_IDLE: float = float(os.getenv("DB_PRE_PING_IDLE", "30"))
     SECRET_KEY: str = os.getenv("SECRET_KEY", "123")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "120"))
+    # password hashing: pbkdf2 rounds, process pool size for batch hashing (0 = cpu count)
+    # and thread pool size for login verification
+    PBKDF2_ROUNDS: int = int(os.getenv("PBKDF2_ROUNDS", "29000"))
+    HASH_WORKERS: int = int(os.getenv("HASH_WORKERS", "0"))
+    VERIFY_WORKERS: int = int(os.getenv("VERIFY_WORKERS", "4"))
+    # authenticated principal cache (seconds / entries); when AUTH_TRUST_TOKEN_CLAIMS
+    # is on, role guards use the verified JWT claims and never touch the DB
+    PRINCIPAL_CACHE_TTL: int = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+    AUTH_TRUST_TOKEN_CLAIMS: bool = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+    # token-bucket rate limits, checked before routing (see ratelimit.py): every
+    # request per client IP (per second), and /auth/login attempts per IP and
+    # per username (per minute); 0 turns a limit off. Buckets are in-process
+    # (at most RATE_LIMIT_BUCKETS) unless RATE_LIMIT_URL points at Redis
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_URL: str = os.getenv("RATE_LIMIT_URL", "")
+    RATE_LIMIT_BUCKETS: int = int(os.getenv("RATE_LIMIT_BUCKETS", "100000"))
+    RATE_LIMIT_IP_PER_SECOND: float = float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "100"))
+    RATE_LIMIT_IP_BURST: int = int(os.getenv("RATE_LIMIT_IP_BURST", "200"))
+    LOGIN_LIMIT_IP_PER_MINUTE: float = float(os.getenv("LOGIN_LIMIT_IP_PER_MINUTE", "60"))
+    LOGIN_LIMIT_IP_BURST: int = int(os.getenv("LOGIN_LIMIT_IP_BURST", "30"))
+    LOGIN_LIMIT_USER_PER_MINUTE: float = float(os.getenv("LOGIN_LIMIT_USER_PER_MINUTE", "5"))
+    LOGIN_LIMIT_USER_BURST: int = int(os.getenv("LOGIN_LIMIT_USER_BURST", "5"))
+    # seconds an /admin/analytics result may be served from the in-process cache
+    ANALYTICS_CACHE_TTL: int = int(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+    # seconds between checks of the students table for rows the search index lacks
+    SEARCH_REFRESH_SECONDS: float = float(os.getenv("SEARCH_REFRESH_SECONDS", "10"))
+    # POST /teacher/marks write-behind: "off", "memory" (in-process queue) or
+    # "journal" (durable SQLite file); batches flush every FLUSH_MS or BATCH entries
+    MARKS_WRITE_BEHIND: str = os.getenv("MARKS_WRITE_BEHIND", "off").lower()
+    WRITE_BEHIND_JOURNAL: str = os.getenv("WRITE_BEHIND_JOURNAL", "marks_journal.db")
+    WRITE_BEHIND_FLUSH_MS: float = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+    WRITE_BEHIND_BATCH: int = int(os.getenv("WRITE_BEHIND_BATCH", "500"))
+    # ETag version counters: in-process LRU of RESPONSE_CACHE_SIZE keys, each
+    # renewed after RESPONSE_CACHE_LOCAL_TTL seconds (0 = never), or shared
+    # between workers through Redis when RESPONSE_CACHE_URL is set
+    RESPONSE_CACHE_URL: str = os.getenv("RESPONSE_CACHE_URL", "")
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "100000"))
+    RESPONSE_CACHE_LOCAL_TTL: float = float(os.getenv("RESPONSE_CACHE_LOCAL_TTL", "10"))
+    # Prometheus-style /metrics endpoint and the sampling profiler for slow requests
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_INTERVAL_MS: float = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    PROFILER_KEEP: int = int(os.getenv("PROFILER_KEEP", "10"))
+    # production launch (python -m app.serve): bind address, worker processes
+    # (0 = cpu count), request timeout and keep-alive (seconds), worker
+    # recycling after MAX_REQUESTS (0 = never), importing the app once in the
+    # parent before forking, and running migrations before the workers start
+    WEB_HOST: str = os.getenv("WEB_HOST", "0.0.0.0")
+    WEB_PORT: int = int(os.getenv("WEB_PORT", "8000"))
+    WEB_WORKERS: int = int(os.getenv("WEB_WORKERS", "0"))
+    WEB_TIMEOUT: int = int(os.getenv("WEB_TIMEOUT", "60"))
+    WEB_KEEPALIVE: int = int(os.getenv("WEB_KEEPALIVE", "5"))
+    WEB_MAX_REQUESTS: int = int(os.getenv("WEB_MAX_REQUESTS", "0"))
+    WEB_PRELOAD: bool = os.getenv("WEB_PRELOAD", "true").lower() == "true"
+    MIGRATE_ON_START: bool = os.getenv("MIGRATE_ON_START", "true").lower() == "true"
 
 settings = Settings()
@@ -1,19 +1,203 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from .config import settings
+from .metrics import POOL_CHECKOUT_WAIT
 
-DATABASE_URL = (
+DATABASE_URL = settings.DATABASE_URL or (
     f"mysql+pymysql://{settings.MYSQL_USER}:{settings.MYSQL_PASSWORD}"
     f"@{settings.MYSQL_HOST}:{settings.MYSQL_PORT}/{settings.MYSQL_DB}"
 )
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=10,
-    max_overflow=20,
-)
+def _async_url(url: str) -> str:
+    if url.startswith("mysql+pymysql:"):
+        return url.replace("mysql+pymysql:", "mysql+aiomysql:", 1)
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    return url
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or _async_url(DATABASE_URL)
+REPLICA_URLS = [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+pool_counters = {"timeouts": 0, "pings": 0, "stale": 0}
+
+class _TimedCheckout:
+    # records how long each checkout waited for (or spent opening) a connection
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_counters["timeouts"] += 1
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+ASYNC_DRIVERS = ("aiosqlite", "aiomysql", "asyncmy")
+
+def _engine_options(url: str) -> dict:
+    is_async = url.split(":", 1)[0].split("+")[-1] in ASYNC_DRIVERS
+    poolclass = TimedAsyncQueuePool if is_async else TimedQueuePool
+    if url.startswith("sqlite"):
+        options = {} if is_async else {"connect_args": {"check_same_thread": False}}
+        # in-memory databases keep SQLAlchemy's default single-connection pool
+        if ":memory:" in url or url.endswith("://"):
+            return options
+        return dict(options, poolclass=poolclass, pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW, pool_timeout=settings.DB_POOL_TIMEOUT)
+    return dict(
+        poolclass=poolclass,
+        pool_pre_ping=settings.DB_PRE_PING == "always",
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+
+def ping_when_idle(engine, idle: float) -> None:
+    # pessimistic disconnect handling for connections that sat in the pool longer
+    # than `idle` seconds; busy connections skip the extra round-trip that
+    # pool_pre_ping would add to every checkout
+    pool = getattr(engine, "sync_engine", engine).pool
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_connection, record):
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        checked_in_at = record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle:
+            return
+        pool_counters["pings"] += 1
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            pool_counters["stale"] += 1
+            # the pool discards the connection and retries the checkout with a fresh one
+            raise exc.DisconnectionError()
+
+def pool_stats(engine) -> dict:
+    pool = getattr(engine, "sync_engine", engine).pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    return stats
+
+# Engines are created on first use rather than at import, so a process manager
+# that imports the app before forking (gunicorn --preload) does not hand the
+# same pooled sockets to every worker; dispose(close=False) covers the case
+# where the parent did connect (e.g. to run migrations) before the fork.
+_engine = None
+_async_engine = None
+_replica_engines = None
+_engine_lock = threading.Lock()
+engine_hooks = []
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _configure(engine) -> None:
+    if settings.DB_PRE_PING == "idle":
+        ping_when_idle(engine, settings.DB_PRE_PING_IDLE)
+    for hook in engine_hooks:
+        hook(engine)
+
+def on_engine(hook) -> None:
+    # runs hook(engine) for every engine, including ones already created
+    engine_hooks.append(hook)
+    for engine in _created():
+        hook(engine)
+
+def _created() -> list:
+    return [e for e in (_engine, _async_engine, *(_replica_engines or ())) if e is not None]
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+                _configure(engine)
+                _engine = engine
+    return _engine
+
+def get_async_engine():
+    # None unless DB_ASYNC=true
+    global _async_engine
+    if _async_engine is None and settings.DB_ASYNC:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        with _engine_lock:
+            if _async_engine is None:
+                engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+                _configure(engine)
+                _async_engine = engine
+    return _async_engine
+
+def get_replica_engines() -> list:
+    # one engine per DATABASE_REPLICA_URLS entry; async engines when DB_ASYNC=true
+    global _replica_engines
+    if _replica_engines is None:
+        with _engine_lock:
+            if _replica_engines is None:
+                engines = []
+                for url in REPLICA_URLS:
+                    if settings.DB_ASYNC:
+                        from sqlalchemy.ext.asyncio import create_async_engine
+                        engine = create_async_engine(_async_url(url), **_engine_options(_async_url(url)))
+                    else:
+                        engine = create_engine(url, **_engine_options(url))
+                    _configure(engine)
+                    engines.append(engine)
+                _replica_engines = engines
+    return _replica_engines
+
+def dispose(close: bool = True) -> None:
+    # close=False after a fork: drop the inherited pool without closing the
+    # parent's connections from the child
+    for engine in _created():
+        getattr(engine, "sync_engine", engine).dispose(close=close)
+
+def __getattr__(name):
+    # `from .database import engine` still works and creates the engine on demand
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
+
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    class _LazyAsyncSessionmaker(async_sessionmaker):
+        def __call__(self, **local_kw):
+            if self.kw.get("bind") is None:
+                self.configure(bind=get_async_engine())
+            return super().__call__(**local_kw)
+
+    AsyncSessionLocal = _LazyAsyncSessionmaker(autoflush=False, expire_on_commit=False)
@@ -1,32 +1,134 @@
-from fastapi import Depends, HTTPException, status
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
-from .database import SessionLocal
+from .database import SessionLocal, AsyncSessionLocal
 from .auth import decode_token
+from .cache import LRUCache
+from .config import settings
 from .models import User, RoleEnum
+from .metrics import stage
+from .replicas import read_replicas
 
 bearer_scheme = HTTPBearer(auto_error=True)
 
-def get_db():
-    db = SessionLocal()
+@dataclass(frozen=True)
+class Principal:
+    # Detached snapshot of the authenticated user; safe to share across requests.
+    id: int
+    role: RoleEnum
+    student_id: Optional[int] = None
+    username: Optional[str] = None
+    full_name: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, u: User) -> "Principal":
+        return cls(id=u.id, role=u.role, student_id=u.student_id, username=u.username, full_name=u.full_name)
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["Principal"]:
+        # tokens issued before the "sid" claim existed fall back to the DB path
+        if "role" not in payload or "sid" not in payload:
+            return None
+        try:
+            role = RoleEnum(payload["role"])
+        except ValueError:
+            return None
+        return cls(id=int(payload["sub"]), role=role, student_id=payload["sid"])
+
+principal_cache = LRUCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+claims_trusted = 0
+
+def principal_cache_stats() -> dict:
+    return {**principal_cache.stats(), "trust_token_claims": settings.AUTH_TRUST_TOKEN_CLAIMS,
+            "claims_trusted": claims_trusted}
+
+class ThreadedSession:
+    # Gives a sync Session the AsyncSession.run_sync() interface: the ORM code
+    # runs in the threadpool instead of on the event loop.
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    @property
+    def bind(self):
+        return self.sync_session.bind
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+@asynccontextmanager
+async def _open_session(bind=None, read_only: bool = False):
+    # An AsyncSession when DB_ASYNC is on, otherwise a ThreadedSession. Either
+    # way routes call `await db.run_sync(helper, ...)` with a plain sync helper
+    # taking the Session as its first argument. Helpers that would write on a
+    # read find session.info["read_only"] set on a replica session.
+    options = {} if bind is None else {"bind": bind}
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal(**options) as session:
+            session.sync_session.info["read_only"] = read_only
+            yield session
+        return
+    db = SessionLocal(**options)
+    db.info["read_only"] = read_only
     try:
-        yield db
+        yield ThreadedSession(db)
     finally:
-        db.close()
+        if db.in_transaction():
+            await run_in_threadpool(db.close)
+        else:
+            db.close()
+
+async def get_session(request: Request):
+    # Route dependency; reads listed in replicas.READ_PATHS go to a read replica
+    # when DATABASE_REPLICA_URLS is set, everything else to the primary.
+    if read_replicas is None:
+        async with _open_session() as session:
+            yield session
+        return
+    replica = read_replicas.route(request)
+    try:
+        async with _open_session(replica.engine if replica else None, read_only=replica is not None) as session:
+            yield session
+    except OperationalError as exc:
+        if replica is not None:
+            read_replicas.failed(replica, exc)
+        raise
+    if replica is None:
+        read_replicas.stick(request)
+
+def _load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    user = db.query(User).filter(User.id == user_id).first()
+    return Principal.from_user(user) if user else None
 
-def get_current_user(db: Session = Depends(get_db), creds: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> User:
-    payload = decode_token(creds.credentials)
+async def get_current_user(db=Depends(get_session), creds: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> Principal:
+    global claims_trusted
+    with stage("jwt_decode"):
+        payload = decode_token(creds.credentials)
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
-
-def require_role(role: RoleEnum):
-    def checker(user: User = Depends(get_current_user)):
-        if user.role != role:
+    if settings.AUTH_TRUST_TOKEN_CLAIMS:
+        principal = Principal.from_claims(payload)
+        if principal:
+            claims_trusted += 1
+            return principal
+    user_id = int(user_id)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        with stage("principal_lookup"):
+            principal = await db.run_sync(_load_principal, user_id)
+        if not principal:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        principal_cache.set(user_id, principal)
+    return principal
+
+def require_role(*roles: RoleEnum):
+    async def checker(user: Principal = Depends(get_current_user)):
+        if user.role not in roles:
             raise HTTPException(status_code=403, detail="Forbidden")
         return user
     return checker
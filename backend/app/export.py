@@ -0,0 +1,243 @@
+# Bulk result export.
+#
+# One ordered students/marks/subjects join over the current term is consumed
+# through a server-side cursor (streaming.iter_rows) and pivoted one student at
+# a time, so memory stays constant as the student count grows:
+#   - results_csv():  students x subjects sheet with marks, grades and CGPA
+#   - results_xlsx(): same sheet through openpyxl's write-only workbook
+#   - marksheets_zip(): one PDF per student rendered in a process pool and
+#     written into a ZIP that is streamed as it is produced
+import csv
+import io
+import logging
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from typing import Optional
+from sqlalchemy import and_, select
+from .cache import LRUCache
+from .database import SessionLocal
+from .models import Mark, Student, Subject
+from .results import STUDENT_COLUMNS, weighted_gpa
+from .streaming import iter_rows
+from .terms import current_term_id
+
+log = logging.getLogger("srms.export")
+
+# students rendered per process-pool round trip when building marksheets
+PDF_BATCH = 256
+PROGRESS_EVERY = 1000
+STUDENT_FIELDS = ("student_id", "student_code", "roll_no", "name", "division_id", "batch", "elective")
+
+# recent exports (running and finished) for GET /admin/export/progress
+export_jobs = LRUCache(maxsize=50)
+
+
+class ExportProgress:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.students = 0
+        self.started = time.perf_counter()
+        self.finished = None
+        export_jobs.set(self.id, self)
+
+    def step(self, n: int = 1):
+        self.students += n
+        if self.students % PROGRESS_EVERY < n:
+            log.info("export %s (%s): %d students, %.0f/s", self.id, self.kind, self.students, self.rate())
+
+    def done(self):
+        self.finished = time.perf_counter()
+        log.info("export %s (%s) finished: %d students in %.2fs (%.0f/s)", self.id, self.kind,
+                 self.students, self.finished - self.started, self.rate())
+
+    def rate(self) -> float:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        return self.students / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "kind": self.kind, "students": self.students, "running": self.finished is None,
+                "elapsed_s": round((self.finished or time.perf_counter()) - self.started, 2),
+                "students_per_sec": round(self.rate(), 1)}
+
+
+def _subjects() -> list:
+    db = SessionLocal()
+    try:
+        return db.execute(select(Subject.id, Subject.code, Subject.name, Subject.credits).order_by(Subject.id)).all()
+    finally:
+        db.close()
+
+def _current_term() -> int:
+    db = SessionLocal()
+    try:
+        return current_term_id(db)
+    finally:
+        db.close()
+
+def _export_stmt(term_id: int, division_id: Optional[int], batch: Optional[str], elective: Optional[str]):
+    stmt = (
+        select(*STUDENT_COLUMNS, Mark.subject_id, Mark.marks, Mark.grade, Mark.grade_points)
+        .outerjoin(Mark, and_(Mark.student_id == Student.id, Mark.term_id == term_id))
+        .order_by(Student.id, Mark.subject_id)
+    )
+    if division_id is not None:
+        stmt = stmt.where(Student.division_id == division_id)
+    if batch is not None:
+        stmt = stmt.where(Student.batch == batch)
+    if elective is not None:
+        stmt = stmt.where(Student.elective == elective)
+    return stmt
+
+def iter_students(subjects: list, division_id=None, batch=None, elective=None):
+    # Yields (student dict, {subject_id: (marks, grade, grade_points)}, cgpa)
+    credits = {s.id: s.credits for s in subjects}
+    width = len(STUDENT_COLUMNS)
+    rows = iter_rows(_export_stmt(_current_term(), division_id, batch, elective))
+    for _, group in groupby(rows, key=lambda r: r[0]):
+        group = list(group)
+        student = dict(zip(STUDENT_FIELDS, group[0][:width]))
+        marks = {r[width]: tuple(r[width + 1:]) for r in group if r[width] is not None}
+        cgpa, _ = weighted_gpa((m[2], credits.get(sid, 0)) for sid, m in marks.items())
+        yield student, marks, cgpa
+
+def _sheet_header(subjects: list) -> list:
+    header = ["roll_no", "student_code", "name", "division_id", "batch", "elective"]
+    for s in subjects:
+        header += [f"{s.code} marks", f"{s.code} grade"]
+    return header + ["cgpa"]
+
+def _sheet_row(subjects: list, student: dict, marks: dict, cgpa: float) -> list:
+    row = [student["roll_no"], student["student_code"], student["name"], student["division_id"],
+           student["batch"], student["elective"]]
+    for s in subjects:
+        m = marks.get(s.id)
+        row += [m[0], m[1]] if m else [None, None]
+    return row + [cgpa]
+
+def results_csv(division_id=None, batch=None, elective=None):
+    subjects = _subjects()
+    progress = ExportProgress("csv")
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(_sheet_header(subjects))
+    for student, marks, cgpa in iter_students(subjects, division_id, batch, elective):
+        writer.writerow(_sheet_row(subjects, student, marks, cgpa))
+        progress.step()
+        if buf.tell() >= 64 * 1024:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    progress.done()
+    yield buf.getvalue()
+
+def results_xlsx(division_id=None, batch=None, elective=None, chunk_size: int = 64 * 1024):
+    # openpyxl's write-only workbook spools rows to disk, and the finished file
+    # is streamed back in chunks; nothing proportional to the row count is kept
+    # in memory.
+    from openpyxl import Workbook
+    subjects = _subjects()
+    progress = ExportProgress("xlsx")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Results")
+    ws.append(_sheet_header(subjects))
+    for student, marks, cgpa in iter_students(subjects, division_id, batch, elective):
+        ws.append(_sheet_row(subjects, student, marks, cgpa))
+        progress.step()
+    with tempfile.TemporaryFile() as f:
+        wb.save(f)
+        progress.done()
+        f.seek(0)
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+
+def _pdf_text(s) -> str:
+    s = "" if s is None else str(s)
+    return s.encode("latin-1", "replace").decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def render_marksheet(item) -> tuple:
+    # Runs in the process pool: (student, [(code, name, marks, grade, gp)], cgpa)
+    # -> (file name, single-page PDF bytes). Plain PDF using the built-in
+    # Courier font, so no PDF library is needed.
+    student, marks, cgpa = item
+    lines = [
+        "Student Result Marksheet",
+        "",
+        f"Name: {student['name']}",
+        f"Roll No: {student['roll_no']}    Code: {student['student_code']}",
+        f"Division: {student['division_id'] or '-'}    Batch: {student['batch'] or '-'}    Elective: {student['elective'] or '-'}",
+        "",
+        f"{'Code':<8}{'Subject':<36}{'Marks':>6}{'Grade':>7}{'Points':>8}",
+    ]
+    for code, name, m, grade, gp in marks:
+        lines.append(f"{code:<8}{name[:34]:<36}{m:>6}{grade:>7}{gp:>8.1f}")
+    lines += ["", f"CGPA: {cgpa:.2f}"]
+    text = " ".join(f"({_pdf_text(line)}) '" for line in lines)
+    content = f"BT /F1 11 Tf 14 TL 50 800 Td {text} ET".encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return f"{student['roll_no']}_{student['student_code']}.pdf", bytes(out)
+
+
+class _ZipSink:
+    # Write-only, unseekable file object: zipfile then emits data descriptors
+    # and the archive can be streamed while it is written.
+    def __init__(self):
+        self.buf = bytearray()
+
+    def write(self, data) -> int:
+        self.buf += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self.buf)
+        self.buf.clear()
+        return data
+
+def marksheets_zip(division_id=None, batch=None, elective=None, workers: int = None):
+    subjects = _subjects()
+    names = {s.id: (s.code, s.name) for s in subjects}
+    progress = ExportProgress("marksheets")
+    items = (
+        (student, [(*names[sid], *m) for sid, m in sorted(marks.items())], cgpa)
+        for student, marks, cgpa in iter_students(subjects, division_id, batch, elective)
+    )
+    sink = _ZipSink()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool, \
+            zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        while True:
+            batch_items = list(islice(items, PDF_BATCH))
+            if not batch_items:
+                break
+            for name, pdf in pool.map(render_marksheet, batch_items, chunksize=16):
+                zf.writestr(name, pdf)
+            progress.step(len(batch_items))
+            yield sink.drain()
+    progress.done()
+    yield sink.drain()
@@ -0,0 +1,258 @@
+# Grading engine.
+#
+# A scheme maps marks to (letter, grade points) through ascending cutoffs: a
+# mark gets the grade of the highest cutoff it reaches, looked up for whole
+# arrays at once with numpy.searchsorted. Subjects without a grade_schemes row
+# use DEFAULT_SCHEME (the O / A+ / ... / F table from utils.grade_from_marks).
+#   absolute: cutoffs are marks.
+#   relative: cutoffs are percentiles of the subject's marks, resolved to mark
+#             cutoffs (never below pass_mark) whenever the subject is
+#             re-graded; until then marks are graded with DEFAULT_SCHEME.
+# regrade() rewrites grade / grade_points of the current term's marks with one
+# UPDATE ... CASE per subject and refreshes the materialized results; marks of
+# earlier terms and superseded attempts keep the grades they were given:
+#   python -m app.grading [--subject CODE ...]
+import json
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+from .analytics import mark_written
+from .cache import LRUCache
+from .models import GradeScheme, Mark, Subject
+from .results import refresh_results
+from .terms import current_term_id
+
+KINDS = ("absolute", "relative")
+REFRESH_BATCH = 1000
+
+
+@dataclass(frozen=True)
+class Scheme:
+    kind: str
+    cutoffs: Tuple[float, ...]  # one per letter after the first, ascending
+    letters: Tuple[str, ...]  # lowest grade first
+    points: Tuple[float, ...]
+    pass_mark: int = 40
+
+    def validate(self) -> None:
+        if self.kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        if len(self.letters) < 2 or len(self.points) != len(self.letters) or len(self.cutoffs) != len(self.letters) - 1:
+            raise ValueError("need one cutoff per letter after the first and one points value per letter")
+        if any(len(letter) > 4 for letter in self.letters):
+            raise ValueError("letters are at most 4 characters")
+        if list(self.cutoffs) != sorted(self.cutoffs):
+            raise ValueError("cutoffs must be ascending")
+        if not all(0 <= c <= 100 for c in self.cutoffs):
+            raise ValueError("cutoffs must be between 0 and 100")
+        if any(p < 0 for p in self.points) or list(self.points) != sorted(self.points):
+            raise ValueError("points must be non-negative and ascending")
+        if not 0 <= self.pass_mark <= 100:
+            raise ValueError("pass_mark must be between 0 and 100")
+
+    def to_row(self, subject_id: int) -> dict:
+        return {"subject_id": subject_id, "kind": self.kind, "cutoffs": json.dumps(list(self.cutoffs)),
+                "letters": json.dumps(list(self.letters)), "points": json.dumps(list(self.points)),
+                "pass_mark": self.pass_mark}
+
+    @classmethod
+    def from_row(cls, row: GradeScheme) -> "Scheme":
+        return cls(row.kind, tuple(json.loads(row.cutoffs)), tuple(json.loads(row.letters)),
+                   tuple(json.loads(row.points)), row.pass_mark)
+
+    def as_dict(self) -> dict:
+        return {"kind": self.kind, "cutoffs": list(self.cutoffs), "letters": list(self.letters),
+                "points": list(self.points), "pass_mark": self.pass_mark}
+
+
+DEFAULT_SCHEME = Scheme("absolute", (40, 50, 60, 70, 80, 90), ("F", "C", "B", "B+", "A", "A+", "O"),
+                        (0.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0))
+
+
+class Grader:
+    # A scheme with its cutoffs resolved to marks.
+
+    def __init__(self, cutoffs: Sequence[float], letters: Sequence[str], points: Sequence[float]):
+        self.cutoffs = np.asarray(cutoffs, dtype=np.float64)
+        self.letters = np.array(letters, dtype=object)
+        self.points = np.asarray(points, dtype=np.float64)
+        self._pairs = list(zip(self.letters.tolist(), self.points.tolist()))
+
+    def grade_array(self, marks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        idx = np.searchsorted(self.cutoffs, marks, side="right")
+        return self.letters[idx], self.points[idx]
+
+    def grade(self, values: Iterable[int]) -> List[Tuple[str, float]]:
+        # Returns [(letter, points), ...] like utils.grades_from_marks
+        pairs = self._pairs
+        idx = np.searchsorted(self.cutoffs, np.fromiter(values, dtype=np.float64), side="right")
+        return [pairs[i] for i in idx.tolist()]
+
+    def case(self, column) -> tuple:
+        # (letter, points) SQL CASE expressions with the same semantics as grade_array
+        whens = range(len(self.cutoffs) - 1, -1, -1)
+        letter = case(*((column >= float(self.cutoffs[i]), self.letters[i + 1]) for i in whens), else_=self.letters[0])
+        points = case(*((column >= float(self.cutoffs[i]), float(self.points[i + 1])) for i in whens),
+                      else_=float(self.points[0]))
+        return letter, points
+
+    def as_dict(self) -> dict:
+        return {"cutoffs": self.cutoffs.tolist(), "letters": self.letters.tolist(), "points": self.points.tolist()}
+
+    @classmethod
+    def for_scheme(cls, scheme: Scheme, resolved: Optional[Sequence[float]] = None) -> "Grader":
+        if scheme.kind == "absolute":
+            return cls(scheme.cutoffs, scheme.letters, scheme.points)
+        if resolved is None:
+            return DEFAULT_GRADER
+        return cls(resolved, scheme.letters, scheme.points)
+
+
+DEFAULT_GRADER = Grader.for_scheme(DEFAULT_SCHEME)
+
+# subject id -> Grader; dropped by set_scheme() / regrade() in this process and
+# otherwise refreshed after a minute
+_graders = LRUCache(maxsize=1024, ttl=60)
+
+
+def resolve(scheme: Scheme, marks: np.ndarray) -> Optional[List[float]]:
+    # mark cutoffs for a relative scheme over the subject's current marks
+    if scheme.kind == "absolute":
+        return list(scheme.cutoffs)
+    if marks.size == 0:
+        return None
+    cutoffs = np.percentile(marks, scheme.cutoffs, method="lower")
+    return np.maximum(cutoffs, scheme.pass_mark).tolist()
+
+def load_scheme(db: Session, subject_id: int) -> Tuple[Scheme, Optional[List[float]]]:
+    row = db.get(GradeScheme, subject_id)
+    if row is None:
+        return DEFAULT_SCHEME, None
+    return Scheme.from_row(row), (json.loads(row.resolved) if row.resolved else None)
+
+def grader_for(db: Session, subject_id: int) -> Grader:
+    grader = _graders.get(subject_id)
+    if grader is None:
+        grader = Grader.for_scheme(*load_scheme(db, subject_id))
+        _graders.set(subject_id, grader)
+    return grader
+
+def grade_rows(db: Session, subject_ids: Sequence[int], marks: Sequence[int]) -> List[Tuple[str, float]]:
+    # Grades parallel (subject_id, marks) sequences, one searchsorted per subject.
+    subject_ids = np.asarray(subject_ids)
+    marks = np.asarray(marks, dtype=np.float64)
+    letters = np.empty(marks.size, dtype=object)
+    points = np.empty(marks.size, dtype=np.float64)
+    for subject_id in np.unique(subject_ids):
+        mask = subject_ids == subject_id
+        letters[mask], points[mask] = grader_for(db, int(subject_id)).grade_array(marks[mask])
+    return list(zip(letters.tolist(), points.tolist()))
+
+def set_scheme(db: Session, subject_id: int, scheme: Optional[Scheme]) -> None:
+    # None restores the default scheme; the caller re-grades to apply it
+    if scheme is not None:
+        scheme.validate()
+    row = db.get(GradeScheme, subject_id)
+    if scheme is None:
+        if row is not None:
+            db.delete(row)
+    elif row is None:
+        db.add(GradeScheme(**scheme.to_row(subject_id)))
+    else:
+        for key, value in scheme.to_row(subject_id).items():
+            setattr(row, key, value)
+        row.resolved = None
+    db.commit()
+    _graders.invalidate(subject_id)
+
+def regrade_marks(db: Session, subject_ids: Sequence[int]) -> int:
+    # One UPDATE marks SET grade = CASE ..., grade_points = CASE ... per subject
+    # over the current term; the caller commits.
+    marks_table = Mark.__table__
+    term_id = current_term_id(db)
+    updated = 0
+    for subject_id in subject_ids:
+        scheme, _ = load_scheme(db, subject_id)
+        resolved = None
+        if scheme.kind == "relative":
+            marks = np.fromiter(db.scalars(select(Mark.marks).where(Mark.term_id == term_id, Mark.subject_id == subject_id)),
+                                dtype=np.float64)
+            resolved = resolve(scheme, marks)
+            db.execute(update(GradeScheme).where(GradeScheme.subject_id == subject_id)
+                       .values(resolved=json.dumps(resolved) if resolved else None))
+        grader = Grader.for_scheme(scheme, resolved)
+        letter, points = grader.case(marks_table.c.marks)
+        result = db.execute(update(marks_table).where(marks_table.c.term_id == term_id, marks_table.c.subject_id == subject_id)
+                            .values(grade=letter, grade_points=points))
+        updated += result.rowcount
+        _graders.set(subject_id, grader)
+    return updated
+
+def regrade(db: Session, subject_ids: Optional[Sequence[int]] = None) -> Dict[str, int]:
+    # Re-grades every mark of the given subjects (all when None) in place and
+    # refreshes the affected students' materialized results.
+    if subject_ids is None:
+        subject_ids = db.scalars(select(Subject.id).order_by(Subject.id)).all()
+    updated = regrade_marks(db, subject_ids)
+    term_id = current_term_id(db)
+    refreshed = 0
+    last_id = 0
+    while subject_ids:
+        ids = db.scalars(
+            select(Mark.student_id).where(Mark.term_id == term_id, Mark.subject_id.in_(subject_ids), Mark.student_id > last_id)
+            .group_by(Mark.student_id).order_by(Mark.student_id).limit(REFRESH_BATCH)
+        ).all()
+        if not ids:
+            break
+        refreshed += refresh_results(db, ids)
+        last_id = ids[-1]
+    db.commit()
+    for subject_id in subject_ids:
+        mark_written(subject_id)
+    return {"subjects": len(subject_ids), "marks": updated, "results": refreshed}
+
+
+if __name__ == "__main__":
+    # With --api the re-grade runs in a running server (POST
+    # /admin/grading/regrade), which invalidates the caches of the worker that
+    # handles it. Without it the database is re-graded directly and running
+    # servers only notice as their caches expire: ETags after
+    # RESPONSE_CACHE_LOCAL_TTL (at once with RESPONSE_CACHE_URL, whose shared
+    # versions are bumped here), graders after 60 s, analytics after
+    # ANALYTICS_CACHE_TTL.
+    import argparse
+    import asyncio
+    import time
+    from .apiclient import AdminApi
+    from .config import settings
+    from .database import SessionLocal
+    from .httpcache import response_cache
+
+    parser = argparse.ArgumentParser(description="re-grade marks with the configured grade schemes")
+    parser.add_argument("--subject", action="append", default=[], help="subject code (repeatable); default all")
+    parser.add_argument("--api", help="base URL of a running server to re-grade through, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--user", default="admin", help="admin username for --api (password: SRMS_ADMIN_PASSWORD or prompt)")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        ids = None
+        if args.subject:
+            ids = db.scalars(select(Subject.id).where(Subject.code.in_(args.subject))).all()
+        started = time.perf_counter()
+        if args.api:
+            db.close()
+            api = AdminApi(args.api, args.user)
+            results = [api.call("POST", "/admin/grading/regrade" + (f"?subject_id={i}" if i else ""))
+                       for i in (ids if ids is not None else [None])]
+            stats = {k: sum(r[k] for r in results) for k in ("subjects", "marks", "results")}
+        else:
+            stats = regrade(db, ids)
+            if settings.RESPONSE_CACHE_URL:
+                asyncio.run(response_cache.bump("grades"))
+        elapsed = time.perf_counter() - started
+        print(f"re-graded {stats['marks']} marks in {stats['subjects']} subjects, "
+              f"refreshed {stats['results']} results in {elapsed:.2f}s")
+    finally:
+        db.close()
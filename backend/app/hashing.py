@@ -0,0 +1,49 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, List
+from .config import settings
+from .utils import hash_password, verify_password
+
+# pbkdf2 runs inside hashlib with the GIL released, so a small thread pool is
+# enough to keep login verification off the event loop without starving it.
+_verify_executor = ThreadPoolExecutor(max_workers=settings.VERIFY_WORKERS, thread_name_prefix="pw-verify")
+# hash_many's process pools by size, started on first use and kept for the
+# life of the process, so a seeding run pays the worker start-up once rather
+# than once per chunk; a forked child starts its own
+_hash_pools = {}
+
+
+def hash_workers() -> int:
+    return settings.HASH_WORKERS or os.cpu_count() or 1
+
+def _hash_pool(workers: int) -> ProcessPoolExecutor:
+    pid, pool = _hash_pools.get(workers, (None, None))
+    if pid != os.getpid():
+        pool = ProcessPoolExecutor(max_workers=workers)
+        _hash_pools[workers] = (os.getpid(), pool)
+    return pool
+
+def shutdown_hash_pools() -> None:
+    for pid, pool in _hash_pools.values():
+        if pid == os.getpid():
+            pool.shutdown()
+    _hash_pools.clear()
+
+def hash_many(passwords: Iterable[str], workers: int = None) -> List[str]:
+    # Batch API for provisioning: spreads the hashes over a process pool and
+    # returns them in input order.
+    passwords = list(passwords)
+    workers = workers or hash_workers()
+    if workers <= 1 or len(passwords) <= 1:
+        return [hash_password(pw) for pw in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(_hash_pool(workers).map(hash_password, passwords, chunksize=chunksize))
+
+async def hash_password_async(pw: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_verify_executor, hash_password, pw)
+
+async def verify_password_async(pw: str, pw_hash: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_verify_executor, verify_password, pw, pw_hash)
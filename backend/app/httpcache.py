@@ -0,0 +1,143 @@
+# Conditional GET (ETag / If-None-Match) for read-mostly endpoints.
+#
+# Every cacheable response depends on one or more version keys such as
+# ("student", id), ("teacher", id) or "subjects". Write paths call bump() for
+# the keys they touched after committing. Reads derive the ETag from the
+# current versions, so a matching If-None-Match is answered with 304 before any
+# database work. Rendered bodies are kept in an in-process LRU keyed by ETag.
+#
+# Versions live in-process by default, which is exact for a single worker
+# only: a worker sees just the writes it handled itself. Each local version is
+# therefore renewed RESPONSE_CACHE_LOCAL_TTL seconds after it was issued, which
+# bounds how long another worker's write can go unseen (a new version means a
+# new ETag, so clients get a freshly built body). With several workers set
+# RESPONSE_CACHE_URL=redis://host:6379/0 so all of them share the counters.
+#
+# With read replicas a body may be built from a replica that has not replayed
+# the write yet, so bumped keys are bumped again REPLICA_STICKY_SECONDS later.
+import asyncio
+import hashlib
+import itertools
+import json
+import threading
+import uuid
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Tuple
+from fastapi import Request, Response
+from .cache import LRUCache
+from .config import settings
+from .metrics import stage
+
+BODY_CACHE_SIZE = 2048
+
+
+class LocalVersions:
+    # Missing keys get a fresh number from a process-wide sequence, so a key that
+    # was evicted (or never seen) can never reproduce an ETag issued earlier;
+    # the random epoch does the same across restarts. With a ttl a version
+    # expires that many seconds after it was issued and the key gets a new one.
+
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions = LRUCache(maxsize=maxsize, ttl=ttl or None)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    async def get(self, keys: Tuple[Hashable, ...]) -> List[int]:
+        with self._lock:
+            versions = []
+            for key in keys:
+                version = self._versions.get(key)
+                if version is None:
+                    version = next(self._seq)
+                    self._versions.set(key, version)
+                versions.append(version)
+            return versions
+
+    async def bump(self, keys: Iterable[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                self._versions.set(key, next(self._seq))
+
+
+class RedisVersions:
+    # Shared counters (INCR) so every worker agrees on the current versions.
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_URL needs the redis package (pip install redis)")
+        self.epoch = "r"
+        self._redis = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _name(key: Hashable) -> str:
+        return "srms:version:" + (":".join(map(str, key)) if isinstance(key, tuple) else str(key))
+
+    async def get(self, keys: Tuple[Hashable, ...]) -> List[int]:
+        return [int(v or 0) for v in await self._redis.mget([self._name(k) for k in keys])]
+
+    async def bump(self, keys: Iterable[Hashable]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.incr(self._name(key))
+            await pipe.execute()
+
+
+class ResponseCache:
+    def __init__(self, versions, rebump_after: float = 0):
+        self.versions = versions
+        self.bodies = LRUCache(maxsize=BODY_CACHE_SIZE)
+        self.not_modified = 0
+        self.rebump_after = rebump_after
+        self._rebumps = set()
+
+    async def bump(self, *keys: Hashable) -> None:
+        await self.versions.bump(keys)
+        if self.rebump_after:
+            asyncio.get_running_loop().call_later(self.rebump_after, self._rebump, keys)
+
+    def _rebump(self, keys: Tuple[Hashable, ...]) -> None:
+        task = asyncio.ensure_future(self.versions.bump(keys))
+        self._rebumps.add(task)
+        task.add_done_callback(self._rebumps.discard)
+
+    def _etag(self, resource: str, query: str, versions: List[int]) -> str:
+        raw = f"{self.versions.epoch}|{resource}|{query}|{versions}".encode()
+        return '"' + hashlib.blake2b(raw, digest_size=12).hexdigest() + '"'
+
+    async def respond(self, request: Request, resource: str, keys: Tuple[Hashable, ...],
+                      build: Callable[[], Awaitable[Tuple[str, Dict[str, str]]]]) -> Response:
+        # build() renders (json body, extra headers) and only runs on a body-cache miss
+        etag = self._etag(resource, request.url.query, await self.versions.get(keys))
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+        if etag in _parse_if_none_match(request.headers.get("if-none-match", "")):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        entry = self.bodies.get(etag)
+        if entry is None:
+            entry = await build()
+            self.bodies.set(etag, entry)
+        body, extra = entry
+        return Response(content=body, media_type="application/json", headers={**headers, **extra})
+
+    def stats(self) -> dict:
+        body = self.bodies.stats()
+        return {"size": body["size"], "hits": body["hits"], "misses": body["misses"],
+                "evictions": body["evictions"], "not_modified": self.not_modified}
+
+
+def _parse_if_none_match(value: str) -> List[str]:
+    # weak validators compare equal for GET revalidation
+    return [tag.strip().removeprefix("W/") for tag in value.split(",") if tag.strip()]
+
+def dumps(value) -> str:
+    with stage("serialize"):
+        return json.dumps(value, separators=(",", ":"))
+
+
+response_cache = ResponseCache(
+    RedisVersions(settings.RESPONSE_CACHE_URL) if settings.RESPONSE_CACHE_URL
+    else LocalVersions(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_LOCAL_TTL),
+    rebump_after=settings.REPLICA_STICKY_SECONDS if settings.DATABASE_REPLICA_URLS else 0,
+)
@@ -1,14 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from .database import Base, engine, SessionLocal
+from . import database
+from .database import pool_counters, pool_stats
+from .config import settings
+from . import metrics
+from .profiler import profiler
+from .deps import get_session, principal_cache_stats
+from .analytics import analytics_cache
+from .httpcache import response_cache
+from .writebehind import write_behind
+from .replicas import read_replicas
+from .ratelimit import RateLimitMiddleware, rate_limiter
 from .models import User, RoleEnum
-from .utils import verify_password
+from .hashing import verify_password_async
 from .auth import create_access_token
 from .schemas import LoginIn, Token, UserOut
-from .routers import admin, teacher, student
+from .routers import admin, teacher, student, analytics, export, grading
 
-app = FastAPI(title="Student Result Management System")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # runs in each worker after the fork, so the sampler thread belongs to it
+    if settings.PROFILER_ENABLED:
+        profiler.enable()
+    if write_behind is not None:
+        await write_behind.start()
+    if read_replicas is not None:
+        await read_replicas.start()
+    yield
+    if read_replicas is not None:
+        await read_replicas.stop()
+    if write_behind is not None:
+        await write_behind.stop()
+    profiler.disable()
+
+app = FastAPI(title="Student Result Management System", lifespan=lifespan,
+              default_response_class=metrics.TimedJSONResponse if settings.METRICS_ENABLED else JSONResponse)
+
+if rate_limiter is not None:
+    # innermost middleware: runs after CORS, before routing and any DB work
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,34 +50,80 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "Retry-After"],
 )
 
-Base.metadata.create_all(bind=engine)
+if settings.METRICS_ENABLED:
+    # added last so it wraps CORS and sees the full request time
+    app.add_middleware(metrics.MetricsMiddleware, profiler=profiler)
+    database.on_engine(metrics.instrument_engine)
+    metrics.collectors.append(lambda: metrics.counter_lines(
+        "srms_principal_cache", "Principal cache", principal_cache_stats(), ("hits", "misses", "evictions", "claims_trusted")))
+    metrics.collectors.append(lambda: metrics.counter_lines("srms_analytics_cache", "Analytics cache", analytics_cache.stats()))
+    metrics.collectors.append(lambda: metrics.counter_lines(
+        "srms_response_cache", "Response cache", response_cache.stats(), ("hits", "misses", "evictions", "not_modified")))
+    if write_behind is not None:
+        metrics.collectors.append(lambda: metrics.gauge_lines(
+            "srms_write_behind", "Mark write-behind", write_behind.stats(), ("queued",)))
+        metrics.collectors.append(lambda: metrics.counter_lines(
+            "srms_write_behind", "Mark write-behind", write_behind.stats(), ("batches", "written", "failed")))
+    if read_replicas is not None:
+        metrics.collectors.append(lambda: metrics.gauge_lines(
+            "srms_db_replica", "Read replicas", read_replicas.stats(), ("replicas", "healthy")))
+        metrics.collectors.append(lambda: metrics.counter_lines(
+            "srms_db_replica", "Read replica routing", read_replicas.stats(),
+            ("reads", "sticky_reads", "fallback_reads")))
+    if rate_limiter is not None:
+        metrics.collectors.append(lambda: metrics.gauge_lines(
+            "srms_rate_limit", "Rate limiter", rate_limiter.stats(), ("buckets",)))
+        metrics.collectors.append(lambda: metrics.counter_lines(
+            "srms_rate_limit", "Rate limiter", rate_limiter.stats(),
+            ("allowed", "rejected_ip", "rejected_login_ip", "rejected_login_user", "evictions", "backend_errors")))
+    metrics.collectors.append(lambda: metrics.gauge_lines(
+        "srms_db_pool", "Connection pool", pool_stats(database.get_async_engine() or database.get_engine()), ("size", "checked_out", "overflow")))
+    metrics.collectors.append(lambda: metrics.counter_lines(
+        "srms_db_pool", "Connection pool", pool_counters, ("timeouts", "pings", "stale")))
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def _find_user(db: Session, username: str):
+    row = db.execute(
+        select(User.id, User.role, User.student_id, User.password_hash).where(User.username == username)
+    ).first()
+    # end the read transaction so the pooled connection is not held through the password check
+    db.rollback()
+    return row
 
 @app.post("/auth/login", response_model=Token, tags=["auth"])
-def login(payload: LoginIn):
-    db: Session = SessionLocal()
-    try:
-        u = db.query(User).filter(User.username == payload.username).first()
-        if not u or not verify_password(payload.password, u.password_hash):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        token = create_access_token({"sub": u.id, "role": u.role.value})
-        return {"access_token": token, "token_type": "bearer"}
-    finally:
-        db.close()
+async def login(payload: LoginIn, db=Depends(get_session)):
+    # pbkdf2 verification runs in the bounded verify executor, never on the event loop
+    with metrics.stage("user_lookup"):
+        u = await db.run_sync(_find_user, payload.username)
+    if not u:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    with metrics.stage("password_verify"):
+        valid = await verify_password_async(payload.password, u.password_hash)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    token = create_access_token({"sub": u.id, "role": u.role.value, "sid": u.student_id})
+    return {"access_token": token, "token_type": "bearer"}
+
+def _get_user(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
 
 @app.get("/auth/me", response_model=UserOut, tags=["auth"])
-def me(token: str):
+async def me(token: str, db=Depends(get_session)):
     # This endpoint is intentionally simple for demo, use /student/me etc. with auth guards for role routes
-    db: Session = SessionLocal()
-    try:
-        u = db.query(User).filter(User.username == token).first()
-        if not u:
-            raise HTTPException(status_code=404, detail="Not found")
-        return u
-    finally:
-        db.close()
+    u = await db.run_sync(_get_user, token)
+    if not u:
+        raise HTTPException(status_code=404, detail="Not found")
+    return u
 
 app.include_router(admin.router)
 app.include_router(teacher.router)
 app.include_router(student.router)
+app.include_router(analytics.router)
+app.include_router(export.router)
+app.include_router(grading.router)
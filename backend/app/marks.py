@@ -0,0 +1,83 @@
+# Mark write helpers shared by the teacher routes and batch jobs, and the
+# dialect upsert they (and app.results) are built on.
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import List
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from .models import Mark, MarkArchive
+
+UPDATE_COLUMNS = ("marks", "grade", "grade_points")
+HOT_KEY = ("student_id", "term_id", "subject_id")
+ARCHIVE_KEY = HOT_KEY + ("attempt",)
+ARCHIVED_COLUMNS = ARCHIVE_KEY + ("marks", "grade", "grade_points", "created_by", "created_at")
+
+
+def upsert_rows(db: Session, table, rows: List[dict], key: tuple, columns: tuple = UPDATE_COLUMNS, **values) -> None:
+    # Single multi-row INSERT ... ON DUPLICATE KEY / ON CONFLICT on the unique
+    # key; on a conflict only `columns` take the new row's values, plus any
+    # extra SET expressions given as keywords.
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update({**{c: stmt.inserted[c] for c in columns}, **values})
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={**{c: stmt.excluded[c] for c in columns}, **values},
+        )
+    else:
+        raise RuntimeError(f"upsert not supported on {dialect}; supported: mysql, sqlite, postgresql")
+    db.execute(stmt)
+
+def upsert_marks(db: Session, rows: List[dict]) -> None:
+    # rows: student_id, subject_id, term_id, attempt, marks, grade, grade_points,
+    # created_by, optionally updated_at (default: now). The highest attempt per
+    # (student, term, subject) becomes the effective mark in the hot table,
+    # upserted on uq_mark_per_term (so created_by is only set for new rows);
+    # the mark it replaces and any lower attempt (a late correction) are kept
+    # in mark_archive as superseded.
+    if not rows:
+        return
+    # the DateTime columns hold naive UTC
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    by_key = {}
+    for row in rows:
+        # the last row for an attempt wins
+        by_key.setdefault(tuple(row[k] for k in HOT_KEY), {})[row["attempt"]] = row
+    hot, archived, replaced = [], [], []
+    for (term_id, subject_id), keys in groupby(sorted(by_key, key=lambda k: k[1:]), key=lambda k: k[1:]):
+        keys = list(keys)
+        existing = {r.student_id: r for r in db.execute(
+            select(Mark.id, *(getattr(Mark, c) for c in ARCHIVED_COLUMNS))
+            .where(Mark.term_id == term_id, Mark.subject_id == subject_id, Mark.student_id.in_([k[0] for k in keys]))
+        )}
+        for key in keys:
+            attempts = by_key[key]
+            top = max(attempts)
+            archived += [dict(attempts[a], created_at=now) for a in attempts if a != top]
+            current = existing.get(key[0])
+            if current is None or current.attempt == top:
+                hot.append(attempts[top])
+            elif current.attempt < top:
+                if current.attempt not in attempts:
+                    archived.append({c: getattr(current, c) for c in ARCHIVED_COLUMNS})
+                replaced.append(current.id)
+                hot.append(attempts[top])
+            else:
+                archived.append(dict(attempts[top], created_at=now))
+    if archived:
+        upsert_rows(db, MarkArchive.__table__,
+                [{**{c: r[c] for c in ARCHIVED_COLUMNS}, "superseded": True, "archived_at": now} for r in archived],
+                ARCHIVE_KEY)
+    if replaced:
+        db.execute(delete(Mark).where(Mark.id.in_(replaced)))
+    if hot:
+        upsert_rows(db, Mark.__table__, [dict(r, updated_at=r.get("updated_at") or now) for r in hot], HOT_KEY,
+                    UPDATE_COLUMNS + ("updated_at",))
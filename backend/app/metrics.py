@@ -0,0 +1,192 @@
+# Request / SQL instrumentation exposed in the Prometheus text format.
+#
+# MetricsMiddleware times every request and keeps a per-request RequestStats in
+# a context variable. The context is copied into threadpool calls and into the
+# AsyncSession greenlets, so the SQLAlchemy cursor events and stage() timers
+# can attribute work to the request that caused it.
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def summary(self, *label_values) -> Tuple[int, float]:
+        # (observations, total) for one series
+        with self._lock:
+            series = self._series.get(label_values)
+            return (sum(series[:-1]), series[-1]) if series else (0, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for label_values, series in sorted(items):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {cumulative}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram("srms_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+REQUEST_QUERIES = Histogram("srms_request_queries", "SQL statements per request", ("method", "route"), COUNT_BUCKETS)
+QUERY_SECONDS = Histogram("srms_db_query_duration_seconds", "SQL statement execution time")
+POOL_CHECKOUT_WAIT = Histogram("srms_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection")
+STAGE_SECONDS = Histogram("srms_stage_duration_seconds", "Time spent in request pipeline stages", ("stage",))
+HISTOGRAMS = [REQUEST_SECONDS, REQUEST_QUERIES, QUERY_SECONDS, POOL_CHECKOUT_WAIT, STAGE_SECONDS]
+
+# extra callables returning exposition lines (cache counters, pool gauges, ...)
+collectors: List[Callable[[], List[str]]] = []
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds", "stages")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.stages: Dict[str, float] = {}
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("srms_request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        stats = _current.get()
+        if stats is not None:
+            stats.stages[name] = stats.stages.get(name, 0.0) + elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("srms_query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("srms_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    QUERY_SECONDS.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+
+def instrument_engine(engine) -> None:
+    # accepts a sync Engine or an AsyncEngine
+    engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    # Pure ASGI middleware (no BaseHTTPMiddleware task hop). Routes are labelled
+    # by their path template so label cardinality stays bounded.
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        sample = self.profiler.begin() if self.profiler is not None and self.profiler.enabled else None
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.observe(elapsed, scope["method"], path, str(status))
+            REQUEST_QUERIES.observe(stats.queries, scope["method"], path)
+            if sample is not None:
+                self.profiler.end(sample, f"{scope['method']} {path}", status, elapsed, stats)
+
+def render() -> str:
+    lines: List[str] = []
+    for h in HISTOGRAMS:
+        lines += h.render()
+    for collect in collectors:
+        lines += collect()
+    return "\n".join(lines) + "\n"
+
+def counter_lines(prefix: str, help: str, stats: dict, keys=("hits", "misses", "evictions")) -> List[str]:
+    lines = []
+    for key in keys:
+        if key in stats:
+            lines += [f"# HELP {prefix}_{key}_total {help} {key}", f"# TYPE {prefix}_{key}_total counter",
+                      f"{prefix}_{key}_total {stats[key]}"]
+    if "size" in stats:
+        lines += [f"# TYPE {prefix}_size gauge", f"{prefix}_size {stats['size']}"]
+    return lines
+
+def gauge_lines(prefix: str, help: str, stats: dict, keys) -> List[str]:
+    lines = []
+    for key in keys:
+        if key in stats:
+            lines += [f"# HELP {prefix}_{key} {help} {key}", f"# TYPE {prefix}_{key} gauge",
+                      f"{prefix}_{key} {stats[key]}"]
+    return lines
+
+class TimedJSONResponse(JSONResponse):
+    # The app's default response class: rendering a route's result to JSON is
+    # timed as the "serialize" stage through Starlette's public render() hook.
+    # Bodies built by httpcache.dumps are timed there.
+    def render(self, content) -> bytes:
+        with stage("serialize"):
+            return super().render(content)
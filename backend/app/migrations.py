@@ -0,0 +1,89 @@
+# Idempotent schema migration: creates missing tables and any index declared
+# in models.py that the database does not have yet (create_all() skips indexes
+# on tables that already exist), upgrades a marks table from before terms and
+# makes sure there is a current term. Columns listed in ADDED_COLUMNS are
+# added to tables created before them, and materialized results in an older
+# payload format are dropped (they are rebuilt on their next read).
+#   python -m app.migrations
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from .database import Base, get_engine
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+from .terms import ensure_term
+
+# indexes of the pre-term marks table that the term-scoped ones replace
+LEGACY_MARK_INDEXES = ("uq_mark_per_subject", "ix_marks_student_result", "ix_marks_subject_marks")
+MARK_COLUMNS = "id, student_id, subject_id, marks, grade, grade_points, created_by, created_at"
+# (table, column) pairs added after the table was first released; all nullable
+ADDED_COLUMNS = (("marks", "updated_at"),)
+# every current student_results payload contains this
+RESULT_PAYLOAD_MARKER = '%"sgpa":%'
+
+
+def _upgrade_marks(engine: Engine, term_id: int) -> bool:
+    # Marks recorded before terms existed become attempt 1 of the current term.
+    if "term_id" in {c["name"] for c in inspect(engine).get_columns("marks")}:
+        return False
+    with engine.begin() as conn:
+        if conn.dialect.name == "mysql":
+            # a database upgraded from schema.sql alone lacks the indexes
+            # later migrations added; drop only those that exist
+            present = {ix["name"] for ix in inspect(conn).get_indexes("marks")}
+            conn.execute(text("ALTER TABLE marks ADD COLUMN term_id INTEGER NULL AFTER subject_id, "
+                              "ADD COLUMN attempt INTEGER NOT NULL DEFAULT 1 AFTER term_id"))
+            conn.execute(text("UPDATE marks SET term_id = :t"), {"t": term_id})
+            conn.execute(text("ALTER TABLE marks MODIFY term_id INTEGER NOT NULL, "
+                              "ADD CONSTRAINT fk_marks_term FOREIGN KEY (term_id) REFERENCES terms (id), "
+                              "ADD CONSTRAINT uq_mark_per_term UNIQUE (student_id, term_id, subject_id)"
+                              + "".join(f", DROP INDEX {name}" for name in LEGACY_MARK_INDEXES if name in present)))
+        elif conn.dialect.name == "sqlite":
+            # SQLite cannot drop a table constraint: rebuild the table
+            for ix in inspect(conn).get_indexes("marks"):
+                conn.execute(text(f"DROP INDEX {ix['name']}"))
+            conn.execute(text("ALTER TABLE marks RENAME TO marks_legacy"))
+            models.Mark.__table__.create(conn)
+            conn.execute(text(f"INSERT INTO marks ({MARK_COLUMNS}, term_id, attempt) "
+                              f"SELECT {MARK_COLUMNS}, :t, 1 FROM marks_legacy"), {"t": term_id})
+            conn.execute(text("DROP TABLE marks_legacy"))
+        else:
+            raise RuntimeError(f"marks upgrade not supported on {conn.dialect.name} (supported: mysql, sqlite); "
+                               "see sql/003_terms.sql")
+    return True
+
+def _add_columns(engine: Engine) -> None:
+    inspector = inspect(engine)
+    for table, column in ADDED_COLUMNS:
+        if column not in {c["name"] for c in inspector.get_columns(table)}:
+            type_ = Base.metadata.tables[table].c[column].type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {type_} NULL"))
+
+def _drop_stale_results(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM student_results WHERE payload NOT LIKE :marker"),
+                     {"marker": RESULT_PAYLOAD_MARKER})
+
+def upgrade(engine: Engine = None) -> list:
+    engine = engine or get_engine()
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        term_id = ensure_term(db)
+    created = ["uq_mark_per_term"] if _upgrade_marks(engine, term_id) else []
+    _add_columns(engine)
+    _drop_stale_results(engine)
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        existing |= {uc["name"] for uc in inspector.get_unique_constraints(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    return created
+
+
+if __name__ == "__main__":
+    for name in upgrade():
+        print("created index", name)
+    print("schema up to date")
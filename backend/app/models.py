@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Float, UniqueConstraint, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Float, UniqueConstraint, Index, DateTime, Text, Boolean, func
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 import enum
 from .database import Base
@@ -22,6 +23,11 @@ class User(Base):
     student = relationship("Student", back_populates="user", uselist=False)
     subjects = relationship("Subject", back_populates="teacher")
 
+    __table_args__ = (
+        # covers the keyset listing: WHERE role = ? AND id > ? ORDER BY id
+        Index("ix_users_role_listing", "role", "id", "username", "full_name"),
+    )
+
 class Student(Base):
     __tablename__ = "students"
     id = Column(Integer, primary_key=True, index=True)
@@ -36,13 +42,17 @@ class Student(Base):
     enrollments = relationship("Enrollment", back_populates="student")
     marks = relationship("Mark", back_populates="student")
 
+    __table_args__ = (
+        Index("ix_students_division_batch", "division_id", "batch"),
+    )
+
 class Subject(Base):
     __tablename__ = "subjects"
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String(16), unique=True, index=True, nullable=False)
     name = Column(String(128), nullable=False)
     credits = Column(Integer, nullable=False, default=4)
-    teacher_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    teacher_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
 
     teacher = relationship("User", back_populates="subjects")
     enrollments = relationship("Enrollment", back_populates="subject")
@@ -60,20 +70,83 @@ class Enrollment(Base):
         UniqueConstraint("student_id", "subject_id", name="uq_student_subject"),
     )
 
+class Term(Base):
+    # An exam term (semester). One term is current; archived terms keep their
+    # marks in mark_archive only (see app.terms).
+    __tablename__ = "terms"
+    id = Column(Integer, primary_key=True)
+    code = Column(String(32), unique=True, index=True, nullable=False)
+    name = Column(String(128), nullable=False)
+    is_current = Column(Boolean, nullable=False, default=False)
+    archived_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
 class Mark(Base):
+    # Hot tier: the effective (latest) attempt per student, term and subject.
     __tablename__ = "marks"
     id = Column(Integer, primary_key=True)
     student_id = Column(Integer, ForeignKey("students.id"), index=True, nullable=False)
     subject_id = Column(Integer, ForeignKey("subjects.id"), index=True, nullable=False)
+    term_id = Column(Integer, ForeignKey("terms.id"), nullable=False)
+    attempt = Column(Integer, nullable=False, default=1)
     marks = Column(Integer, nullable=False)  # 0-100
     grade = Column(String(4), nullable=False)
     grade_points = Column(Float, nullable=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)  # teacher user id
     created_at = Column(DateTime, server_default=func.now())
+    # UTC time the mark in effect was submitted (set by marks.upsert_marks), to
+    # microseconds; the write-behind queue never overwrites a newer write
+    updated_at = Column(DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql"), nullable=True)
 
     student = relationship("Student", back_populates="marks")
     subject = relationship("Subject", back_populates="marks")
 
     __table_args__ = (
-        UniqueConstraint("student_id", "subject_id", name="uq_mark_per_subject"),
+        UniqueConstraint("student_id", "term_id", "subject_id", name="uq_mark_per_term"),
+        # covering index for the per-student result join of the current term
+        Index("ix_marks_student_term_result", "student_id", "term_id", "subject_id", "marks", "grade", "grade_points"),
+        # per-subject analytics / toppers: WHERE term_id = ? AND subject_id = ? ORDER BY marks
+        Index("ix_marks_term_subject_marks", "term_id", "subject_id", "marks"),
     )
+
+class MarkArchive(Base):
+    # Archive tier: superseded attempts and the marks of archived terms. No
+    # foreign keys or secondary indexes; rows are only ever read per student.
+    __tablename__ = "mark_archive"
+    student_id = Column(Integer, primary_key=True, autoincrement=False)
+    term_id = Column(Integer, primary_key=True, autoincrement=False)
+    subject_id = Column(Integer, primary_key=True, autoincrement=False)
+    attempt = Column(Integer, primary_key=True, autoincrement=False)
+    marks = Column(Integer, nullable=False)
+    grade = Column(String(4), nullable=False)
+    grade_points = Column(Float, nullable=False)
+    created_by = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=True)
+    # True for an attempt replaced by a later one, False for the effective mark of an archived term
+    superseded = Column(Boolean, nullable=False, default=False)
+    archived_at = Column(DateTime, nullable=False)
+
+class GradeScheme(Base):
+    # Per-subject grading scheme (app.grading); subjects without a row use the
+    # default absolute cutoffs. cutoffs / letters / points are JSON lists; for
+    # relative schemes `resolved` caches the mark cutoffs of the last re-grade.
+    __tablename__ = "grade_schemes"
+    subject_id = Column(Integer, ForeignKey("subjects.id"), primary_key=True)
+    kind = Column(String(16), nullable=False, default="absolute")
+    cutoffs = Column(Text, nullable=False)
+    letters = Column(Text, nullable=False)
+    points = Column(Text, nullable=False)
+    pass_mark = Column(Integer, nullable=False, default=40)
+    resolved = Column(Text, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class StudentResult(Base):
+    # Materialized result per student: credit-weighted SGPA/CGPA plus the
+    # serialized /student/me/marks payload. Maintained by app.results.
+    __tablename__ = "student_results"
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    sgpa = Column(Float, nullable=False, default=0.0)
+    cgpa = Column(Float, nullable=False, default=0.0)
+    total_credits = Column(Integer, nullable=False, default=0)
+    payload = Column(Text, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
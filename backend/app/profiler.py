@@ -0,0 +1,116 @@
+# Sampling profiler for the slowest requests.
+#
+# When enabled, a background thread samples the stacks of all busy threads
+# every `interval` seconds and adds them to every request in flight, so
+# samples are exact at concurrency 1 and approximate under concurrency. The
+# `keep` slowest requests are retained with their stacks in the folded format
+# ("frame;frame;frame count") that flamegraph.pl, speedscope and inferno read.
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from .config import settings
+
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+# executor workers park inside a C-level SimpleQueue.get, so the leaf frame is the worker loop itself
+IDLE_LEAVES = {("thread.py", "_worker"), ("process.py", "_queue_management_worker")}
+
+
+class RequestSample:
+    __slots__ = ("samples", "started_at")
+
+    def __init__(self):
+        self.samples = Counter()
+        self.started_at = time.time()
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, keep: int = 10):
+        self.interval = interval
+        self.keep = keep
+        self.enabled = False
+        self._active = set()
+        self._slowest = []  # min-heap of (duration, seq, record)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def enable(self, interval: float = None) -> None:
+        if interval:
+            self.interval = interval
+        self.enabled = True
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="srms-profiler", daemon=True)
+            self._thread.start()
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slowest = []
+
+    def begin(self) -> RequestSample:
+        sample = RequestSample()
+        with self._lock:
+            self._active.add(sample)
+        return sample
+
+    def end(self, sample: RequestSample, route: str, status: int, elapsed: float, stats=None) -> None:
+        with self._lock:
+            self._active.discard(sample)
+            record = {
+                "route": route,
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+                "queries": getattr(stats, "queries", None),
+                "stages_ms": {k: round(v * 1000, 2) for k, v in getattr(stats, "stages", {}).items()},
+                "started_at": sample.started_at,
+                "samples": sample.samples,
+            }
+            entry = (elapsed, next(self._seq), record)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> list:
+        with self._lock:
+            return [r for _, _, r in sorted(self._slowest, reverse=True)]
+
+    def folded(self, index: int) -> Optional[str]:
+        records = self.slowest()
+        if not 0 <= index < len(records):
+            return None
+        return "".join(f"{stack} {n}\n" for stack, n in records[index]["samples"].most_common())
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while self.enabled:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            for tid, frame in sys._current_frames().items():
+                leaf = os.path.basename(frame.f_code.co_filename)
+                if tid == me or leaf in IDLE_FILES or (leaf, frame.f_code.co_name) in IDLE_LEAVES:
+                    continue
+                stack = _fold(frame)
+                for sample in active:
+                    sample.samples[stack] += 1
+
+def _fold(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+profiler = SamplingProfiler(interval=settings.PROFILER_INTERVAL_MS / 1000, keep=settings.PROFILER_KEEP)
@@ -0,0 +1,233 @@
+# Token-bucket rate limiting (RATE_LIMIT_ENABLED).
+#
+# RateLimitMiddleware runs ahead of routing, so a rejected request costs a
+# dictionary lookup: no session, no user lookup, no pbkdf2 verify. Every
+# request takes a token from its client IP's bucket (rule "ip"); POST
+# /auth/login also takes one from the IP's login bucket ("login_ip") and one
+# from the bucket of the username in the body ("login_user"), so guessing one
+# account's password is slow from any number of addresses. A request over a
+# limit gets 429 with Retry-After. The "ip" rule is checked before the login
+# body is read, and a login body over LOGIN_BODY_LIMIT bytes gets 413.
+#
+# Buckets live in-process by default (per worker, so the effective limit is
+# WEB_WORKERS times the configured one). With several workers set
+# RATE_LIMIT_URL=redis://host:6379/0 to share them; while Redis is unreachable
+# the in-process buckets take over.
+#
+# Behind a reverse proxy the client address is the proxy's unless uvicorn /
+# gunicorn are told to trust X-Forwarded-For (FORWARDED_ALLOW_IPS).
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .config import settings
+
+log = logging.getLogger("srms.ratelimit")
+
+LOGIN_PATH = "/auth/login"
+LOGIN_BODY_LIMIT = 4096
+EXEMPT_PATHS = ("/metrics",)
+RULES = ("ip", "login_ip", "login_user")
+
+
+class LocalBuckets:
+    # key -> (tokens, updated, full_at), kept in the order the buckets were last
+    # used. A bucket that has refilled to its burst is the same as a missing
+    # one, so idle buckets are dropped from the front as they fill up; beyond
+    # maxsize the least recently used go first. Only used from the event loop,
+    # so take() needs no lock.
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._buckets: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+
+    async def take(self, key: Tuple[str, str], rate: float, burst: float) -> float:
+        return self.take_now(key, rate, burst, time.monotonic())
+
+    def take_now(self, key: Tuple[str, str], rate: float, burst: float, now: float) -> float:
+        # 0 when a token was taken, otherwise seconds until one is available
+        bucket = self._buckets.pop(key, None)
+        tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        self._sweep(now)
+        return wait
+
+    def _sweep(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, (_, _, full_at) = next(iter(buckets.items()))
+            if full_at > now and len(buckets) <= self.maxsize:
+                break
+            del buckets[key]
+            if full_at > now:
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# tokens and timestamp in one hash per bucket, refilled and taken atomically
+# with the server's clock; the key expires once the bucket would be full
+_TAKE = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = burst
+if b[1] then tokens = math.min(burst, tonumber(b[1]) + math.max(0, now - tonumber(b[2])) * rate) end
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    # Shared buckets so the limits hold across workers and hosts.
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_URL needs the redis package (pip install redis)")
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.25)
+        self._take = self._redis.register_script(_TAKE)
+
+    @staticmethod
+    def _name(key: Tuple[str, str]) -> str:
+        return "srms:bucket:" + ":".join(key)
+
+    async def take(self, key: Tuple[str, str], rate: float, burst: float) -> float:
+        return float(await self._take(keys=[self._name(key)], args=[rate, burst]))
+
+
+class RateLimiter:
+    def __init__(self, rules: Dict[str, Tuple[float, float]], maxsize: int, shared=None):
+        # rule -> (tokens per second, burst); a rate of 0 turns the rule off
+        self.rules = {name: limit for name, limit in rules.items() if limit[0] > 0 and limit[1] >= 1}
+        self.local = LocalBuckets(maxsize)
+        self.shared = shared
+        self.allowed = 0
+        self.rejected = dict.fromkeys(RULES, 0)
+        self.backend_errors = 0
+
+    async def _take(self, key: Tuple[str, str], rate: float, burst: float) -> float:
+        if self.shared is not None:
+            try:
+                return await self.shared.take(key, rate, burst)
+            except Exception as exc:
+                if not self.backend_errors:
+                    log.warning("shared rate limit store unavailable, using in-process buckets: %s", exc)
+                self.backend_errors += 1
+        return await self.local.take(key, rate, burst)
+
+    async def check(self, checks: List[Tuple[str, str]], final: bool = True) -> float:
+        # checks are (rule, key) pairs; 0 when every rule allowed the request,
+        # otherwise the Retry-After of the first that did not. final=False for
+        # a request that still has checks to come, so it is counted once.
+        for rule, key in checks:
+            limit = self.rules.get(rule)
+            if limit is None or not key:
+                continue
+            wait = await self._take((rule, key), *limit)
+            if wait:
+                self.rejected[rule] += 1
+                return wait
+        self.allowed += final
+        return 0.0
+
+    def stats(self) -> dict:
+        return {"backend": "redis" if self.shared is not None else "local", "buckets": len(self.local),
+                "max_buckets": self.local.maxsize, "allowed": self.allowed,
+                "rejected": sum(self.rejected.values()), **{f"rejected_{r}": n for r, n in self.rejected.items()},
+                "evictions": self.local.evictions, "backend_errors": self.backend_errors,
+                "rules": {name: {"per_second": rate, "burst": burst} for name, (rate, burst) in self.rules.items()}}
+
+
+def _username(body: bytes) -> str:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return ""
+    username = payload.get("username") if isinstance(payload, dict) else None
+    # usernames compare case-insensitively under MySQL's default collation
+    return username.strip().casefold() if isinstance(username, str) else ""
+
+
+class RateLimitMiddleware:
+    # Pure ASGI middleware like metrics.MetricsMiddleware. Added inside CORS so
+    # preflights are not counted and a 429 still carries the CORS headers.
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        ip = (scope.get("client") or ("unknown",))[0]
+        login = scope["path"] == LOGIN_PATH and scope["method"] == "POST"
+        wait = await self.limiter.check([("ip", ip)], final=not login)
+        if not wait and login:
+            body, receive = await _buffer_body(receive, LOGIN_BODY_LIMIT)
+            if body is None:
+                await _reply(send, 413, b'{"detail":"Request body too large"}')
+                return
+            wait = await self.limiter.check([("login_ip", ip), ("login_user", _username(body))])
+        if wait:
+            await _reply(send, 429, b'{"detail":"Too many requests"}',
+                         [(b"retry-after", str(max(1, math.ceil(wait))).encode())])
+            return
+        await self.app(scope, receive, send)
+
+
+async def _buffer_body(receive, limit: int):
+    # reads the request body and returns it with a receive() that replays it;
+    # (None, None) once it grows past limit bytes
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            # client went away; let the app see the disconnect
+            return b"", _replay([message], receive)
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if size > limit:
+            return None, None
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks)
+    return body, _replay([{"type": "http.request", "body": body, "more_body": False}], receive)
+
+def _replay(messages: list, receive):
+    async def replay():
+        return messages.pop(0) if messages else await receive()
+    return replay
+
+async def _reply(send, status: int, body: bytes, headers: list = ()) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _make() -> Optional[RateLimiter]:
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    rules = {
+        "ip": (settings.RATE_LIMIT_IP_PER_SECOND, settings.RATE_LIMIT_IP_BURST),
+        "login_ip": (settings.LOGIN_LIMIT_IP_PER_MINUTE / 60, settings.LOGIN_LIMIT_IP_BURST),
+        "login_user": (settings.LOGIN_LIMIT_USER_PER_MINUTE / 60, settings.LOGIN_LIMIT_USER_BURST),
+    }
+    shared = RedisBuckets(settings.RATE_LIMIT_URL) if settings.RATE_LIMIT_URL else None
+    return RateLimiter(rules, settings.RATE_LIMIT_BUCKETS, shared)
+
+rate_limiter = _make()
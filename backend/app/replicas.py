@@ -0,0 +1,160 @@
+# Read-replica routing (DATABASE_REPLICA_URLS).
+#
+# deps.get_session hands GET requests under READ_PATHS a session on a replica,
+# taking the healthy replicas in turn; every other request, and every read
+# while no replica is healthy, uses the primary. A background task probes each
+# replica every REPLICA_CHECK_SECONDS with SELECT 1 and, on MySQL with
+# REPLICA_MAX_LAG set, Seconds_Behind_Source from SHOW REPLICA STATUS; a
+# replica that fails a request is taken out until its next successful probe.
+#
+# Read-your-writes: a write request makes that client's reads (same bearer
+# token) stick to the primary for REPLICA_STICKY_SECONDS. Other clients may
+# read a replica that has not replayed the write yet, so cached responses
+# built from it are retired after the same window (see httpcache.bump and
+# analytics.mark_written); the window should cover the replicas' usual lag.
+import asyncio
+import itertools
+import logging
+from typing import List, Optional
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from .cache import LRUCache
+from .config import settings
+from .database import REPLICA_URLS, get_replica_engines
+
+log = logging.getLogger("srms.replicas")
+
+READ_PATHS = ("/student/", "/admin/students", "/admin/analytics/")
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+STICKY_CLIENTS = 10000
+
+
+def _probe(conn, max_lag: float) -> bool:
+    conn.exec_driver_sql("SELECT 1").scalar()
+    if max_lag and conn.dialect.name == "mysql":
+        status = conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+        if status is not None:
+            lag = status.get("Seconds_Behind_Source")
+            # NULL while the replication threads are stopped
+            return lag is not None and lag <= max_lag
+    return True
+
+def _probe_sync(engine, max_lag: float) -> bool:
+    with engine.connect() as conn:
+        return _probe(conn, max_lag)
+
+async def _probe_async(engine, max_lag: float) -> bool:
+    async with engine.connect() as conn:
+        return await conn.run_sync(_probe, max_lag)
+
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.reads = 0
+        self.failures = 0
+
+    def as_dict(self) -> dict:
+        return {"url": self.engine.url.render_as_string(hide_password=True), "healthy": self.healthy,
+                "reads": self.reads, "failures": self.failures}
+
+
+class ReplicaSet:
+    def __init__(self, check_seconds: float, max_lag: float, sticky_seconds: float):
+        self.check_seconds = check_seconds
+        self.max_lag = max_lag
+        self._replicas: Optional[List[Replica]] = None
+        self._next = itertools.count()
+        self._sticky = LRUCache(maxsize=STICKY_CLIENTS, ttl=sticky_seconds)
+        self._task: Optional[asyncio.Task] = None
+        self.sticky_reads = 0
+        self.fallback_reads = 0
+
+    @property
+    def replicas(self) -> List[Replica]:
+        # engines are created on first use, i.e. inside the worker process
+        if self._replicas is None:
+            self._replicas = [Replica(engine) for engine in get_replica_engines()]
+        return self._replicas
+
+    def route(self, request: Request) -> Optional[Replica]:
+        # the replica to read from, or None for the primary
+        self.stick(request)
+        if request.method not in SAFE_METHODS or not request.url.path.startswith(READ_PATHS):
+            return None
+        client = request.headers.get("authorization")
+        if client and self._sticky.get(client):
+            self.sticky_reads += 1
+            return None
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            self.fallback_reads += 1
+            return None
+        replica = healthy[next(self._next) % len(healthy)]
+        replica.reads += 1
+        return replica
+
+    def stick(self, request: Request) -> None:
+        # called when a request starts and again once it has committed, so the
+        # window of a write runs from its end
+        client = request.headers.get("authorization")
+        if client and self._sticky.ttl and request.method not in SAFE_METHODS:
+            self._sticky.set(client, True)
+
+    def failed(self, replica: Replica, error: Exception) -> None:
+        if replica.healthy:
+            log.warning("replica %s taken out: %s", replica.as_dict()["url"], error)
+        replica.healthy = False
+        replica.failures += 1
+
+    async def check(self) -> None:
+        for replica in self.replicas:
+            engine = replica.engine
+            if hasattr(engine, "sync_engine"):
+                probe = _probe_async(engine, self.max_lag)
+            else:
+                probe = run_in_threadpool(_probe_sync, engine, self.max_lag)
+            try:
+                ok = await asyncio.wait_for(probe, self.check_seconds)
+            except Exception as exc:
+                self.failed(replica, exc)
+                continue
+            if ok != replica.healthy:
+                log.warning("replica %s %s", replica.as_dict()["url"], "back in rotation" if ok else "lagging")
+            replica.healthy = ok
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                log.exception("replica health check failed")
+            await asyncio.sleep(self.check_seconds)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        replicas = [r.as_dict() for r in self.replicas]
+        return {"replicas": len(replicas), "healthy": sum(r["healthy"] for r in replicas),
+                "reads": sum(r["reads"] for r in replicas), "sticky_reads": self.sticky_reads,
+                "fallback_reads": self.fallback_reads, "sticky_clients": len(self._sticky),
+                "sticky_seconds": self._sticky.ttl, "detail": replicas}
+
+
+def _make() -> Optional[ReplicaSet]:
+    if not REPLICA_URLS:
+        return None
+    return ReplicaSet(settings.REPLICA_CHECK_SECONDS, settings.REPLICA_MAX_LAG, settings.REPLICA_STICKY_SECONDS)
+
+read_replicas = _make()
@@ -0,0 +1,142 @@
+# Materialized per-student results.
+#
+# /student/me/marks reads a single student_results row by primary key. Marks
+# and sgpa cover the current term (app.terms); cgpa covers the effective mark
+# of every term, archived ones included. Mark writes call refresh_student_result()
+# inside their transaction, and rebuild_all() recomputes every row from
+# marks/subjects in batched joins, as does switching the current term:
+#   python -m app.results
+from collections import defaultdict
+from itertools import groupby
+from typing import Dict, Iterable, Optional
+from sqlalchemy import and_, delete, func, insert, select, true
+from sqlalchemy.orm import Session
+from .marks import upsert_rows
+from .models import Student, Subject, Mark, MarkArchive, StudentResult
+from .schemas import ResultOut, MarkOut, StudentOut
+from .terms import current_term_id
+
+STUDENT_COLUMNS = (Student.id, Student.student_code, Student.roll_no, Student.name,
+                   Student.division_id, Student.batch, Student.elective)
+RESULT_COLUMNS = ("sgpa", "cgpa", "total_credits", "payload")
+
+
+def weighted_gpa(points_and_credits: Iterable[tuple]) -> tuple:
+    # Returns (gpa rounded to 2 places, total credits)
+    total_points = 0.0
+    total_credits = 0
+    for gp, credits in points_and_credits:
+        total_points += gp * credits
+        total_credits += credits
+    return (round(total_points / total_credits, 2) if total_credits else 0.0), total_credits
+
+def _result_row(student: StudentOut, marks: list, cgpa: float) -> dict:
+    # marks: (subject_code, subject_name, credits, marks, grade, grade_points)
+    sgpa, credits = weighted_gpa((m[5], m[2]) for m in marks)
+    result = ResultOut(
+        student=student,
+        marks=[MarkOut(subject_code=m[0], subject_name=m[1], marks=m[3], grade=m[4], grade_points=m[5]) for m in marks],
+        sgpa=sgpa,
+        cgpa=cgpa,
+    )
+    return {"student_id": student.id, "sgpa": sgpa, "cgpa": cgpa, "total_credits": credits,
+            "payload": result.model_dump_json()}
+
+def _cgpas(db: Session, student_ids) -> Dict[int, float]:
+    # credit-weighted GPA over the effective mark of every term: the hot rows
+    # (open terms) and the archived terms' rows that were not superseded
+    points = defaultdict(list)
+    for model, effective in ((Mark, true()), (MarkArchive, ~MarkArchive.superseded)):
+        stmt = (select(model.student_id, model.grade_points, Subject.credits)
+                .join(Subject, Subject.id == model.subject_id)
+                .where(model.student_id.in_(student_ids), effective))
+        for student_id, gp, credits in db.execute(stmt):
+            points[student_id].append((gp, credits))
+    return {student_id: weighted_gpa(rows)[0] for student_id, rows in points.items()}
+
+def _results_query(student_ids, term_id: int):
+    return (
+        select(*STUDENT_COLUMNS, Subject.code, Subject.name, Subject.credits, Mark.marks, Mark.grade, Mark.grade_points)
+        .outerjoin(Mark, and_(Mark.student_id == Student.id, Mark.term_id == term_id))
+        .outerjoin(Subject, Subject.id == Mark.subject_id)
+        .where(Student.id.in_(student_ids))
+        .order_by(Student.id, Mark.subject_id)
+    )
+
+def _build_rows(db: Session, student_ids) -> list:
+    rows = []
+    width = len(STUDENT_COLUMNS)
+    term_id = current_term_id(db)
+    cgpas = _cgpas(db, student_ids)
+    for student_id, group in groupby(db.execute(_results_query(student_ids, term_id)), key=lambda r: r[0]):
+        group = list(group)
+        student = StudentOut(**dict(zip(StudentOut.model_fields, group[0][:width])))
+        marks = [tuple(r[width:]) for r in group if r[width] is not None]
+        rows.append(_result_row(student, marks, cgpas.get(student_id, 0.0)))
+    return rows
+
+def _upsert_results(db: Session, rows: list) -> None:
+    # upsert rather than read-then-insert, so two concurrent first writes for
+    # one student cannot both try to insert its row
+    if rows:
+        upsert_rows(db, StudentResult.__table__, rows, ("student_id",), RESULT_COLUMNS, updated_at=func.now())
+
+def refresh_student_result(db: Session, student_id: int) -> Optional[str]:
+    # Incremental update for one student; the caller owns the transaction.
+    # Returns the new payload, None for an unknown student.
+    db.flush()
+    rows = _build_rows(db, [student_id])
+    _upsert_results(db, rows)
+    return rows[0]["payload"] if rows else None
+
+def refresh_results(db: Session, student_ids) -> int:
+    # Batched variant for bulk mark writes: one join plus one multi-row upsert.
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return 0
+    db.flush()
+    rows = _build_rows(db, student_ids)
+    _upsert_results(db, rows)
+    return len(rows)
+
+def get_result_payload(db: Session, student_id: int) -> Optional[str]:
+    # A missing row is materialized on the way, except on a read replica
+    # (deps: session.info["read_only"]), where the payload is only built.
+    payload = db.scalar(select(StudentResult.payload).where(StudentResult.student_id == student_id))
+    if payload is None:
+        if db.info.get("read_only"):
+            rows = _build_rows(db, [student_id])
+            return rows[0]["payload"] if rows else None
+        payload = refresh_student_result(db, student_id)
+        if payload is None:
+            return None
+        db.commit()
+    return payload
+
+def rebuild_all(db: Session, batch_size: int = 1000) -> int:
+    # returns the number of rows written
+    db.execute(delete(StudentResult))
+    written = 0
+    last_id = 0
+    while True:
+        ids = db.scalars(select(Student.id).where(Student.id > last_id).order_by(Student.id).limit(batch_size)).all()
+        if not ids:
+            break
+        rows = _build_rows(db, ids)
+        db.execute(insert(StudentResult), rows)
+        written += len(rows)
+        last_id = ids[-1]
+    db.commit()
+    return written
+
+
+if __name__ == "__main__":
+    import time
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        written = rebuild_all(db)
+        print(f"student_results: {written} rows in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
@@ -1,19 +1,70 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..deps import get_db, require_role
+from typing import List, Literal, Optional
+from ..deps import get_session, require_role, Principal, principal_cache, principal_cache_stats
 from ..models import User, RoleEnum, Subject, Student, Enrollment
-from ..schemas import SubjectOut, UserOut
-from ..utils import hash_password
+from ..schemas import SubjectOut, UserOut, StudentSearchOut, TermIn, TermOut, TranscriptRowOut
+from ..hashing import hash_password_async
+from ..streaming import ndjson_response
+from ..profiler import profiler
+from ..httpcache import response_cache, dumps
+from ..writebehind import write_behind
+from ..replicas import read_replicas
+from ..ratelimit import rate_limiter
+from ..search import student_index
+from .. import terms
+from ..config import settings
+from ..database import get_engine, get_async_engine, get_replica_engines, pool_counters, pool_stats
+from ..metrics import POOL_CHECKOUT_WAIT
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-@router.get("/subjects", response_model=List[SubjectOut])
-def list_subjects(db: Session = Depends(get_db), _: User = Depends(require_role(RoleEnum.admin))):
-    return db.query(Subject).all()
+# Listings use keyset pagination: ?cursor=<last id>&limit=N returns rows with
+# id > cursor and the next cursor in the X-Next-Cursor header (absent on the
+# last page). format=ndjson streams every matching row after the cursor.
+MAX_PAGE = 1000
 
-@router.post("/subjects", response_model=SubjectOut)
-def create_subject(code: str, name: str, credits: int = 4, db: Session = Depends(get_db), _: User = Depends(require_role(RoleEnum.admin))):
+# Route bodies run as sync helpers through `await db.run_sync(...)` so the same
+# ORM code serves both the threadpool and the AsyncEngine modes (see deps.get_session).
+
+SUBJECT_COLUMNS = (Subject.id, Subject.code, Subject.name, Subject.credits, Subject.teacher_id)
+USER_COLUMNS = (User.id, User.username, User.full_name, User.role)
+
+def _subjects_stmt(cursor: int):
+    return select(*SUBJECT_COLUMNS).where(Subject.id > cursor).order_by(Subject.id)
+
+def _users_stmt(cursor: int, role: RoleEnum, division_id: Optional[int], batch: Optional[str], elective: Optional[str]):
+    stmt = select(*USER_COLUMNS).where(User.role == role, User.id > cursor)
+    if division_id is not None or batch is not None or elective is not None:
+        stmt = stmt.join(Student, Student.id == User.student_id)
+        if division_id is not None:
+            stmt = stmt.where(Student.division_id == division_id)
+        if batch is not None:
+            stmt = stmt.where(Student.batch == batch)
+        if elective is not None:
+            stmt = stmt.where(Student.elective == elective)
+    return stmt.order_by(User.id)
+
+def _subject_dict(row) -> dict:
+    return dict(row._mapping)
+
+def _user_dict(row) -> dict:
+    return {"id": row.id, "username": row.username, "full_name": row.full_name, "role": row.role.value}
+
+def _fetch_page(db: Session, stmt, limit: int):
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def _page(rows, next_cursor, response: Response, to_dict):
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return [to_dict(r) for r in rows]
+
+def _create_subject(db: Session, code: str, name: str, credits: int):
     if db.query(Subject).filter(Subject.code == code).first():
         raise HTTPException(status_code=400, detail="Subject code exists")
     s = Subject(code=code, name=name, credits=credits)
@@ -22,38 +73,223 @@ def create_subject(code: str, name: str, credits: int = 4, db: Session = Depends
     db.refresh(s)
     return s
 
-@router.post("/assign-teacher")
-def assign_teacher(subject_id: int, teacher_user_id: int, db: Session = Depends(get_db), _: User = Depends(require_role(RoleEnum.admin))):
+def _assign_teacher(db: Session, subject_id: int, teacher_user_id: int):
     subj = db.query(Subject).filter(Subject.id == subject_id).first()
     teacher = db.query(User).filter(User.id == teacher_user_id, User.role == RoleEnum.teacher).first()
     if not subj or not teacher:
         raise HTTPException(status_code=404, detail="Subject or teacher not found")
+    previous_teacher_id = subj.teacher_id
     subj.teacher_id = teacher.id
     db.commit()
+    return teacher.id, previous_teacher_id
+
+def _username_exists(db: Session, username: str) -> bool:
+    return db.query(User.id).filter(User.username == username).first() is not None
+
+def _create_user(db: Session, **fields):
+    u = User(**fields)
+    db.add(u)
+    db.commit()
+    db.refresh(u)
+    return u
+
+@router.get("/subjects", response_model=List[SubjectOut])
+async def list_subjects(request: Request, cursor: int = 0, limit: int = Query(100, ge=1, le=MAX_PAGE),
+                        format: Literal["json", "ndjson"] = "json",
+                        db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    stmt = _subjects_stmt(cursor)
+    if format == "ndjson":
+        return ndjson_response(stmt, _subject_dict, bind=db.bind)
+
+    async def build():
+        rows, next_cursor = await db.run_sync(_fetch_page, stmt, limit)
+        headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+        return dumps([_subject_dict(r) for r in rows]), headers
+
+    # pages are tagged with the "subjects" version, bumped by subject create/assign
+    return await response_cache.respond(request, "admin-subjects", ("subjects",), build)
+
+@router.post("/subjects", response_model=SubjectOut)
+async def create_subject(code: str, name: str, credits: int = 4, db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    subj = await db.run_sync(_create_subject, code, name, credits)
+    await response_cache.bump("subjects")
+    return subj
+
+@router.post("/assign-teacher")
+async def assign_teacher(subject_id: int, teacher_user_id: int, db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    teacher_id, previous_teacher_id = await db.run_sync(_assign_teacher, subject_id, teacher_user_id)
+    principal_cache.invalidate(teacher_id)
+    keys = ["subjects", ("teacher", teacher_id)]
+    if previous_teacher_id:
+        principal_cache.invalidate(previous_teacher_id)
+        keys.append(("teacher", previous_teacher_id))
+    await response_cache.bump(*keys)
     return {"status": "ok"}
 
 @router.get("/students", response_model=List[UserOut])
-def list_student_users(db: Session = Depends(get_db), _: User = Depends(require_role(RoleEnum.admin))):
-    users = db.query(User).filter(User.role == RoleEnum.student).all()
-    return users
+async def list_student_users(response: Response, cursor: int = 0, limit: int = Query(100, ge=1, le=MAX_PAGE),
+                             role: RoleEnum = RoleEnum.student, division_id: Optional[int] = None,
+                             batch: Optional[str] = None, elective: Optional[str] = None,
+                             format: Literal["json", "ndjson"] = "json",
+                             db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    stmt = _users_stmt(cursor, role, division_id, batch, elective)
+    if format == "ndjson":
+        return ndjson_response(stmt, _user_dict, bind=db.bind)
+    rows, next_cursor = await db.run_sync(_fetch_page, stmt, limit)
+    return _page(rows, next_cursor, response, _user_dict)
+
+@router.get("/students/search", response_model=List[StudentSearchOut])
+async def search_students(response: Response, q: str = Query(..., min_length=1, max_length=100),
+                          cursor: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=MAX_PAGE),
+                          db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin, RoleEnum.teacher))):
+    # ranked matches on name / roll number / student code (see search.py);
+    # the cursor is the offset of the next page in the ranking
+    change = await db.run_sync(student_index.changes)
+    if change is not None:
+        await run_in_threadpool(student_index.apply, change)
+    rows, total = await run_in_threadpool(student_index.search, q, cursor, limit)
+    if cursor + limit < total:
+        response.headers["X-Next-Cursor"] = str(cursor + limit)
+    response.headers["X-Total-Count"] = str(total)
+    return rows
+
+@router.get("/students/search/index")
+async def search_index_info(_: Principal = Depends(require_role(RoleEnum.admin))):
+    return student_index.stats()
 
 @router.post("/create-user", response_model=UserOut)
-def create_user(username: str, password: str, role: RoleEnum, full_name: Optional[str] = None, email: Optional[str] = None,
-                student_id: Optional[int] = None,
-                db: Session = Depends(get_db), _: User = Depends(require_role(RoleEnum.admin))):
-    if db.query(User).filter(User.username == username).first():
+async def create_user(username: str, password: str, role: RoleEnum, full_name: Optional[str] = None, email: Optional[str] = None,
+                      student_id: Optional[int] = None,
+                      db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    if await db.run_sync(_username_exists, username):
         raise HTTPException(status_code=400, detail="Username exists")
     if role == RoleEnum.student and not student_id:
         raise HTTPException(status_code=400, detail="student_id required for student role")
-    u = User(
+    u = await db.run_sync(
+        _create_user,
         username=username,
-        password_hash=hash_password(password),
+        password_hash=await hash_password_async(password),
         role=role,
         full_name=full_name,
         email=email,
         student_id=student_id
     )
-    db.add(u)
-    db.commit()
-    db.refresh(u)
+    principal_cache.invalidate(u.id)
     return u
+
+def _term_call(db: Session, fn, *args):
+    try:
+        return fn(db, *args)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+def _create_term(db: Session, payload: TermIn):
+    term = _term_call(db, terms.create_term, payload.code, payload.name)
+    rebuilt = terms.set_current(db, term.id) if payload.current else None
+    return next(t for t in terms.list_terms(db) if t["id"] == term.id), rebuilt
+
+def _transcript(db: Session, student_id: int, cursor: str, limit: int):
+    try:
+        return terms.student_transcript(db, student_id, cursor, limit)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get("/terms", response_model=List[TermOut])
+async def list_terms(db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    return await db.run_sync(terms.list_terms)
+
+@router.post("/terms", response_model=TermOut)
+async def create_term(payload: TermIn, db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    term, rebuilt = await db.run_sync(_create_term, payload)
+    if rebuilt is not None:
+        await response_cache.bump("grades")
+    return term
+
+@router.post("/terms/{term_id}/current")
+async def set_current_term(term_id: int, db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    # results, analytics and exports follow the current term; every result is rebuilt
+    rebuilt = await db.run_sync(_term_call, terms.set_current, term_id)
+    await response_cache.bump("grades")
+    return {"status": "ok", "results_rebuilt": rebuilt}
+
+@router.post("/terms/{term_id}/archive")
+async def archive_term(term_id: int, db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    moved = await db.run_sync(_term_call, terms.archive_term, term_id)
+    return {"status": "ok", "marks_archived": moved}
+
+@router.get("/students/{student_id}/transcript", response_model=List[TranscriptRowOut])
+async def student_transcript(student_id: int, response: Response, cursor: str = "",
+                             limit: int = Query(100, ge=1, le=terms.TRANSCRIPT_MAX_PAGE),
+                             db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    # the cursor is "term_id.subject_id.attempt" of the last row
+    rows, next_cursor = await db.run_sync(_transcript, student_id, cursor, limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+@router.get("/principal-cache")
+async def principal_cache_info(_: Principal = Depends(require_role(RoleEnum.admin))):
+    return principal_cache_stats()
+
+@router.get("/pool")
+async def pool_info(_: Principal = Depends(require_role(RoleEnum.admin))):
+    checkouts, waited = POOL_CHECKOUT_WAIT.summary()
+    engines = {"sync": pool_stats(get_engine())}
+    if get_async_engine() is not None:
+        engines["async"] = pool_stats(get_async_engine())
+    for i, replica in enumerate(get_replica_engines(), 1):
+        engines[f"replica{i}"] = pool_stats(replica)
+    return {
+        "engines": engines,
+        "pre_ping": settings.DB_PRE_PING,
+        "checkouts": checkouts,
+        "avg_checkout_wait_ms": round(waited / checkouts * 1000, 3) if checkouts else 0.0,
+        **pool_counters,
+    }
+
+@router.get("/replicas")
+async def replicas_info(_: Principal = Depends(require_role(RoleEnum.admin))):
+    if read_replicas is None:
+        return {"replicas": 0}
+    return read_replicas.stats()
+
+@router.get("/rate-limit")
+async def rate_limit_info(_: Principal = Depends(require_role(RoleEnum.admin))):
+    if rate_limiter is None:
+        return {"backend": "off"}
+    return rate_limiter.stats()
+
+@router.get("/write-behind")
+async def write_behind_info(_: Principal = Depends(require_role(RoleEnum.admin))):
+    if write_behind is None:
+        return {"mode": "off"}
+    return await run_in_threadpool(write_behind.stats)
+
+@router.get("/profiler")
+async def profiler_status(_: Principal = Depends(require_role(RoleEnum.admin))):
+    slowest = [{k: v for k, v in r.items() if k != "samples"} | {"samples": sum(r["samples"].values())}
+               for r in profiler.slowest()]
+    return {"enabled": profiler.enabled, "interval_ms": profiler.interval * 1000, "slowest": slowest}
+
+@router.post("/profiler")
+async def profiler_toggle(enabled: bool, interval_ms: Optional[float] = None, clear: bool = False,
+                          _: Principal = Depends(require_role(RoleEnum.admin))):
+    if clear:
+        profiler.clear()
+    if enabled:
+        profiler.enable(interval_ms / 1000 if interval_ms else None)
+    else:
+        profiler.disable()
+    return {"enabled": profiler.enabled}
+
+@router.get("/profiler/{index}", response_class=PlainTextResponse)
+async def profiler_stacks(index: int, _: Principal = Depends(require_role(RoleEnum.admin))):
+    # folded stacks of the index-th slowest request (0 = slowest), flamegraph-ready
+    folded = profiler.folded(index)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="No such sample")
+    return folded
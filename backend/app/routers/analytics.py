@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Literal
+from ..deps import get_session, require_role, Principal
+from ..models import RoleEnum
+from .. import analytics
+
+router = APIRouter(prefix="/admin/analytics", tags=["analytics"])
+
+@router.get("/subjects")
+async def subjects_overview(db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    return await db.run_sync(analytics.overview)
+
+@router.get("/subjects/{subject_id}")
+async def subject_summary(subject_id: int, toppers: int = Query(10, ge=0, le=100),
+                          db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    summary = await db.run_sync(analytics.subject_summary, subject_id, toppers)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    return summary
+
+@router.get("/subjects/{subject_id}/breakdown")
+async def subject_breakdown(subject_id: int, by: Literal["division", "batch", "elective"] = "division",
+                            db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    return await db.run_sync(analytics.subject_breakdown, subject_id, by)
+
+@router.get("/cache")
+async def cache_info(_: Principal = Depends(require_role(RoleEnum.admin))):
+    return analytics.analytics_cache.stats()
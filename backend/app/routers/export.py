@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from ..deps import require_role, Principal
+from ..models import RoleEnum
+from .. import export
+
+router = APIRouter(prefix="/admin/export", tags=["export"])
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# The export generators are sync and open their own session; Starlette runs
+# them in the threadpool while the body streams.
+
+@router.get("/results")
+def export_results(format: Literal["csv", "xlsx"] = "csv", division_id: Optional[int] = None,
+                   batch: Optional[str] = None, elective: Optional[str] = None,
+                   _: Principal = Depends(require_role(RoleEnum.admin))):
+    if format == "xlsx":
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="XLSX export requires openpyxl")
+        body, media_type = export.results_xlsx(division_id, batch, elective), XLSX
+    else:
+        body, media_type = export.results_csv(division_id, batch, elective), "text/csv"
+    headers = {"Content-Disposition": f'attachment; filename="results.{format}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+@router.get("/marksheets")
+def export_marksheets(division_id: Optional[int] = None, batch: Optional[str] = None, elective: Optional[str] = None,
+                      _: Principal = Depends(require_role(RoleEnum.admin))):
+    headers = {"Content-Disposition": 'attachment; filename="marksheets.zip"'}
+    return StreamingResponse(export.marksheets_zip(division_id, batch, elective), media_type="application/zip", headers=headers)
+
+@router.get("/progress")
+def export_progress(_: Principal = Depends(require_role(RoleEnum.admin))):
+    return [job.as_dict() for job in export.export_jobs.values()]
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from sqlalchemy.orm import Session
+from ..deps import get_session, require_role, Principal
+from ..models import RoleEnum, Subject
+from ..schemas import GradeSchemeIn
+from ..httpcache import response_cache
+from .. import grading
+
+router = APIRouter(prefix="/admin/grading", tags=["grading"])
+
+def _require_subject(db: Session, subject_id: int) -> None:
+    if db.get(Subject, subject_id) is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+
+def _scheme_info(db: Session, subject_id: int) -> dict:
+    _require_subject(db, subject_id)
+    scheme, _ = grading.load_scheme(db, subject_id)
+    return {"subject_id": subject_id, "scheme": scheme.as_dict(),
+            "grader": grading.grader_for(db, subject_id).as_dict()}
+
+def _set_and_regrade(db: Session, subject_id: int, scheme: Optional[grading.Scheme], regrade: bool):
+    _require_subject(db, subject_id)
+    try:
+        grading.set_scheme(db, subject_id, scheme)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return grading.regrade(db, [subject_id]) if regrade else None
+
+@router.get("/subjects/{subject_id}")
+async def get_scheme(subject_id: int, db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    return await db.run_sync(_scheme_info, subject_id)
+
+@router.put("/subjects/{subject_id}")
+async def put_scheme(subject_id: int, payload: GradeSchemeIn, regrade: bool = True,
+                     db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    scheme = grading.Scheme(payload.kind, tuple(payload.cutoffs), tuple(payload.letters),
+                            tuple(payload.points), payload.pass_mark)
+    stats = await db.run_sync(_set_and_regrade, subject_id, scheme, regrade)
+    if stats:
+        await response_cache.bump("grades")
+    return {"status": "ok", "regraded": stats}
+
+@router.delete("/subjects/{subject_id}")
+async def reset_scheme(subject_id: int, regrade: bool = True,
+                       db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    stats = await db.run_sync(_set_and_regrade, subject_id, None, regrade)
+    if stats:
+        await response_cache.bump("grades")
+    return {"status": "ok", "regraded": stats}
+
+@router.post("/regrade")
+async def regrade(subject_id: Optional[int] = None,
+                  db=Depends(get_session), _: Principal = Depends(require_role(RoleEnum.admin))):
+    # one subject, or every subject when subject_id is omitted
+    stats = await db.run_sync(grading.regrade, [subject_id] if subject_id is not None else None)
+    await response_cache.bump("grades")
+    return stats
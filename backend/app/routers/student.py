@@ -1,26 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from statistics import mean
-from ..deps import get_db, require_role, get_current_user
+from ..deps import get_session, require_role, get_current_user, Principal
 from ..models import User, RoleEnum, Student, Mark, Subject
-from ..schemas import ResultOut, MarkOut, StudentOut
+from ..schemas import ResultOut, MarkOut, StudentOut, TranscriptRowOut
+from ..results import get_result_payload
+from ..httpcache import response_cache
+from .. import terms
 
 router = APIRouter(prefix="/student", tags=["student"])
 
+def _get_student(db: Session, student_id: int):
+    return db.query(Student).filter(Student.id == student_id).first()
+
+def _transcript(db: Session, student_id: int, cursor: str, limit: int):
+    try:
+        return terms.student_transcript(db, student_id, cursor, limit)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="No student profile")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+# Both routes answer If-None-Match from the ("student", id) version, which mark
+# writes bump (see httpcache); re-grades bump "grades" for everyone.
+
 @router.get("/me", response_model=StudentOut)
-def me(db: Session = Depends(get_db), user: User = Depends(require_role(RoleEnum.student))):
+async def me(request: Request, db=Depends(get_session), user: Principal = Depends(require_role(RoleEnum.student))):
     if not user.student_id:
         raise HTTPException(status_code=404, detail="No student profile")
-    stu = db.query(Student).filter(Student.id == user.student_id).first()
-    return stu
+
+    async def build():
+        stu = await db.run_sync(_get_student, user.student_id)
+        if not stu:
+            raise HTTPException(status_code=404, detail="No student profile")
+        return StudentOut.model_validate(stu).model_dump_json(), {}
+
+    return await response_cache.respond(request, f"student-me:{user.student_id}", (("student", user.student_id),), build)
 
 @router.get("/me/marks", response_model=ResultOut)
-def my_marks(db: Session = Depends(get_db), user: User = Depends(require_role(RoleEnum.student))):
-    stu = db.query(Student).filter(Student.id == user.student_id).first()
-    if not stu:
+async def my_marks(request: Request, db=Depends(get_session), user: Principal = Depends(require_role(RoleEnum.student))):
+    if not user.student_id:
+        raise HTTPException(status_code=404, detail="No student profile")
+
+    async def build():
+        # materialized in student_results; the stored payload is already ResultOut JSON
+        payload = await db.run_sync(get_result_payload, user.student_id)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="No student profile")
+        return payload, {}
+
+    return await response_cache.respond(request, f"student-marks:{user.student_id}", (("student", user.student_id), "grades"), build)
+
+@router.get("/me/transcript", response_model=List[TranscriptRowOut])
+async def my_transcript(response: Response, cursor: str = "", limit: int = Query(100, ge=1, le=terms.TRANSCRIPT_MAX_PAGE),
+                        db=Depends(get_session), user: Principal = Depends(require_role(RoleEnum.student))):
+    # every term and attempt, archived ones included; see terms.transcript
+    if not user.student_id:
         raise HTTPException(status_code=404, detail="No student profile")
-    marks = db.query(Mark, Subject).join(Subject, Subject.id == Mark.subject_id).filter(Mark.student_id == stu.id).all()
-    mark_list = [MarkOut(subject_code=s.code, subject_name=s.name, marks=m.marks, grade=m.grade, grade_points=m.grade_points) for (m, s) in marks]
-    gp = [m.grade_points for m, _ in marks]
-    cgpa = round(mean(gp), 2) if gp else 0.0
-    return {"student": stu, "marks": mark_list, "cgpa": cgpa}
+    rows, next_cursor = await db.run_sync(_transcript, user.student_id, cursor, limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
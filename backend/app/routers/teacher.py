@@ -1,39 +1,211 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import codecs
+import json
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from ..deps import get_db, require_role, get_current_user
+from ..deps import get_session, require_role, get_current_user, Principal
 from ..models import User, RoleEnum, Subject, Mark, Student
-from ..schemas import MarkIn
-from ..utils import grade_from_marks
+from ..schemas import MarkIn, MarkBatchOut, MarkReceiptOut
+from ..grading import grader_for
+from ..results import refresh_student_result, refresh_results
+from ..marks import upsert_marks
+from ..analytics import mark_written
+from ..terms import writable_term
+from ..httpcache import response_cache, dumps
+from ..writebehind import write_behind
 
 router = APIRouter(prefix="/teacher", tags=["teacher"])
 
+# rows validated and upserted per statement by the batch endpoint
+BATCH_CHUNK = 1000
+
 def _get_teacher_subject(db: Session, teacher_id: int) -> Subject:
     subj = db.query(Subject).filter(Subject.teacher_id == teacher_id).first()
     return subj
 
 @router.get("/my-subject")
-def my_subject(db: Session = Depends(get_db), user: User = Depends(require_role(RoleEnum.teacher))):
-    subj = _get_teacher_subject(db, user.id)
-    if not subj:
-        return {"message": "No subject assigned"}
-    return {"id": subj.id, "code": subj.code, "name": subj.name}
+async def my_subject(request: Request, db=Depends(get_session), user: Principal = Depends(require_role(RoleEnum.teacher))):
+    async def build():
+        subj = await db.run_sync(_get_teacher_subject, user.id)
+        if not subj:
+            return dumps({"message": "No subject assigned"}), {}
+        return dumps({"id": subj.id, "code": subj.code, "name": subj.name}), {}
 
-@router.post("/marks")
-def create_or_update_mark(payload: MarkIn, db: Session = Depends(get_db), user: User = Depends(require_role(RoleEnum.teacher))):
-    subj = _get_teacher_subject(db, user.id)
+    # ("teacher", id) is bumped when an assignment adds or removes this teacher's subject
+    return await response_cache.respond(request, f"teacher-subject:{user.id}", (("teacher", user.id),), build)
+
+def _writable_term(db: Session, term_id: Optional[int], attempt: int) -> int:
+    if attempt < 1:
+        raise HTTPException(status_code=400, detail="attempt must be at least 1")
+    try:
+        return writable_term(db, term_id)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+def _validate_mark(db: Session, payload: MarkIn, teacher_id: int):
+    subj = _get_teacher_subject(db, teacher_id)
     if not subj or subj.id != payload.subject_id:
         raise HTTPException(status_code=403, detail="Teacher can only submit marks for assigned subject")
     stu = db.query(Student).filter(Student.id == payload.student_id).first()
     if not stu:
         raise HTTPException(status_code=404, detail="Student not found")
-    letter, gp = grade_from_marks(payload.marks)
-    existing = db.query(Mark).filter(Mark.student_id == stu.id, Mark.subject_id == subj.id).first()
-    if existing:
-        existing.marks = payload.marks
-        existing.grade = letter
-        existing.grade_points = gp
-    else:
-        m = Mark(student_id=stu.id, subject_id=subj.id, marks=payload.marks, grade=letter, grade_points=gp, created_by=user.id)
-        db.add(m)
+    return subj, stu, _writable_term(db, payload.term_id, payload.attempt)
+
+def _write_mark(db: Session, payload: MarkIn, teacher_id: int):
+    subj, stu, term_id = _validate_mark(db, payload, teacher_id)
+    (letter, gp), = grader_for(db, subj.id).grade([payload.marks])
+    upsert_marks(db, [dict(student_id=stu.id, subject_id=subj.id, term_id=term_id, attempt=payload.attempt,
+                           marks=payload.marks, grade=letter, grade_points=gp, created_by=teacher_id)])
+    refresh_student_result(db, stu.id)
     db.commit()
+    mark_written(payload.subject_id)
+
+def _check_mark(db: Session, payload: MarkIn, teacher_id: int) -> int:
+    _, _, term_id = _validate_mark(db, payload, teacher_id)
+    # release the connection; the write happens later in the write-behind worker
+    db.rollback()
+    return term_id
+
+@router.post("/marks")
+async def create_or_update_mark(payload: MarkIn, response: Response, db=Depends(get_session),
+                                user: Principal = Depends(require_role(RoleEnum.teacher))):
+    if write_behind is not None:
+        term_id = await db.run_sync(_check_mark, payload, user.id)
+        receipt = await write_behind.submit(payload.student_id, payload.subject_id, payload.marks, user.id,
+                                            term_id, payload.attempt)
+        response.status_code = 202
+        return {"status": "accepted", "receipt": receipt}
+    await db.run_sync(_write_mark, payload, user.id)
+    await response_cache.bump(("student", payload.student_id))
     return {"status": "ok"}
+
+@router.get("/marks/receipts/{receipt}", response_model=MarkReceiptOut)
+async def mark_receipt(receipt: str, user: Principal = Depends(require_role(RoleEnum.teacher))):
+    entry = await write_behind.receipt(receipt) if write_behind is not None else None
+    if not entry or entry["teacher_id"] != user.id:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return entry
+
+def _parse_row(row_no: int, item, subject_id: int, errors: list):
+    try:
+        student_id = int(item["student_id"])
+        marks = int(item["marks"])
+        row_subject = item.get("subject_id")
+    except (KeyError, TypeError, ValueError, AttributeError):
+        errors.append({"row": row_no, "student_id": None, "error": "student_id and integer marks required"})
+        return None
+    if row_subject not in (None, "") and str(row_subject) != str(subject_id):
+        errors.append({"row": row_no, "student_id": student_id, "error": "Teacher can only submit marks for assigned subject"})
+        return None
+    if not 0 <= marks <= 100:
+        errors.append({"row": row_no, "student_id": student_id, "error": "marks must be between 0 and 100"})
+        return None
+    return (row_no, student_id, marks)
+
+def _write_chunk(db: Session, subject_id: int, term_id: int, attempt: int, teacher_id: int,
+                 chunk: list, errors: list) -> list:
+    # one IN query to validate students, one multi-row upsert, one results refresh
+    ids = {student_id for _, student_id, _ in chunk}
+    known = set(db.scalars(select(Student.id).where(Student.id.in_(ids))))
+    latest = {}
+    for row_no, student_id, marks in chunk:
+        if student_id not in known:
+            errors.append({"row": row_no, "student_id": student_id, "error": "Student not found"})
+            continue
+        if student_id in latest:
+            errors.append({"row": latest[student_id][0], "student_id": student_id, "error": "Superseded by a later row"})
+        latest[student_id] = (row_no, marks)
+    if not latest:
+        return []
+    student_ids = list(latest)
+    grades = grader_for(db, subject_id).grade(latest[s][1] for s in student_ids)
+    upsert_marks(db, [
+        dict(student_id=s, subject_id=subject_id, term_id=term_id, attempt=attempt, marks=latest[s][1],
+             grade=letter, grade_points=gp, created_by=teacher_id)
+        for s, (letter, gp) in zip(student_ids, grades)
+    ])
+    refresh_results(db, student_ids)
+    db.commit()
+    mark_written(subject_id)
+    return student_ids
+
+def _csv_items(lines, header: list):
+    for values in csv.reader(lines):
+        if not any(v.strip() for v in values):
+            continue
+        if not header:
+            header.extend(h.strip() for h in values)
+            continue
+        yield dict(zip(header, (v.strip() for v in values)))
+
+async def _iter_items(request: Request):
+    # Yields (row_no, item) from a JSON array body or a streamed CSV body with a
+    # student_id,marks[,subject_id] header.
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        header, pending, row_no = [], "", 0
+        async for chunk in request.stream():
+            *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+            for item in _csv_items(lines, header):
+                row_no += 1
+                yield row_no, item
+        for item in _csv_items([pending + decoder.decode(b"", final=True)], header):
+            row_no += 1
+            yield row_no, item
+        return
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or text/csv")
+    for row_no, item in enumerate(items, start=1):
+        yield row_no, item
+
+@router.post("/marks/bulk", response_model=MarkBatchOut)
+async def bulk_upload_marks(request: Request, term_id: Optional[int] = None, attempt: int = Query(1, ge=1),
+                            db=Depends(get_session), user: Principal = Depends(require_role(RoleEnum.teacher))):
+    # every row of one upload goes to the same term (default: current) and attempt
+    started = time.perf_counter()
+    subj = await db.run_sync(_get_teacher_subject, user.id)
+    if not subj:
+        raise HTTPException(status_code=403, detail="Teacher can only submit marks for assigned subject")
+    subject_id = subj.id
+    term_id = await db.run_sync(_writable_term, term_id, attempt)
+    errors = []
+    received = written = 0
+    chunk = []
+
+    async def flush():
+        nonlocal written
+        student_ids = await db.run_sync(_write_chunk, subject_id, term_id, attempt, user.id, chunk, errors)
+        await response_cache.bump(*(("student", s) for s in student_ids))
+        written += len(student_ids)
+
+    async for row_no, item in _iter_items(request):
+        received += 1
+        parsed = _parse_row(row_no, item, subject_id, errors)
+        if parsed:
+            chunk.append(parsed)
+        if len(chunk) >= BATCH_CHUNK:
+            await flush()
+            chunk = []
+    if chunk:
+        await flush()
+    elapsed = time.perf_counter() - started
+    return {
+        "subject_id": subject_id,
+        "term_id": term_id,
+        "attempt": attempt,
+        "received": received,
+        "written": written,
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "marks_per_sec": round(written / elapsed, 1) if elapsed > 0 else 0.0,
+    }
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, List
 
 class Token(BaseModel):
     access_token: str
@@ -38,10 +39,51 @@ class StudentOut(BaseModel):
     class Config:
         from_attributes = True
 
+class StudentSearchOut(StudentOut):
+    score: float
+
 class MarkIn(BaseModel):
+    student_id: int
+    subject_id: int
+    # same range as the bulk upload's per-row check
+    marks: int = Field(ge=0, le=100)
+    # the current term when omitted; a later attempt replaces the effective mark
+    term_id: Optional[int] = None
+    attempt: int = Field(1, ge=1)
+
+class MarkRowError(BaseModel):
+    row: int
+    student_id: Optional[int]
+    error: str
+
+class MarkBatchOut(BaseModel):
+    subject_id: int
+    term_id: int
+    attempt: int
+    received: int
+    written: int
+    errors: List[MarkRowError]
+    elapsed_ms: float
+    marks_per_sec: float
+
+class MarkReceiptOut(BaseModel):
+    receipt: str
+    status: str
     student_id: int
     subject_id: int
     marks: int
+    term_id: Optional[int] = None
+    attempt: int = 1
+    error: Optional[str] = None
+    submitted_at: float
+    written_at: Optional[float] = None
+
+class GradeSchemeIn(BaseModel):
+    kind: Literal["absolute", "relative"] = "absolute"
+    cutoffs: List[float]
+    letters: List[str]
+    points: List[float]
+    pass_mark: int = 40
 
 class MarkOut(BaseModel):
     subject_code: str
@@ -50,7 +92,37 @@ class MarkOut(BaseModel):
     grade: str
     grade_points: float
 
+class TermIn(BaseModel):
+    code: str
+    name: str
+    current: bool = False
+
+class TermOut(BaseModel):
+    id: int
+    code: str
+    name: str
+    current: bool
+    archived_at: Optional[datetime]
+    hot_marks: int = 0
+
+class TranscriptRowOut(BaseModel):
+    term_id: int
+    term_code: str
+    term_name: str
+    subject_id: int
+    subject_code: str
+    subject_name: str
+    credits: int
+    attempt: int
+    marks: int
+    grade: str
+    grade_points: float
+    # False for an attempt replaced by a later one
+    effective: bool
+
 class ResultOut(BaseModel):
     student: StudentOut
     marks: List[MarkOut]
+    # sgpa: the current term; cgpa: every term's effective marks
+    sgpa: float
     cgpa: float
@@ -0,0 +1,200 @@
+# In-process index for student search (GET /admin/students/search).
+#
+# Names: every word is folded (accents stripped, case-insensitive) and split
+# into the trigrams of "  " + word, so a query word matches any name word it
+# is a prefix of with full score and misspelt or infix words with partial
+# score. Per student, the number of query trigrams it has is counted with one
+# np.bincount over the postings and divided by the number of query trigrams.
+# Student codes and roll numbers: query words containing a digit are matched
+# as prefixes through sorted arrays (np.searchsorted); an exact code / roll
+# number match ranks above a prefix match.
+#
+# The index is built from the students table on the first search and kept
+# current by appending rows with a higher id; a search first checks the table
+# (count and max id) when SEARCH_REFRESH_SECONDS have passed or after
+# invalidate(), which the student loaders in seed.py call, and rebuilds when
+# rows were deleted.
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from .config import settings
+from .models import Student
+
+FIELDS = ("id", "student_code", "roll_no", "name", "division_id", "batch", "elective")
+# share of the name trigrams a student needs to be returned
+MIN_SCORE = 0.5
+PREFIX_SCORE = 1.0
+EXACT_SCORE = 2.0
+_NON_WORD = re.compile(r"[\W_]+")
+_EMPTY = (np.empty(0, dtype=np.int64), np.empty(0))
+
+
+def fold(text: str) -> str:
+    text = text or ""
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+def word_trigrams(word: str) -> List[str]:
+    padded = "  " + word
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class _Snapshot:
+    # Immutable once published; add() returns a new snapshot sharing the
+    # untouched posting arrays. Rows are kept in id order.
+
+    def __init__(self, rows: List[tuple], postings: Dict[str, np.ndarray], ids: Tuple[np.ndarray, np.ndarray]):
+        self.rows = rows
+        self.postings = postings
+        # (sorted folded codes and roll numbers, row position of each)
+        self.ids = ids
+        self.max_id = rows[-1][0] if rows else 0
+
+    @classmethod
+    def build(cls, rows: List[tuple]) -> "_Snapshot":
+        return cls([], {}, (np.empty(0, dtype=str), np.empty(0, dtype=np.int32))).add(rows)
+
+    def add(self, rows: List[tuple]) -> "_Snapshot":
+        start = len(self.rows)
+        # words repeat across names, so trigrams are derived once per distinct word
+        word_rows = defaultdict(list)
+        for pos, row in enumerate(rows, start):
+            for word in set(fold(row[3]).split()):
+                word_rows[word].append(pos)
+        gram_rows = defaultdict(list)
+        for word, positions in word_rows.items():
+            positions = np.asarray(positions, dtype=np.int32)
+            for gram in set(word_trigrams(word)):
+                gram_rows[gram].append(positions)
+        postings = dict(self.postings)
+        for gram, arrays in gram_rows.items():
+            # a row with two words sharing a trigram counts once
+            added = np.unique(np.concatenate(arrays)) if len(arrays) > 1 else arrays[0]
+            old = postings.get(gram)
+            postings[gram] = added if old is None else np.concatenate((old, added))
+        keys = [fold(r[1]) for r in rows] + [fold(r[2]) for r in rows]
+        positions = list(range(start, start + len(rows))) * 2
+        keys = np.concatenate((self.ids[0], np.asarray(keys, dtype=str)))
+        positions = np.concatenate((self.ids[1], np.asarray(positions, dtype=np.int32)))
+        order = np.argsort(keys, kind="stable")
+        return _Snapshot(self.rows + rows, postings, (keys[order], positions[order]))
+
+    def _name_scores(self, words: List[str]) -> Optional[np.ndarray]:
+        grams = {g for w in words for g in word_trigrams(w)}
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return None
+        return np.bincount(np.concatenate(lists), minlength=len(self.rows)) / len(grams)
+
+    def _id_scores(self, token: str) -> np.ndarray:
+        keys, positions = self.ids
+        lo = np.searchsorted(keys, token, side="left")
+        hi = np.searchsorted(keys, token + "\uffff", side="left")
+        scores = np.zeros(len(self.rows))
+        matched = positions[lo:hi]
+        scores[matched] = PREFIX_SCORE
+        scores[matched[keys[lo:hi] == token]] = EXACT_SCORE
+        return scores
+
+    def search(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        # (row positions, scores), best first; every query word must match
+        words = fold(query).split()
+        if not words or not self.rows:
+            return _EMPTY
+        names = [w for w in words if not any(c.isdigit() for c in w)]
+        scores = np.zeros(len(self.rows))
+        keep = np.ones(len(self.rows), dtype=bool)
+        if names:
+            name_scores = self._name_scores(names)
+            if name_scores is None:
+                return _EMPTY
+            scores += name_scores
+            keep &= name_scores >= MIN_SCORE
+        for token in words:
+            if token not in names:
+                id_scores = self._id_scores(token)
+                scores += id_scores
+                keep &= id_scores > 0
+        positions = np.flatnonzero(keep)
+        # best score first, then lowest id
+        positions = positions[np.lexsort((positions, -scores[positions]))]
+        return positions, scores[positions]
+
+
+class StudentIndex:
+    # changes() reads the table through the request session; apply() and
+    # search() are CPU-bound and meant for the threadpool, so the event loop is
+    # not held up in the AsyncEngine mode.
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.build_ms = 0.0
+
+    def invalidate(self) -> None:
+        self._checked_at = 0.0
+
+    def _load(self, db: Session, after_id: int = 0) -> List[tuple]:
+        columns = [getattr(Student, f) for f in FIELDS]
+        return [tuple(r) for r in db.execute(select(*columns).where(Student.id > after_id).order_by(Student.id))]
+
+    def changes(self, db: Session) -> Optional[Tuple[str, List[tuple]]]:
+        # ("build", all rows), ("add", new rows) or None when the index is current
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.refresh_seconds:
+            return None
+        # concurrent requests keep using the current snapshot meanwhile
+        self._checked_at = now
+        try:
+            if snapshot is None:
+                return "build", self._load(db)
+            count, max_id = db.execute(select(func.count(Student.id), func.max(Student.id))).one()
+            new_rows = self._load(db, snapshot.max_id) if (max_id or 0) > snapshot.max_id else []
+            if len(snapshot.rows) + len(new_rows) != count:
+                # rows were deleted (or ids reused) since the index was built
+                return "build", self._load(db)
+            return ("add", new_rows) if new_rows else None
+        finally:
+            # end the read transaction before the connection goes back to the pool
+            db.rollback()
+
+    def apply(self, change: Tuple[str, List[tuple]]) -> None:
+        kind, rows = change
+        with self._lock:
+            started = time.perf_counter()
+            if kind == "build":
+                self._snapshot = _Snapshot.build(rows)
+                self.builds += 1
+                self.build_ms = (time.perf_counter() - started) * 1000
+            elif rows and self._snapshot is not None and rows[0][0] > self._snapshot.max_id:
+                self._snapshot = self._snapshot.add(rows)
+
+    def search(self, query: str, offset: int, limit: int) -> Tuple[List[dict], int]:
+        # one ranked page and the total number of matches
+        snapshot = self._snapshot
+        if snapshot is None:
+            return [], 0
+        positions, scores = snapshot.search(query)
+        page = positions[offset:offset + limit].tolist()
+        return [dict(zip(FIELDS, snapshot.rows[pos]), score=round(score, 3))
+                for pos, score in zip(page, scores[offset:offset + limit].tolist())], len(positions)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {"students": len(snapshot.rows) if snapshot else 0,
+                "trigrams": len(snapshot.postings) if snapshot else 0,
+                "builds": self.builds, "build_ms": round(self.build_ms, 1)}
+
+
+student_index = StudentIndex(settings.SEARCH_REFRESH_SECONDS)
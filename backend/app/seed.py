@@ -1,9 +1,17 @@
 import csv
 import random
+import time
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal
 from app.models import User, Student, Subject, Enrollment, Mark, RoleEnum
-from app.utils import hash_password, grade_from_marks
+from app.utils import hash_password
+from app.grading import grade_rows
+from app.hashing import hash_many, shutdown_hash_pools
+from app.results import rebuild_all
+from app.migrations import upgrade
+from app.search import student_index
+from app.terms import ensure_term
 from pathlib import Path
 
 SUBJECTS = [
@@ -22,6 +30,9 @@ TEACHERS = [
     ("teacher_en", "Teacher EN", "en@example.com"),
 ]
 
+# rows per INSERT statement / transaction for the bulk loaders below
+CHUNK_SIZE = 1000
+
 def ensure_admin(db: Session):
     if not db.query(User).filter(User.username == "admin").first():
         admin = User(
@@ -58,53 +69,158 @@ def seed_subjects_and_teachers(db: Session):
         db.commit()
     return code_to_subj
 
-def seed_students(db: Session, csv_path: str):
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _report(label: str, rows: int, started: float):
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"{label}: {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+def _read_student_rows(csv_path: str):
     with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            scode = row["Student_Code"].strip()
-            roll = str(row["Roll_No"]).strip()
-            name = row["Name"].strip().strip('"')
-            div = int(row["Division_ID"]) if row.get("Division_ID") else None
-            batch = row.get("Batch") or None
-            elective = row.get("Elective") or None
-            if not db.query(Student).filter(Student.roll_no == roll).first():
-                stu = Student(student_code=scode, roll_no=roll, name=name, division_id=div, batch=batch, elective=elective)
-                db.add(stu)
-                db.commit()
-                db.refresh(stu)
-                # create student user
-                uname = f"s{roll}"
-                if not db.query(User).filter(User.username == uname).first():
-                    su = User(username=uname, full_name=name, role=RoleEnum.student, password_hash=hash_password("student123"), student_id=stu.id)
-                    db.add(su)
-                    db.commit()
+        for row in csv.DictReader(f):
+            yield {
+                "student_code": row["Student_Code"].strip(),
+                "roll_no": str(row["Roll_No"]).strip(),
+                "name": row["Name"].strip().strip('"'),
+                "division_id": int(row["Division_ID"]) if row.get("Division_ID") else None,
+                "batch": row.get("Batch") or None,
+                "elective": row.get("Elective") or None,
+            }
+
+def seed_students(db: Session, csv_path: str, chunk_size: int = CHUNK_SIZE) -> int:
+    return load_students(db, _read_student_rows(csv_path), chunk_size)
+
+def load_students(db: Session, rows, chunk_size: int = CHUNK_SIZE, password_hash: str = None) -> int:
+    # Streams rows in chunks; existing keys are prefetched once per table and
+    # every chunk is written with multi-row INSERTs inside a single transaction.
+    # password_hash, when given, is shared by every new student user instead of
+    # hashing "student123" per account (synthetic datasets only).
+    started = time.perf_counter()
+    existing_rolls = set(db.scalars(select(Student.roll_no)))
+    existing_codes = set(db.scalars(select(Student.student_code)))
+    existing_users = set(db.scalars(select(User.username).where(User.role == RoleEnum.student)))
+    inserted = 0
+    for chunk in _chunks(rows, chunk_size):
+        new_rows = []
+        for r in chunk:
+            if r["roll_no"] in existing_rolls or r["student_code"] in existing_codes:
+                continue
+            existing_rolls.add(r["roll_no"])
+            existing_codes.add(r["student_code"])
+            new_rows.append(r)
+        if not new_rows:
+            continue
+        db.execute(insert(Student), new_rows)
+        roll_to_id = dict(db.execute(
+            select(Student.roll_no, Student.id).where(Student.roll_no.in_([r["roll_no"] for r in new_rows]))
+        ).all())
+        user_rows = []
+        for r in new_rows:
+            uname = f"s{r['roll_no']}"
+            if uname in existing_users:
+                continue
+            existing_users.add(uname)
+            user_rows.append({
+                "username": uname,
+                "full_name": r["name"],
+                "role": RoleEnum.student,
+                "student_id": roll_to_id[r["roll_no"]],
+            })
+        if user_rows:
+            hashes = [password_hash] * len(user_rows) if password_hash else hash_many(["student123"] * len(user_rows))
+            for row, pw_hash in zip(user_rows, hashes):
+                row["password_hash"] = pw_hash
+            db.execute(insert(User), user_rows)
+        db.commit()
+        inserted += len(new_rows)
+    student_index.invalidate()
+    _report("students", inserted, started)
+    return inserted
 
-def enroll_all_students_to_all_subjects(db: Session):
-    subs = db.query(Subject).all()
-    students = db.query(Student).all()
-    for stu in students:
-        for s in subs:
-            exists = db.query(Enrollment).filter(Enrollment.student_id == stu.id, Enrollment.subject_id == s.id).first()
-            if not exists:
-                db.add(Enrollment(student_id=stu.id, subject_id=s.id))
-    db.commit()
+def _missing_pairs(db: Session, model, chunk_size: int, *where):
+    existing = set(db.execute(select(model.student_id, model.subject_id).where(*where)).all())
+    subjects = db.execute(select(Subject.id, Subject.teacher_id)).all()
+    student_ids = db.scalars(select(Student.id).order_by(Student.id)).all()
+    pairs = (
+        (stu_id, subj_id, teacher_id)
+        for stu_id in student_ids
+        for subj_id, teacher_id in subjects
+        if (stu_id, subj_id) not in existing
+    )
+    return _chunks(pairs, chunk_size)
 
-def seed_random_marks(db: Session):
-    subs = db.query(Subject).all()
-    students = db.query(Student).all()
-    for stu in students:
-        for s in subs:
-            if not db.query(Mark).filter(Mark.student_id == stu.id, Mark.subject_id == s.id).first():
-                marks_val = random.randint(35, 100)
-                letter, gp = grade_from_marks(marks_val)
-                # attribute to the assigned teacher if exists else admin(1)
-                created_by = s.teacher_id or 1
-                db.add(Mark(student_id=stu.id, subject_id=s.id, marks=marks_val, grade=letter, grade_points=gp, created_by=created_by))
-    db.commit()
+def enroll_all_students_to_all_subjects(db: Session, chunk_size: int = CHUNK_SIZE) -> int:
+    started = time.perf_counter()
+    inserted = 0
+    for chunk in _missing_pairs(db, Enrollment, chunk_size):
+        db.execute(insert(Enrollment), [{"student_id": stu, "subject_id": subj} for stu, subj, _ in chunk])
+        db.commit()
+        inserted += len(chunk)
+    _report("enrollments", inserted, started)
+    return inserted
+
+def seed_random_marks(db: Session, chunk_size: int = CHUNK_SIZE) -> int:
+    # attempt 1 in the current term for every student and subject without a mark there
+    started = time.perf_counter()
+    inserted = 0
+    term_id = ensure_term(db)
+    for chunk in _missing_pairs(db, Mark, chunk_size, Mark.term_id == term_id):
+        marks = [random.randint(35, 100) for _ in chunk]
+        grades = grade_rows(db, [subj for _, subj, _ in chunk], marks)
+        # attribute to the assigned teacher if exists else admin(1)
+        rows = [{"student_id": stu, "subject_id": subj, "term_id": term_id, "attempt": 1, "marks": marks_val,
+                 "grade": letter, "grade_points": gp, "created_by": teacher_id or 1}
+                for (stu, subj, teacher_id), marks_val, (letter, gp) in zip(chunk, marks, grades)]
+        db.execute(insert(Mark), rows)
+        db.commit()
+        inserted += len(rows)
+    _report("marks", inserted, started)
+    return inserted
+
+def seed_synthetic(db: Session, n_students: int, n_subjects: int, chunk_size: int = CHUNK_SIZE) -> None:
+    # Synthetic dataset for benchmarks: n_subjects subjects (one teacher each,
+    # password teacher123) and n_students students (password student123)
+    # enrolled in every subject with random marks.
+    ensure_admin(db)
+    teacher_hash = hash_password("teacher123")
+    existing_codes = set(db.scalars(select(Subject.code)))
+    new_subjects = [f"SYN{i:03d}" for i in range(1, n_subjects + 1) if f"SYN{i:03d}" not in existing_codes]
+    if new_subjects:
+        db.execute(insert(User), [
+            {"username": f"teacher_{code.lower()}", "full_name": f"Teacher {code}", "role": RoleEnum.teacher,
+             "password_hash": teacher_hash}
+            for code in new_subjects
+        ])
+        teacher_ids = dict(db.execute(select(User.username, User.id).where(User.role == RoleEnum.teacher)).all())
+        db.execute(insert(Subject), [
+            {"code": code, "name": f"Synthetic Subject {code[3:]}", "credits": 3 + i % 2,
+             "teacher_id": teacher_ids[f"teacher_{code.lower()}"]}
+            for i, code in enumerate(new_subjects)
+        ])
+        db.commit()
+    electives = ("FJP", "DSA", "ML", None)
+    rows = (
+        {"student_code": f"SYN{i:07d}", "roll_no": f"9{i:07d}", "name": f"Synthetic Student {i}",
+         "division_id": i % 8 + 1, "batch": f"K{i % 6 + 1}", "elective": electives[i % len(electives)]}
+        for i in range(1, n_students + 1)
+    )
+    load_students(db, rows, chunk_size, password_hash=hash_password("student123"))
+    enroll_all_students_to_all_subjects(db, chunk_size)
+    seed_random_marks(db, chunk_size)
+    started = time.perf_counter()
+    _report("student_results", rebuild_all(db), started)
 
 if __name__ == "__main__":
-    Base.metadata.create_all(bind=engine)
+    upgrade()
     db = SessionLocal()
     try:
         ensure_admin(db)
@@ -114,6 +230,9 @@ if __name__ == "__main__":
         seed_students(db, str(csv_path))
         enroll_all_students_to_all_subjects(db)
         seed_random_marks(db)
+        started = time.perf_counter()
+        _report("student_results", rebuild_all(db), started)
         print("Seeding complete:", csv_path)
     finally:
         db.close()
+        shutdown_hash_pools()
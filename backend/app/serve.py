@@ -0,0 +1,103 @@
+# Production launch (run from backend/):
+#   python -m app.serve
+#
+# Applies migrations once in the parent (MIGRATE_ON_START), then starts
+# WEB_WORKERS worker processes: gunicorn with uvicorn workers where gunicorn
+# is available, otherwise uvicorn's own process manager (Windows). Engines,
+# pools, the write-behind journal connection and the profiler thread are all
+# created inside each worker after the fork, so WEB_PRELOAD only saves the
+# per-worker import and shares the imported code copy-on-write.
+# Each worker keeps its own pool: up to WEB_WORKERS x (DB_POOL_SIZE +
+# DB_MAX_OVERFLOW) database connections in total.
+import os
+import sys
+from .config import settings
+
+APP = "app.main:app"
+
+
+def worker_count() -> int:
+    return settings.WEB_WORKERS or os.cpu_count() or 1
+
+def check_shared_state(workers: int) -> None:
+    # Without RESPONSE_CACHE_URL every worker keeps its own ETag versions and
+    # misses the writes handled by the others. That is tolerable only while
+    # RESPONSE_CACHE_LOCAL_TTL bounds the staleness.
+    if workers <= 1 or settings.RESPONSE_CACHE_URL:
+        return
+    if not settings.RESPONSE_CACHE_LOCAL_TTL:
+        raise SystemExit(f"{workers} workers with RESPONSE_CACHE_LOCAL_TTL=0 and no RESPONSE_CACHE_URL: workers would "
+                         "serve responses that other workers' writes made stale, indefinitely. Set "
+                         "RESPONSE_CACHE_URL=redis://..., a RESPONSE_CACHE_LOCAL_TTL or WEB_WORKERS=1.")
+    print(f"WARNING: {workers} workers without RESPONSE_CACHE_URL: after a write handled by another worker, "
+          f"students and teachers may see the old data for up to {settings.RESPONSE_CACHE_LOCAL_TTL:g} s "
+          f"(RESPONSE_CACHE_LOCAL_TTL). Set RESPONSE_CACHE_URL=redis://host:6379/0 to share the versions.",
+          file=sys.stderr)
+
+def migrate() -> None:
+    from . import database
+    from .migrations import upgrade
+    for name in upgrade():
+        print("created index", name)
+    # close the parent's connections before any worker is forked
+    database.dispose()
+
+def _post_fork(server, worker) -> None:
+    from . import database
+    database.dispose(close=False)
+
+def gunicorn_options() -> dict:
+    return {
+        "bind": f"{settings.WEB_HOST}:{settings.WEB_PORT}",
+        "workers": worker_count(),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "timeout": settings.WEB_TIMEOUT,
+        "graceful_timeout": settings.WEB_TIMEOUT,
+        "keepalive": settings.WEB_KEEPALIVE,
+        "max_requests": settings.WEB_MAX_REQUESTS,
+        # spread the restarts so workers are not all recycled at once
+        "max_requests_jitter": settings.WEB_MAX_REQUESTS // 10,
+        "preload_app": settings.WEB_PRELOAD,
+        "post_fork": _post_fork,
+    }
+
+def run_gunicorn() -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options().items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from .main import app
+            return app
+
+    Server().run()
+
+def run_uvicorn() -> None:
+    import uvicorn
+    uvicorn.run(
+        APP,
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=worker_count(),
+        timeout_keep_alive=settings.WEB_KEEPALIVE,
+        limit_max_requests=settings.WEB_MAX_REQUESTS or None,
+    )
+
+def main() -> int:
+    check_shared_state(worker_count())
+    if settings.MIGRATE_ON_START:
+        migrate()
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_uvicorn()
+    else:
+        run_gunicorn()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
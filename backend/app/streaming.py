@@ -0,0 +1,43 @@
+# Streaming helpers for large result sets.
+#
+# Rows are read through a server-side cursor (stream_results + yield_per), so
+# memory stays flat regardless of table size. The generators open their own
+# session because the request-scoped one is closed before the body is sent;
+# pass the request session's bind to read from the same (replica) engine.
+import json
+from typing import Callable
+from fastapi.responses import StreamingResponse
+from .database import SessionLocal, AsyncSessionLocal
+
+YIELD_PER = 1000
+NDJSON = "application/x-ndjson"
+
+
+def iter_rows(stmt, yield_per: int = YIELD_PER, bind=None):
+    db = SessionLocal() if bind is None else SessionLocal(bind=bind)
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=yield_per))
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        db.close()
+
+async def aiter_rows(stmt, yield_per: int = YIELD_PER, bind=None):
+    async with (AsyncSessionLocal() if bind is None else AsyncSessionLocal(bind=bind)) as session:
+        result = await session.stream(stmt.execution_options(yield_per=yield_per))
+        async for partition in result.partitions():
+            for row in partition:
+                yield row
+
+def ndjson_response(stmt, to_dict: Callable, bind=None) -> StreamingResponse:
+    # Sync generators are iterated in the threadpool by Starlette; with
+    # DB_ASYNC the rows come from the AsyncEngine instead.
+    if AsyncSessionLocal is not None:
+        async def body():
+            async for row in aiter_rows(stmt, bind=bind):
+                yield json.dumps(to_dict(row)) + "\n"
+    else:
+        def body():
+            for row in iter_rows(stmt, bind=bind):
+                yield json.dumps(to_dict(row)) + "\n"
+    return StreamingResponse(body(), media_type=NDJSON)
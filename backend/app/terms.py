@@ -0,0 +1,249 @@
+# Exam terms and the two storage tiers of marks.
+#
+#   marks         hot tier: the effective mark (latest attempt) per student,
+#                 term and subject, for terms that are not archived. Results,
+#                 analytics, exports and re-grading read the current term's
+#                 rows only, through indexes that include term_id.
+#   mark_archive  every mark no longer in effect: earlier attempts, moved here
+#                 by marks.upsert_marks when a later attempt is written, and
+#                 all marks of archived terms. The primary key is (student_id,
+#                 term_id, subject_id, attempt), so one student's history is a
+#                 single primary-key range; only transcripts read it.
+#
+# Archiving a term closes it to writes, then moves its marks to mark_archive in
+# chunks, so the hot table and its indexes only ever hold the open terms.
+#   python -m app.terms                                list terms
+#   python -m app.terms create CODE NAME [--current]
+#   python -m app.terms current CODE                   (rebuilds student_results)
+#   python -m app.terms archive CODE
+# create --current, current and archive take --api URL --user NAME to go through
+# a running server's /admin/terms endpoints. Run directly, they change the
+# database only: running servers keep the previous current term for up to
+# CURRENT_TERM_TTL seconds, analytics for ANALYTICS_CACHE_TTL and cached
+# responses for RESPONSE_CACHE_LOCAL_TTL (with a shared RESPONSE_CACHE_URL the
+# command bumps the versions itself, so responses follow at once).
+from datetime import datetime, timezone
+from heapq import merge
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, delete, func, or_, select, true, update
+from sqlalchemy.orm import Session
+from .cache import LRUCache
+from .marks import ARCHIVE_KEY, ARCHIVED_COLUMNS, UPDATE_COLUMNS, upsert_rows
+from .models import Mark, MarkArchive, Student, Subject, Term
+
+DEFAULT_TERM = ("T1", "Term 1")
+ARCHIVE_CHUNK = 5000
+# other workers pick up a new current term within this many seconds
+CURRENT_TERM_TTL = 30
+# largest ?limit= of a transcript page
+TRANSCRIPT_MAX_PAGE = 1000
+TRANSCRIPT_FIELDS = ("term_id", "subject_id", "attempt", "term_code", "term_name", "subject_code", "subject_name",
+                     "credits", "marks", "grade", "grade_points", "effective")
+
+_current = LRUCache(maxsize=1, ttl=CURRENT_TERM_TTL)
+
+
+def current_term_id(db: Session) -> Optional[int]:
+    term_id = _current.get("id")
+    if term_id is None:
+        term_id = db.scalar(select(Term.id).where(Term.is_current).order_by(Term.id.desc()).limit(1))
+        if term_id is not None:
+            _current.set("id", term_id)
+    return term_id
+
+def ensure_term(db: Session) -> int:
+    # the current term, creating DEFAULT_TERM when there is none yet
+    term_id = current_term_id(db)
+    if term_id is None:
+        term = Term(code=DEFAULT_TERM[0], name=DEFAULT_TERM[1], is_current=True)
+        db.add(term)
+        db.commit()
+        term_id = term.id
+        _current.set("id", term_id)
+    return term_id
+
+def writable_term(db: Session, term_id: Optional[int] = None) -> int:
+    # the term a mark write goes to: term_id, or the current term when None
+    current = term_id is None
+    if current:
+        term_id = current_term_id(db)
+        if term_id is None:
+            raise LookupError("No current term")
+    term = db.get(Term, term_id)
+    if current and (term is None or term.archived_at is not None):
+        # a cached current term another process has since switched away from
+        # and archived (or deleted): look it up again
+        _current.invalidate("id")
+        term_id = current_term_id(db)
+        if term_id is None:
+            raise LookupError("No current term")
+        term = db.get(Term, term_id)
+    if term is None:
+        raise LookupError("Term not found")
+    if term.archived_at is not None:
+        raise ValueError("Term is archived")
+    return term_id
+
+def list_terms(db: Session) -> List[dict]:
+    counts = dict(db.execute(select(Mark.term_id, func.count()).group_by(Mark.term_id)).all())
+    return [{"id": t.id, "code": t.code, "name": t.name, "current": t.is_current,
+             "archived_at": t.archived_at, "hot_marks": counts.get(t.id, 0)}
+            for t in db.scalars(select(Term).order_by(Term.id))]
+
+def create_term(db: Session, code: str, name: str) -> Term:
+    if db.scalar(select(Term.id).where(Term.code == code)) is not None:
+        raise ValueError("Term code exists")
+    term = Term(code=code, name=name, is_current=False)
+    db.add(term)
+    db.commit()
+    db.refresh(term)
+    return term
+
+def set_current(db: Session, term_id: int) -> int:
+    # Makes term_id the current term and rebuilds every materialized result
+    # from its marks; returns the number of results written.
+    from .results import rebuild_all
+    term = db.get(Term, term_id)
+    if term is None:
+        raise LookupError("Term not found")
+    if term.archived_at is not None:
+        raise ValueError("Term is archived")
+    db.execute(update(Term).where(Term.id != term_id, Term.is_current).values(is_current=False))
+    term.is_current = True
+    db.commit()
+    _current.set("id", term_id)
+    return rebuild_all(db)
+
+def archive_term(db: Session, term_id: int, chunk_size: int = ARCHIVE_CHUNK) -> int:
+    # Closes the term to writes (archived_at), then moves its marks from the hot
+    # table to mark_archive, one chunk per transaction. An interrupted run is
+    # resumed by running it again: rows already in mark_archive are overwritten
+    # by the hot row they came from. Returns the number of marks moved.
+    term = db.get(Term, term_id)
+    if term is None:
+        raise LookupError("Term not found")
+    if term.is_current:
+        raise ValueError("The current term cannot be archived")
+    if term.archived_at is None:
+        term.archived_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        db.commit()
+    moved = 0
+    while True:
+        rows = db.execute(select(Mark.id, *(getattr(Mark, c) for c in ARCHIVED_COLUMNS))
+                          .where(Mark.term_id == term_id).order_by(Mark.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        upsert_rows(db, MarkArchive.__table__,
+                    [dict(zip(ARCHIVED_COLUMNS, r[1:]), superseded=False, archived_at=now) for r in rows],
+                    ARCHIVE_KEY, UPDATE_COLUMNS + ("created_by", "created_at", "superseded", "archived_at"))
+        db.execute(delete(Mark).where(Mark.id.in_([r[0] for r in rows])))
+        db.commit()
+        moved += len(rows)
+    return moved
+
+
+def _after(model, cursor: Tuple[int, int, int]):
+    # keyset condition (term_id, subject_id, attempt) > cursor, spelled out so
+    # every backend can use the index
+    t, s, a = cursor
+    return or_(model.term_id > t, and_(model.term_id == t, or_(
+        model.subject_id > s, and_(model.subject_id == s, model.attempt > a))))
+
+def _transcript_stmt(model, effective, student_id: int, cursor: Tuple[int, int, int], limit: int):
+    return (
+        select(model.term_id, model.subject_id, model.attempt, Term.code, Term.name, Subject.code, Subject.name,
+               Subject.credits, model.marks, model.grade, model.grade_points, effective)
+        .join(Term, Term.id == model.term_id)
+        .join(Subject, Subject.id == model.subject_id)
+        .where(model.student_id == student_id, _after(model, cursor))
+        .order_by(model.term_id, model.subject_id, model.attempt)
+        .limit(limit)
+    )
+
+def parse_cursor(cursor: str) -> Tuple[int, int, int]:
+    if not cursor:
+        return 0, 0, 0
+    parts = cursor.split(".")
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        raise ValueError("Invalid cursor")
+    return tuple(int(p) for p in parts)
+
+def transcript(db: Session, student_id: int, cursor: Tuple[int, int, int], limit: int) -> Tuple[List[dict], Optional[str]]:
+    # One page of a student's marks in every term and attempt, ordered by term,
+    # subject and attempt: the next rows of each tier after the cursor, merged.
+    # Returns the rows and the cursor of the next page (None on the last).
+    hot = db.execute(_transcript_stmt(Mark, true(), student_id, cursor, limit + 1)).all()
+    archived = db.execute(_transcript_stmt(MarkArchive, ~MarkArchive.superseded, student_id, cursor, limit + 1)).all()
+    rows = list(merge(hot, archived, key=lambda r: r[:3]))[:limit + 1]
+    next_cursor = ".".join(map(str, rows[limit - 1][:3])) if len(rows) > limit else None
+    return [dict(zip(TRANSCRIPT_FIELDS, r)) | {"effective": bool(r[-1])} for r in rows[:limit]], next_cursor
+
+def student_transcript(db: Session, student_id: int, cursor: str, limit: int) -> Tuple[List[dict], Optional[str]]:
+    # transcript() for a cursor as given in ?cursor=; LookupError for an
+    # unknown student, ValueError for a malformed cursor
+    if db.get(Student, student_id) is None:
+        raise LookupError("Student not found")
+    return transcript(db, student_id, parse_cursor(cursor), limit)
+
+
+def _term_id(rows: List[dict], code: str) -> int:
+    for t in rows:
+        if t["code"] == code:
+            return t["id"]
+    raise SystemExit(f"no term {code}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from .apiclient import AdminApi
+    from .config import settings
+    from .database import SessionLocal
+    from .httpcache import response_cache
+
+    parser = argparse.ArgumentParser(description="exam terms")
+    parser.add_argument("--api", help="base URL of a running server to go through, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--user", default="admin", help="admin username for --api (password: SRMS_ADMIN_PASSWORD or prompt)")
+    sub = parser.add_subparsers(dest="command")
+    create = sub.add_parser("create")
+    create.add_argument("code")
+    create.add_argument("name")
+    create.add_argument("--current", action="store_true")
+    sub.add_parser("current").add_argument("code")
+    sub.add_parser("archive").add_argument("code")
+    args = parser.parse_args()
+    if args.api:
+        api = AdminApi(args.api, args.user)
+        if args.command == "create":
+            api.call("POST", "/admin/terms", {"code": args.code, "name": args.name, "current": args.current})
+        elif args.command in ("current", "archive"):
+            result = api.call("POST", f"/admin/terms/{_term_id(api.call('GET', '/admin/terms'), args.code)}/{args.command}")
+            if args.command == "archive":
+                print(f"moved {result['marks_archived']} marks to mark_archive")
+        rows = api.call("GET", "/admin/terms")
+    else:
+        db = SessionLocal()
+        try:
+            switched = False
+            if args.command == "create":
+                term = create_term(db, args.code, args.name)
+                if args.current:
+                    set_current(db, term.id)
+                    switched = True
+            elif args.command in ("current", "archive"):
+                term_id = _term_id(list_terms(db), args.code)
+                if args.command == "current":
+                    set_current(db, term_id)
+                    switched = True
+                else:
+                    print(f"moved {archive_term(db, term_id)} marks to mark_archive")
+            rows = list_terms(db)
+        finally:
+            db.close()
+        if switched and settings.RESPONSE_CACHE_URL:
+            # shared versions reach every running server; local ones only this process
+            asyncio.run(response_cache.bump("grades"))
+    for t in rows:
+        state = "current" if t["current"] else f"archived {str(t['archived_at'])[:10]}" if t["archived_at"] else "open"
+        print(f"{t['id']:>4} {t['code']:<16} {t['name']:<32} {state:<20} {t['hot_marks']:>9} hot marks")
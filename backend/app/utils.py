@@ -1,5 +1,11 @@
 from passlib.context import CryptContext
-pwd_ctx = CryptContext(schemes=["pbkdf2_sha256"], default="pbkdf2_sha256")
+from .config import settings
+
+pwd_ctx = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    default="pbkdf2_sha256",
+    pbkdf2_sha256__default_rounds=settings.PBKDF2_ROUNDS,
+)
 
 
 def hash_password(pw: str) -> str:
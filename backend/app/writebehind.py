@@ -0,0 +1,370 @@
+# Write-behind queue for POST /teacher/marks (MARKS_WRITE_BEHIND=memory|journal).
+#
+# The route validates the submission, enqueues it and answers 202 with a
+# receipt. A background task drains the queue every WRITE_BEHIND_FLUSH_MS or
+# once WRITE_BEHIND_BATCH entries are waiting, coalesces entries for the same
+# (student, subject, term, attempt) and applies them as one multi-row upsert + results
+# refresh + commit. An entry whose mark was written directly after it was
+# submitted (a bulk upload; see marks.updated_at) is dropped rather than
+# applied over it, however long retries delay it. Receipts move from queued to
+# written / superseded / failed and can be polled at
+# GET /teacher/marks/receipts/{receipt}.
+#
+#   memory:  in-process deque; drained on shutdown, lost on a crash.
+#   journal: SQLite file (WRITE_BEHIND_JOURNAL) committed before the 202, so
+#            queued marks survive restarts. Any worker may append; one worker
+#            at a time drains, holding a lease row that it renews every flush.
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from .cache import LRUCache
+from .config import settings
+from .database import SessionLocal, AsyncSessionLocal
+from .analytics import mark_written
+from .httpcache import response_cache
+from .marks import upsert_marks
+from .models import Mark
+from .results import refresh_results
+from .grading import grade_rows
+from .terms import current_term_id
+
+log = logging.getLogger("srms.writebehind")
+
+# attempts before an entry that fails on its own is given up as failed
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 1.0
+LEASE_SECONDS = 10
+RETENTION_SECONDS = 24 * 3600
+# "attempt" is the exam attempt of the mark; "attempts" (below) counts apply retries
+ENTRY_FIELDS = ("receipt", "student_id", "subject_id", "marks", "teacher_id", "submitted_at", "term_id", "attempt")
+
+
+class MemoryQueue:
+    durable = False
+
+    def __init__(self):
+        self._pending = deque()
+        self._receipts = LRUCache(maxsize=100000)
+        self._lock = threading.Lock()
+
+    def put(self, entry: dict) -> None:
+        entry.update(status="queued", error=None, written_at=None, attempts=0)
+        with self._lock:
+            self._pending.append(entry)
+        self._receipts.set(entry["receipt"], entry)
+
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def take(self, limit: int) -> List[dict]:
+        # entries stay queued until finish(); there is a single consumer
+        with self._lock:
+            return [self._pending[i] for i in range(min(limit, len(self._pending)))]
+
+    def finish(self, entries: List[dict], status: dict, error: Optional[str] = None) -> None:
+        now = time.time()
+        done = set()
+        for entry in entries:
+            if entry["receipt"] in status or entry["attempts"] + 1 >= MAX_ATTEMPTS:
+                entry.update(status=status.get(entry["receipt"], "failed"), error=error, written_at=now)
+                done.add(entry["receipt"])
+            else:
+                entry["attempts"] += 1
+        with self._lock:
+            while self._pending and self._pending[0]["receipt"] in done:
+                self._pending.popleft()
+
+    def get(self, receipt: str) -> Optional[dict]:
+        return self._receipts.get(receipt)
+
+    def acquire(self) -> bool:
+        return True
+
+    def release(self) -> None:
+        pass
+
+
+class JournalQueue:
+    durable = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._token = uuid.uuid4().hex[:6]
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._pruned_at = 0.0
+
+    @property
+    def owner(self) -> str:
+        return f"{os.getpid()}-{self._token}"
+
+    def _connection(self) -> sqlite3.Connection:
+        # opened on first use and again in a forked worker; a sqlite connection
+        # must not be shared across processes. Callers hold self._lock.
+        if self._pid != os.getpid():
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=FULL")
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    receipt TEXT NOT NULL UNIQUE,
+                    student_id INTEGER NOT NULL,
+                    subject_id INTEGER NOT NULL,
+                    marks INTEGER NOT NULL,
+                    teacher_id INTEGER NOT NULL,
+                    submitted_at REAL NOT NULL,
+                    term_id INTEGER,
+                    attempt INTEGER NOT NULL DEFAULT 1,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    written_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS ix_entries_status ON entries (status, id);
+                CREATE TABLE IF NOT EXISTS lease (id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT, expires_at REAL);
+                INSERT OR IGNORE INTO lease (id, owner, expires_at) VALUES (1, NULL, 0);
+            """)
+            # journals written before marks had terms; their entries go to the current term
+            if "term_id" not in {row[1] for row in db.execute("PRAGMA table_info(entries)")}:
+                db.execute("ALTER TABLE entries ADD COLUMN term_id INTEGER")
+                db.execute("ALTER TABLE entries ADD COLUMN attempt INTEGER NOT NULL DEFAULT 1")
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def _execute(self, sql: str, params=()) -> int:
+        with self._lock:
+            return self._connection().execute(sql, params).rowcount
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    def put(self, entry: dict) -> None:
+        self._execute(
+            f"INSERT INTO entries ({', '.join(ENTRY_FIELDS)}) VALUES ({', '.join('?' * len(ENTRY_FIELDS))})",
+            tuple(entry[f] for f in ENTRY_FIELDS),
+        )
+
+    def depth(self) -> int:
+        return self._query("SELECT count(*) FROM entries WHERE status = 'queued'")[0][0]
+
+    def acquire(self) -> bool:
+        # lease so that only one process applies journal entries (keeps them in order)
+        now = time.time()
+        return self._execute(
+            "UPDATE lease SET owner = ?, expires_at = ? WHERE id = 1 AND (owner = ? OR owner IS NULL OR expires_at < ?)",
+            (self.owner, now + LEASE_SECONDS, self.owner, now),
+        ) == 1
+
+    def take(self, limit: int) -> List[dict]:
+        rows = self._query(
+            f"SELECT {', '.join(ENTRY_FIELDS)}, attempts FROM entries WHERE status = 'queued' ORDER BY id LIMIT ?",
+            (limit,),
+        )
+        return [dict(zip(ENTRY_FIELDS + ("attempts",), row)) for row in rows]
+
+    def finish(self, entries: List[dict], status: dict, error: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            for entry in entries:
+                if entry["receipt"] in status:
+                    db.execute("UPDATE entries SET status = ?, written_at = ? WHERE receipt = ?",
+                               (status[entry["receipt"]], now, entry["receipt"]))
+                else:
+                    db.execute(
+                        "UPDATE entries SET attempts = attempts + 1, error = ?, "
+                        "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END, "
+                        "written_at = CASE WHEN attempts + 1 >= ? THEN ? END WHERE receipt = ?",
+                        (error, MAX_ATTEMPTS, MAX_ATTEMPTS, now, entry["receipt"]))
+            if now - self._pruned_at > 3600:
+                db.execute("DELETE FROM entries WHERE status != 'queued' AND written_at < ?", (now - RETENTION_SECONDS,))
+                self._pruned_at = now
+            db.execute("COMMIT")
+
+    def get(self, receipt: str) -> Optional[dict]:
+        fields = ENTRY_FIELDS + ("status", "error", "written_at")
+        rows = self._query(f"SELECT {', '.join(fields)} FROM entries WHERE receipt = ?", (receipt,))
+        return dict(zip(fields, rows[0])) if rows else None
+
+    def release(self) -> None:
+        self._execute("UPDATE lease SET owner = NULL, expires_at = 0 WHERE id = 1 AND owner = ?", (self.owner,))
+
+
+def _newer_writes(db: Session, latest: dict) -> set:
+    # keys of `latest` whose mark was written after the entry was submitted;
+    # the rows stay locked until commit, so no such write can slip in between
+    rows = db.execute(
+        select(Mark.student_id, Mark.subject_id, Mark.term_id, Mark.attempt, Mark.updated_at)
+        .where(Mark.student_id.in_({k[0] for k in latest}), Mark.subject_id.in_({k[1] for k in latest}),
+               Mark.term_id.in_({k[2] for k in latest}))
+        .with_for_update()
+    )
+    return {tuple(r[:4]) for r in rows
+            if tuple(r[:4]) in latest and r.updated_at is not None and r.updated_at > latest[tuple(r[:4])]["updated_at"]}
+
+def _apply(db: Session, entries: List[dict]) -> dict:
+    # Coalesces to the latest entry per (student, subject, term, attempt) and
+    # writes them in one upsert; returns {receipt: status} for every entry in the batch.
+    latest = {}
+    term_id = None
+    for entry in entries:
+        if entry["term_id"] is None:
+            term_id = term_id or current_term_id(db)
+            entry["term_id"] = term_id
+        latest[(entry["student_id"], entry["subject_id"], entry["term_id"], entry["attempt"])] = dict(
+            entry, updated_at=datetime.fromtimestamp(entry["submitted_at"], timezone.utc).replace(tzinfo=None))
+    for key in _newer_writes(db, latest):
+        del latest[key]
+    winners = list(latest.values())
+    if winners:
+        grades = grade_rows(db, [e["subject_id"] for e in winners], [e["marks"] for e in winners])
+        upsert_marks(db, [
+            dict(student_id=e["student_id"], subject_id=e["subject_id"], term_id=e["term_id"], attempt=e["attempt"],
+                 marks=e["marks"], grade=letter, grade_points=gp, created_by=e["teacher_id"], updated_at=e["updated_at"])
+            for e, (letter, gp) in zip(winners, grades)
+        ])
+        refresh_results(db, list({e["student_id"] for e in winners}))
+    db.commit()
+    for subject_id in {e["subject_id"] for e in winners}:
+        mark_written(subject_id)
+    written = {e["receipt"] for e in winners}
+    return {e["receipt"]: "written" if e["receipt"] in written else "superseded" for e in entries}
+
+def _apply_sync(entries: List[dict]) -> dict:
+    db = SessionLocal()
+    try:
+        return _apply(db, entries)
+    finally:
+        db.close()
+
+
+class WriteBehind:
+    def __init__(self, queue, flush_ms: float, batch: int):
+        self.queue = queue
+        self.flush_interval = flush_ms / 1000
+        self.batch = batch
+        self.batches = 0
+        self.written = 0
+        self.superseded = 0
+        self.failed = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._isolate = False
+        self._submitted = 0
+
+    async def submit(self, student_id: int, subject_id: int, marks: int, teacher_id: int,
+                     term_id: int, attempt: int = 1) -> str:
+        entry = dict(receipt=uuid.uuid4().hex, student_id=student_id, subject_id=subject_id, marks=marks,
+                     teacher_id=teacher_id, submitted_at=time.time(), term_id=term_id, attempt=attempt)
+        if self.queue.durable:
+            await run_in_threadpool(self.queue.put, entry)
+        else:
+            self.queue.put(entry)
+        self._submitted += 1
+        if self._wake is not None and self._submitted >= self.batch:
+            self._wake.set()
+        return entry["receipt"]
+
+    async def receipt(self, receipt: str) -> Optional[dict]:
+        if self.queue.durable:
+            return await run_in_threadpool(self.queue.get, receipt)
+        return self.queue.get(receipt)
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # drains whatever is still queued so a clean shutdown loses nothing
+        self._stopping = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+        self.queue.release()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            self._submitted = 0
+            try:
+                while await self.flush() == self.batch:
+                    pass
+            except Exception:
+                log.exception("write-behind flush failed")
+            if self._stopping:
+                return
+
+    async def flush(self) -> int:
+        # applies one batch; returns the number of entries taken
+        queue = self.queue
+        if queue.durable and not await run_in_threadpool(queue.acquire):
+            return 0
+        limit = 1 if self._isolate else self.batch
+        entries = await run_in_threadpool(queue.take, limit) if queue.durable else queue.take(limit)
+        if not entries:
+            return 0
+        try:
+            if AsyncSessionLocal is not None:
+                async with AsyncSessionLocal() as db:
+                    status = await db.run_sync(_apply, entries)
+            else:
+                status = await run_in_threadpool(_apply_sync, entries)
+        except OperationalError as exc:
+            # database unreachable or locked: keep everything queued and back off
+            log.warning("write-behind batch of %d deferred: %s", len(entries), exc)
+            await asyncio.sleep(RETRY_DELAY)
+            return 0
+        except Exception as exc:
+            if len(entries) > 1:
+                # apply one entry at a time until the offending one has been failed
+                self._isolate = True
+                return 0
+            log.warning("write-behind entry %s failed: %s", entries[0]["receipt"], exc)
+            self.failed += entries[0]["attempts"] + 1 >= MAX_ATTEMPTS
+            await run_in_threadpool(queue.finish, entries, {}, str(exc))
+            return 0
+        self._isolate = False
+        await run_in_threadpool(queue.finish, entries, status)
+        await response_cache.bump(*{("student", e["student_id"]) for e in entries})
+        self.batches += 1
+        outcomes = list(status.values())
+        self.written += outcomes.count("written")
+        self.superseded += outcomes.count("superseded")
+        return len(entries)
+
+    def stats(self) -> dict:
+        return {"mode": settings.MARKS_WRITE_BEHIND, "queued": self.queue.depth(), "batches": self.batches,
+                "written": self.written, "superseded": self.superseded, "failed": self.failed}
+
+
+def _make() -> Optional[WriteBehind]:
+    mode = settings.MARKS_WRITE_BEHIND
+    if mode == "memory":
+        queue = MemoryQueue()
+    elif mode == "journal":
+        queue = JournalQueue(settings.WRITE_BEHIND_JOURNAL)
+    else:
+        return None
+    return WriteBehind(queue, settings.WRITE_BEHIND_FLUSH_MS, settings.WRITE_BEHIND_BATCH)
+
+write_behind = _make()
@@ -0,0 +1,44 @@
+# Settings are read once at import (app.config), so every configuration under
+# test (DB_ASYNC, read replicas, ...) runs in a fresh interpreter: the
+# run_scenario fixture starts one with the given environment on a temporary
+# SQLite database and calls a scenario function from this package in it.
+#   cd backend && python -m pytest -q
+import os
+import subprocess
+import sys
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def run_scenario(tmp_path):
+    def run(target: str, **env):
+        module, name = target.split(":")
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'srms.db'}", "DATABASE_REPLICA_URLS": "",
+               "RESPONSE_CACHE_URL": "", "RATE_LIMIT_ENABLED": "false", "MARKS_WRITE_BEHIND": "off",
+               "PBKDF2_ROUNDS": "1000", **env}
+        proc = subprocess.run([sys.executable, "-c", f"from {module} import {name}; {name}()"],
+                              cwd=BACKEND, env=env, capture_output=True, text=True, timeout=300)
+        assert proc.returncode == 0, proc.stdout + proc.stderr
+    return run
+
+
+def seeded_client(students: int = 20, subjects: int = 2):
+    # migrations plus a synthetic dataset, and a client that runs the lifespan;
+    # only call inside a scenario
+    from fastapi.testclient import TestClient
+    from app.database import SessionLocal
+    from app.main import app
+    from app.migrations import upgrade
+    from app.seed import seed_synthetic
+    upgrade()
+    db = SessionLocal()
+    seed_synthetic(db, students, subjects)
+    db.close()
+    return TestClient(app)
+
+def login(client, username: str, password: str) -> dict:
+    r = client.post("/auth/login", json={"username": username, "password": password})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
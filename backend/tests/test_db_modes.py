@@ -0,0 +1,31 @@
+# The same routes under the threadpool session and the AsyncEngine (aiosqlite).
+import pytest
+from tests.conftest import login, seeded_client
+
+
+def scenario_login_marks_write():
+    from app.database import get_async_engine
+    import app.config
+    with seeded_client() as client:
+        assert (get_async_engine() is not None) == app.config.settings.DB_ASYNC
+        student = login(client, "s90000001", "student123")
+        teacher = login(client, "teacher_syn001", "teacher123")
+        assert client.post("/auth/login", json={"username": "s90000001", "password": "x"}).status_code == 401
+
+        r = client.get("/student/me/marks", headers=student)
+        assert r.status_code == 200, r.text
+        before = {m["subject_code"]: m["marks"] for m in r.json()["marks"]}
+        assert set(before) == {"SYN001", "SYN002"}
+
+        subject_id = client.get("/teacher/my-subject", headers=teacher).json()["id"]
+        marks = 100 if before["SYN001"] != 100 else 0
+        r = client.post("/teacher/marks", json={"student_id": 1, "subject_id": subject_id, "marks": marks},
+                        headers=teacher)
+        assert r.status_code == 200, r.text
+        r = client.get("/student/me/marks", headers=student)
+        assert {m["subject_code"]: m["marks"] for m in r.json()["marks"]} == dict(before, SYN001=marks)
+
+
+@pytest.mark.parametrize("db_async", ["false", "true"])
+def test_login_marks_and_mark_write(run_scenario, db_async):
+    run_scenario("tests.test_db_modes:scenario_login_marks_write", DB_ASYNC=db_async)
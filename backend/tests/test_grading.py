@@ -0,0 +1,81 @@
+# Grade schemes: validation, and the NumPy engine against the legacy
+# utils.grade_from_marks chain.
+from tests.conftest import login, seeded_client
+
+SCHEME = {"kind": "absolute", "cutoffs": [35, 55, 75], "letters": ["F", "P", "M", "D"], "points": [0, 4, 7, 10]}
+
+
+def scenario_invalid_schemes():
+    client = seeded_client()
+    with client:
+        admin = login(client, "admin", "admin123")
+        teacher = login(client, "teacher_syn001", "teacher123")
+        subject_id = client.get("/teacher/my-subject", headers=teacher).json()["id"]
+        path = f"/admin/grading/subjects/{subject_id}"
+        default = client.get(path, headers=admin).json()["scheme"]
+        for bad in ({"pass_mark": 101}, {"pass_mark": -1}, {"points": [0, 4, -7, 10]}, {"points": [0, 7, 4, 10]},
+                    {"cutoffs": [55, 35, 75]}):
+            r = client.put(path, json={**SCHEME, **bad}, headers=admin)
+            assert r.status_code == 400, (bad, r.status_code, r.text)
+        assert client.get(path, headers=admin).json()["scheme"] == default
+        assert client.put(path, json=SCHEME, headers=admin).status_code == 200
+
+
+def test_invalid_schemes(run_scenario):
+    run_scenario("tests.test_grading:scenario_invalid_schemes")
+
+
+def _boundaries(cutoffs) -> list:
+    return sorted({0, 100} | {c + d for c in cutoffs for d in (-1, 0, 1)})
+
+def _chain(scheme: dict, m: int) -> tuple:
+    # the legacy if-chain, for any scheme: the grade of the highest cutoff reached
+    for cutoff, letter, points in reversed(list(zip(scheme["cutoffs"], scheme["letters"][1:], scheme["points"][1:]))):
+        if m >= cutoff:
+            return letter, float(points)
+    return scheme["letters"][0], float(scheme["points"][0])
+
+def scenario_engine_matches_legacy_chain():
+    from sqlalchemy import select
+    from app.database import SessionLocal
+    from app.grading import DEFAULT_SCHEME, grade_rows
+    from app.models import Mark
+    from app.utils import grade_from_marks
+    client = seeded_client(students=40)
+    with client:
+        admin = login(client, "admin", "admin123")
+        teacher = login(client, "teacher_syn001", "teacher123")
+        subject_id = client.get("/teacher/my-subject", headers=teacher).json()["id"]
+        default = _boundaries(DEFAULT_SCHEME.cutoffs)
+        custom = _boundaries(SCHEME["cutoffs"])
+        db = SessionLocal()
+        assert grade_rows(db, [subject_id] * len(default), default) == [grade_from_marks(m) for m in default]
+
+        # one student per boundary mark, written with the default scheme
+        for student_id, m in enumerate(default + custom, start=1):
+            r = client.post("/teacher/marks", json={"student_id": student_id, "subject_id": subject_id, "marks": m},
+                            headers=teacher)
+            assert r.status_code == 200, r.text
+        def stored():
+            db.expire_all()
+            return db.execute(select(Mark.marks, Mark.grade, Mark.grade_points)
+                              .where(Mark.subject_id == subject_id)).all()
+        rows = stored()
+        assert {m for m, _, _ in rows} >= set(default + custom)
+        assert all((g, p) == grade_from_marks(m) for m, g, p in rows)
+
+        # a scheme change re-grades every mark set-based (UPDATE ... CASE)
+        r = client.put(f"/admin/grading/subjects/{subject_id}", json=SCHEME, headers=admin)
+        assert r.status_code == 200 and r.json()["regraded"]["marks"] == len(rows), r.text
+        rows = stored()
+        assert all((g, p) == _chain(SCHEME, m) for m, g, p in rows), rows
+        assert grade_rows(db, [subject_id] * len(custom), custom) == [_chain(SCHEME, m) for m in custom]
+
+        # and back to the default
+        assert client.delete(f"/admin/grading/subjects/{subject_id}", headers=admin).status_code == 200
+        assert all((g, p) == grade_from_marks(m) for m, g, p in stored())
+        db.close()
+
+
+def test_engine_matches_legacy_chain(run_scenario):
+    run_scenario("tests.test_grading:scenario_engine_matches_legacy_chain")
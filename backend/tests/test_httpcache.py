@@ -0,0 +1,78 @@
+# Conditional GETs: a repeat request with If-None-Match is answered 304 without
+# a body, and each write bumps the versions of exactly the responses it changes.
+from tests.conftest import login, seeded_client
+
+
+def _get(client, path: str, headers: dict, etag: str = None):
+    r = client.get(path, headers=dict(headers, **({"If-None-Match": etag} if etag else {})))
+    assert r.status_code in (200, 304), r.text
+    return r
+
+def _changed(client, path: str, headers: dict, etag: str) -> str:
+    # a 200 with a new ETag; returns it
+    r = _get(client, path, headers, etag)
+    assert r.status_code == 200 and r.headers["ETag"] != etag, (path, r.status_code)
+    return r.headers["ETag"]
+
+def _unchanged(client, path: str, headers: dict, etag: str) -> None:
+    r = _get(client, path, headers, etag)
+    assert r.status_code == 304 and r.content == b"", (path, r.status_code)
+    assert r.headers["ETag"] == etag
+
+
+def scenario_etags():
+    from sqlalchemy import select
+    from app.database import SessionLocal
+    from app.models import User
+    client = seeded_client()
+    with client:
+        admin = login(client, "admin", "admin123")
+        teacher = login(client, "teacher_syn001", "teacher123")
+        other_teacher = login(client, "teacher_syn002", "teacher123")
+        student = login(client, "s90000001", "student123")
+        subject_id = client.get("/teacher/my-subject", headers=teacher).json()["id"]
+
+        marks = _get(client, "/student/me/marks", student).headers["ETag"]
+        _unchanged(client, "/student/me/marks", student, marks)
+
+        # a mark write bumps that student only
+        r = client.post("/teacher/marks", json={"student_id": 2, "subject_id": subject_id, "marks": 55}, headers=teacher)
+        assert r.status_code == 200, r.text
+        _unchanged(client, "/student/me/marks", student, marks)
+        r = client.post("/teacher/marks", json={"student_id": 1, "subject_id": subject_id, "marks": 55}, headers=teacher)
+        assert r.status_code == 200, r.text
+        marks = _changed(client, "/student/me/marks", student, marks)
+        _unchanged(client, "/student/me/marks", student, marks)
+
+        # a re-grade bumps every student's marks
+        assert client.post("/admin/grading/regrade", headers=admin).status_code == 200
+        marks = _changed(client, "/student/me/marks", student, marks)
+
+        subjects = _get(client, "/admin/subjects", admin).headers["ETag"]
+        mine = _get(client, "/teacher/my-subject", teacher).headers["ETag"]
+        theirs = _get(client, "/teacher/my-subject", other_teacher).headers["ETag"]
+        _unchanged(client, "/admin/subjects", admin, subjects)
+
+        r = client.post("/admin/subjects", params={"code": "NEW1", "name": "New Subject"}, headers=admin)
+        assert r.status_code == 200, r.text
+        subjects = _changed(client, "/admin/subjects", admin, subjects)
+        assert "NEW1" in {s["code"] for s in client.get("/admin/subjects", headers=admin).json()}
+        _unchanged(client, "/teacher/my-subject", teacher, mine)
+        _unchanged(client, "/student/me/marks", student, marks)
+
+        # reassigning a subject bumps the subject list and both teachers
+        db = SessionLocal()
+        other_id = db.scalar(select(User.id).where(User.username == "teacher_syn002"))
+        db.close()
+        r = client.post("/admin/assign-teacher", params={"subject_id": subject_id, "teacher_user_id": other_id},
+                        headers=admin)
+        assert r.status_code == 200, r.text
+        _changed(client, "/admin/subjects", admin, subjects)
+        _changed(client, "/teacher/my-subject", teacher, mine)
+        _changed(client, "/teacher/my-subject", other_teacher, theirs)
+        _unchanged(client, "/student/me/marks", student, marks)
+
+
+def test_etags(run_scenario):
+    # versions never expire, so an unchanged response is always a 304
+    run_scenario("tests.test_httpcache:scenario_etags", RESPONSE_CACHE_LOCAL_TTL="0")
@@ -0,0 +1,40 @@
+# Mark writes: the single and the bulk endpoint accept the same range, and a
+# bulk upload reports every rejected row while writing the rest.
+from tests.conftest import login, seeded_client
+
+
+def scenario_mark_validation():
+    client = seeded_client()
+    with client:
+        teacher = login(client, "teacher_syn001", "teacher123")
+        student = login(client, "s90000001", "student123")
+        subject_id = client.get("/teacher/my-subject", headers=teacher).json()["id"]
+        for marks in (-5, 101, 150):
+            r = client.post("/teacher/marks", json={"student_id": 1, "subject_id": subject_id, "marks": marks},
+                            headers=teacher)
+            assert r.status_code == 422, (marks, r.status_code, r.text)
+        for attempt in (0, -1):
+            r = client.post("/teacher/marks", json={"student_id": 1, "subject_id": subject_id, "marks": 50,
+                                                    "attempt": attempt}, headers=teacher)
+            assert r.status_code == 422, (attempt, r.status_code, r.text)
+
+        body = "\n".join(["student_id,marks", "1,70", "abc,50", "99999,60", "2,150", "3,-1", "4,55", "1,80", "4,65"])
+        r = client.post("/teacher/marks/bulk", content=body.encode(), headers={**teacher, "Content-Type": "text/csv"})
+        assert r.status_code == 200, r.text
+        report = r.json()
+        assert report["received"] == 8 and report["written"] == 2, report
+        errors = {e["row"]: e["error"] for e in report["errors"]}
+        assert errors == {
+            1: "Superseded by a later row",
+            2: "student_id and integer marks required",
+            3: "Student not found",
+            4: "marks must be between 0 and 100",
+            5: "marks must be between 0 and 100",
+            6: "Superseded by a later row",
+        }, errors
+        marks = {m["subject_code"]: m["marks"] for m in client.get("/student/me/marks", headers=student).json()["marks"]}
+        assert marks["SYN001"] == 80, marks
+
+
+def test_mark_validation(run_scenario):
+    run_scenario("tests.test_marks:scenario_mark_validation")
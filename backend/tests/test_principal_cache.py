@@ -0,0 +1,36 @@
+# The authenticated-user cache: a role change or a deleted user made in the
+# database takes effect once the cached principal expires (PRINCIPAL_CACHE_TTL),
+# instead of being served from the LRU for as long as it is used.
+import time
+from tests.conftest import login, seeded_client
+
+TTL = 1
+
+
+def scenario_principal_changes():
+    from sqlalchemy import delete, update
+    from app.database import SessionLocal
+    from app.deps import principal_cache
+    from app.models import RoleEnum, User
+    client = seeded_client()
+    with client:
+        teacher = login(client, "teacher_syn001", "teacher123")
+        other = login(client, "teacher_syn002", "teacher123")
+        for headers in (teacher, other, teacher):
+            assert client.get("/teacher/my-subject", headers=headers).status_code == 200
+        assert principal_cache.stats()["hits"] >= 1
+
+        db = SessionLocal()
+        db.execute(update(User).where(User.username == "teacher_syn001").values(role=RoleEnum.student))
+        db.execute(delete(User).where(User.username == "teacher_syn002"))
+        db.commit()
+        db.close()
+        time.sleep(TTL + 0.2)
+        r = client.get("/teacher/my-subject", headers=teacher)
+        assert r.status_code == 403, r.text
+        r = client.get("/teacher/my-subject", headers=other)
+        assert r.status_code == 401, r.text
+
+
+def test_principal_changes(run_scenario):
+    run_scenario("tests.test_principal_cache:scenario_principal_changes", PRINCIPAL_CACHE_TTL=str(TTL))
@@ -0,0 +1,11 @@
+# The query-plan regression check (app.bench.query_plans) on SQLite: every
+# statement of every hot route uses an index.
+
+
+def scenario_query_plans():
+    from app.bench.query_plans import run
+    assert run() == 0, "a hot route failed or a hot query scans a whole table; see the plans above"
+
+
+def test_hot_queries_use_indexes(run_scenario):
+    run_scenario("tests.test_query_plans:scenario_query_plans")
@@ -0,0 +1,26 @@
+# Rate limiting with the default rules: an admin page walking a long list is not
+# throttled, and an oversized login body is refused before it is buffered.
+from tests.conftest import login, seeded_client
+
+
+def scenario_default_limits():
+    client = seeded_client(students=150)
+    with client:
+        admin = login(client, "admin", "admin123")
+        cursor, pages = None, 0
+        while True:
+            r = client.get("/admin/students?limit=1" + (f"&cursor={cursor}" if cursor else ""), headers=admin)
+            assert r.status_code == 200, (pages, r.status_code, r.text)
+            pages += 1
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert pages >= 150, pages
+        r = client.post("/auth/login", content=b'{"username":"' + b"a" * 8192 + b'"}',
+                        headers={"Content-Type": "application/json"})
+        assert r.status_code == 413, r.text
+        login(client, "admin", "admin123")
+
+
+def test_default_limits(run_scenario):
+    run_scenario("tests.test_ratelimit:scenario_default_limits", RATE_LIMIT_ENABLED="true")
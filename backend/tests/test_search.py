@@ -0,0 +1,57 @@
+# Student search: ranking, who may call it, and newly added students showing up.
+from tests.conftest import login, seeded_client
+
+STUDENTS = [
+    {"student_code": "STU100", "roll_no": "100", "name": "Asha Patil"},
+    {"student_code": "STU1001", "roll_no": "1001", "name": "Asha Patel"},
+]
+
+
+def _add(rows):
+    from app.database import SessionLocal
+    from app.seed import load_students
+    db = SessionLocal()
+    load_students(db, [dict(r, division_id=1, batch="K1", elective=None) for r in rows])
+    db.close()
+
+def _codes(client, headers, q: str) -> list:
+    r = client.get("/admin/students/search", params={"q": q}, headers=headers)
+    assert r.status_code == 200, r.text
+    return [s["student_code"] for s in r.json()]
+
+
+def scenario_search():
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import Student
+    from app.search import student_index
+    client = seeded_client()
+    with client:
+        admin = login(client, "admin", "admin123")
+        teacher = login(client, "teacher_syn001", "teacher123")
+        student = login(client, "s90000001", "student123")
+        assert _codes(client, admin, "asha") == []
+        assert client.get("/admin/students/search", params={"q": "asha"}, headers=student).status_code == 403
+
+        # loaded after the index was built: the loader invalidates it
+        _add(STUDENTS)
+        assert _codes(client, teacher, "asha") == ["STU100", "STU1001"]
+        # exact code or roll number first, then prefixes
+        assert _codes(client, teacher, "stu100") == ["STU100", "STU1001"]
+        assert _codes(client, admin, "1001") == ["STU1001"]
+        # an exact roll number with a misspelt name beats an exact name with a prefix roll number
+        assert _codes(client, admin, "patel 100") == ["STU100", "STU1001"]
+        assert _codes(client, admin, "asha patl") == ["STU100", "STU1001"]
+
+        # written by another process: seen on the next check of the table
+        db = SessionLocal()
+        db.execute(insert(Student), [{"student_code": "STU2000", "roll_no": "2000", "name": "Bhavna Rao",
+                                      "division_id": 1, "batch": "K1"}])
+        db.commit()
+        db.close()
+        student_index.refresh_seconds = 0
+        assert _codes(client, admin, "bhavna") == ["STU2000"]
+
+
+def test_search(run_scenario):
+    run_scenario("tests.test_search:scenario_search")
@@ -0,0 +1,95 @@
+# Switching and archiving terms: an archive closes the term before moving its
+# marks and can be resumed, and no write reaches an archived term.
+from tests.conftest import login, seeded_client
+
+
+def scenario_archive_term():
+    from sqlalchemy import func, select
+    from app import terms
+    from app.database import SessionLocal
+    from app.models import Mark, MarkArchive
+    client = seeded_client()
+    with client:
+        admin = login(client, "admin", "admin123")
+        teacher = login(client, "teacher_syn001", "teacher123")
+        subject_id = client.get("/teacher/my-subject", headers=teacher).json()["id"]
+        old = next(t for t in client.get("/admin/terms", headers=admin).json() if t["current"])
+        r = client.post("/admin/terms", json={"code": "T2", "name": "Term 2", "current": True}, headers=admin)
+        assert r.status_code == 200, r.text
+        new = r.json()
+
+        db = SessionLocal()
+        hot = db.scalar(select(func.count()).select_from(Mark).where(Mark.term_id == old["id"]))
+        # the last hot row (moved by the resumed run) already in the archive
+        first = db.scalars(select(Mark).where(Mark.term_id == old["id"]).order_by(Mark.id.desc())).first()
+        key = (first.student_id, first.term_id, first.subject_id, first.attempt)
+        marks = first.marks
+        db.add(MarkArchive(student_id=key[0], term_id=key[1], subject_id=key[2], attempt=key[3], marks=0, grade="F",
+                           grade_points=0, created_by=first.created_by, superseded=True, archived_at=first.created_at))
+        db.commit()
+
+        # interrupted after the first chunk
+        upsert_rows, calls = terms.upsert_rows, []
+        def failing(*args, **kwargs):
+            if calls:
+                raise RuntimeError("interrupted")
+            calls.append(1)
+            upsert_rows(*args, **kwargs)
+        terms.upsert_rows = failing
+        try:
+            terms.archive_term(db, old["id"], chunk_size=5)
+        except RuntimeError:
+            db.rollback()
+        terms.upsert_rows = upsert_rows
+        r = client.post("/teacher/marks", json={"student_id": 1, "subject_id": subject_id, "marks": 50,
+                                                "term_id": old["id"]}, headers=teacher)
+        assert r.status_code == 409, r.text
+
+        r = client.post(f"/admin/terms/{old['id']}/archive", headers=admin)
+        assert r.status_code == 200, r.text
+        assert r.json()["marks_archived"] == hot - 5
+        db.expire_all()
+        row = db.get(MarkArchive, key)
+        assert not row.superseded and row.marks == marks, (row.superseded, row.marks, marks)
+
+        # a worker still caching the archived term as current
+        terms._current.set("id", old["id"])
+        assert terms.writable_term(db) == new["id"]
+        db.close()
+
+
+def test_archive_term(run_scenario):
+    run_scenario("tests.test_terms:scenario_archive_term")
+
+
+def scenario_cgpa_across_terms():
+    from app.results import weighted_gpa
+    client = seeded_client()
+    with client:
+        admin = login(client, "admin", "admin123")
+        student = login(client, "s90000001", "student123")
+        teacher = login(client, "teacher_syn001", "teacher123")
+        credits = {s["code"]: s["credits"] for s in client.get("/admin/subjects", headers=admin).json()}
+        before = client.get("/student/me/marks", headers=student).json()
+        assert before["sgpa"] == before["cgpa"] > 0, before
+        old = next(t for t in client.get("/admin/terms", headers=admin).json() if t["current"])
+        r = client.post("/admin/terms", json={"code": "T2", "name": "Term 2", "current": True}, headers=admin)
+        assert r.status_code == 200, r.text
+        fresh = client.get("/student/me/marks", headers=student).json()
+        assert fresh["marks"] == [] and fresh["sgpa"] == 0.0 and fresh["cgpa"] == before["cgpa"], fresh
+
+        # a mark in the new term, with the old one archived
+        subject_id = client.get("/teacher/my-subject", headers=teacher).json()["id"]
+        r = client.post("/teacher/marks", json={"student_id": 1, "subject_id": subject_id, "marks": 100},
+                        headers=teacher)
+        assert r.status_code == 200, r.text
+        assert client.post(f"/admin/terms/{old['id']}/archive", headers=admin).status_code == 200
+        after = client.get("/student/me/marks", headers=student).json()
+        [mark] = after["marks"]
+        assert after["sgpa"] == mark["grade_points"], after
+        expected, _ = weighted_gpa([(m["grade_points"], credits[m["subject_code"]]) for m in before["marks"] + [mark]])
+        assert after["cgpa"] == expected, (after, expected)
+
+
+def test_cgpa_across_terms(run_scenario):
+    run_scenario("tests.test_terms:scenario_cgpa_across_terms")
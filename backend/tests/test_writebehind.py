@@ -0,0 +1,34 @@
+# Queued single marks against direct (bulk) writes of the same mark.
+import time
+from tests.conftest import login, seeded_client
+
+
+def scenario_bulk_after_queued_single():
+    from app.database import SessionLocal
+    from app.models import Mark
+    with seeded_client() as client:
+        teacher = login(client, "teacher_syn001", "teacher123")
+        admin = login(client, "admin", "admin123")
+        subject_id = client.get("/teacher/my-subject", headers=teacher).json()["id"]
+        r = client.post("/teacher/marks", json={"student_id": 1, "subject_id": subject_id, "marks": 11}, headers=teacher)
+        assert r.status_code == 202, r.text
+        receipt = r.json()["receipt"]
+        # the bulk upload comes later but is written first
+        r = client.post("/teacher/marks/bulk", json=[{"student_id": 1, "marks": 99}], headers=teacher)
+        assert r.json()["written"] == 1, r.text
+        for _ in range(100):
+            entry = client.get(f"/teacher/marks/receipts/{receipt}", headers=teacher).json()
+            if entry["status"] != "queued":
+                break
+            time.sleep(0.05)
+        assert entry["status"] == "superseded", entry
+        stats = client.get("/admin/write-behind", headers=admin).json()
+        assert stats["written"] == 0 and stats["superseded"] == 1, stats
+        db = SessionLocal()
+        assert db.query(Mark.marks).filter(Mark.student_id == 1, Mark.subject_id == subject_id).scalar() == 99
+        db.close()
+
+
+def test_queued_single_does_not_overwrite_later_bulk(run_scenario, tmp_path):
+    run_scenario("tests.test_writebehind:scenario_bulk_after_queued_single", MARKS_WRITE_BEHIND="journal",
+                 WRITE_BEHIND_JOURNAL=str(tmp_path / "journal.db"), WRITE_BEHIND_FLUSH_MS="500")
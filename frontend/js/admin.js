@@ -4,19 +4,25 @@
 })().catch(console.error);
 
 async function loadSubjects(){
-  const data = await apiGet('/admin/subjects');
+  const data = await apiGetAll('/admin/subjects');
   const tbl = document.getElementById('subjects');
   tbl.innerHTML = `<tr><th>ID</th><th>Code</th><th>Name</th><th>Credits</th><th>TeacherID</th></tr>` + 
     data.map(s => `<tr><td>${s.id}</td><td>${s.code}</td><td>${s.name}</td><td>${s.credits}</td><td>${s.teacher_id ?? ''}</td></tr>`).join('');
 }
 
 async function loadStudents(){
-  const data = await apiGet('/admin/students');
+  const data = await apiGetAll('/admin/students?limit=1000');
   const tbl = document.getElementById('students');
   tbl.innerHTML = `<tr><th>ID</th><th>Username</th><th>Full Name</th><th>Role</th></tr>` + 
     data.map(u => `<tr><td>${u.id}</td><td>${u.username}</td><td>${u.full_name ?? ''}</td><td>${u.role}</td></tr>`).join('');
 }
 
+function findStudent(q){
+  searchStudentsDebounced(q, data => {
+    document.getElementById('found_students').innerHTML = data.length ? studentRows(data) : '';
+  });
+}
+
 async function createSubject(){
   const code = document.getElementById('sub_code').value.trim();
   const name = document.getElementById('sub_name').value.trim();
@@ -11,14 +11,66 @@ async function apiLogin(username, password){
     headers: { 'Content-Type':'application/json' },
     body: JSON.stringify({ username, password })
   });
+  // throttled: the caller shows how long to wait instead of 'invalid credentials'
+  if(res.status === 429) return { retryAfter: Number(res.headers.get('Retry-After')) || 60 };
   if(!res.ok) return null;
   return await res.json();
 }
 
-async function apiGet(path){
-  const res = await fetch(`${API_BASE}${path}`, { headers: { ...authHeaders() }});
+// GET responses carrying an ETag are kept per token + URL and revalidated with
+// If-None-Match; a 304 reuses the stored body without re-downloading it.
+// A 429 is retried after its Retry-After, up to MAX_RETRIES times.
+const etagCache = new Map();
+const MAX_RETRIES = 3;
+
+async function cachedGet(url){
+  const key = `${localStorage.getItem('token')}|${url}`;
+  const hit = etagCache.get(key);
+  const headers = { ...authHeaders() };
+  if(hit) headers['If-None-Match'] = hit.etag;
+  let res = await fetch(url, { headers });
+  for(let attempt = 0; res.status === 429 && attempt < MAX_RETRIES; attempt++){
+    const wait = Number(res.headers.get('Retry-After')) || 1;
+    await new Promise(r => setTimeout(r, wait * 1000));
+    res = await fetch(url, { headers });
+  }
+  if(res.status === 304 && hit) return hit;
   if(!res.ok) throw new Error(await res.text());
-  return await res.json();
+  const entry = { etag: res.headers.get('ETag'), data: await res.json(), next: res.headers.get('X-Next-Cursor') };
+  if(entry.etag) etagCache.set(key, entry);
+  return entry;
+}
+
+async function apiGet(path){
+  return (await cachedGet(`${API_BASE}${path}`)).data;
+}
+
+// Follows keyset pagination (X-Next-Cursor) and returns every page concatenated.
+async function apiGetAll(path){
+  const sep = path.includes('?') ? '&' : '?';
+  let rows = [], cursor = null;
+  do {
+    const url = cursor ? `${API_BASE}${path}${sep}cursor=${cursor}` : `${API_BASE}${path}`;
+    const page = await cachedGet(url);
+    rows = rows.concat(page.data);
+    cursor = page.next;
+  } while(cursor);
+  return rows;
+}
+
+// Ranked student search (name, roll number or student code); admins and teachers.
+let searchTimer = null;
+function searchStudentsDebounced(q, render){
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(async () => {
+    q = q.trim();
+    render(q ? await apiGet(`/admin/students/search?q=${encodeURIComponent(q)}&limit=20`) : []);
+  }, 150);
+}
+
+function studentRows(data){
+  return `<tr><th>ID</th><th>Code</th><th>Roll No</th><th>Name</th><th>Div</th><th>Batch</th></tr>` +
+    data.map(s => `<tr><td>${s.id}</td><td>${s.student_code}</td><td>${s.roll_no}</td><td>${s.name}</td><td>${s.division_id ?? ''}</td><td>${s.batch ?? ''}</td></tr>`).join('');
 }
 
 async function apiPost(path, body){
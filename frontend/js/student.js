@@ -7,6 +7,7 @@
        <div><div class="tag">Code</div><div>${prof.student_code}</div></div>
      </div>`;
   const res = await apiGet('/student/me/marks');
+  document.getElementById('sgpa').textContent = res.sgpa.toFixed(2);
   document.getElementById('cgpa').textContent = res.cgpa.toFixed(2);
   const tbl = document.getElementById('marks');
   tbl.innerHTML = `<tr><th>Subject</th><th>Marks</th><th>Grade</th><th>Points</th></tr>` +
@@ -4,6 +4,12 @@
   el.textContent = s?.code ? `${s.code} — ${s.name} (id=${s.id})` : 'No subject assigned';
 })().catch(console.error);
 
+function findStudent(q){
+  searchStudentsDebounced(q, data => {
+    document.getElementById('found_students').innerHTML = data.length ? studentRows(data) : '';
+  });
+}
+
 async function submitMark(){
   const student_id = parseInt(document.getElementById('t_student_id').value, 10);
   const subject_id = parseInt(document.getElementById('t_subject_id').value, 10);
@@ -0,0 +1,15 @@
+-- Hot-path indexes (same as models.py; `python -m app.migrations` applies them idempotently).
+USE srms_db;
+
+-- _get_teacher_subject: WHERE teacher_id = ?
+CREATE INDEX ix_subjects_teacher_id ON subjects (teacher_id);
+
+-- keyset listing of users by role, covering the listed columns
+CREATE INDEX ix_users_role_listing ON users (role, id, username, full_name);
+
+-- division / batch filters on listings, exports and analytics breakdowns
+CREATE INDEX ix_students_division_batch ON students (division_id, batch);
+
+-- per-student result join (covering) and per-subject analytics / toppers
+CREATE INDEX ix_marks_student_result ON marks (student_id, subject_id, marks, grade, grade_points);
+CREATE INDEX ix_marks_subject_marks ON marks (subject_id, marks);
@@ -0,0 +1,50 @@
+-- Term-scoped marks (same as models.py; `python -m app.migrations` applies this idempotently).
+USE srms_db;
+
+CREATE TABLE terms (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    code VARCHAR(32) NOT NULL,
+    name VARCHAR(128) NOT NULL,
+    is_current BOOL NOT NULL DEFAULT FALSE,
+    archived_at DATETIME NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY ix_terms_code (code)
+);
+INSERT INTO terms (code, name, is_current) VALUES ('T1', 'Term 1', TRUE);
+
+-- hot tier: existing marks become attempt 1 of the current term; one row per
+-- (student, term, subject). Leave out any DROP INDEX below for an index that
+-- SHOW INDEX FROM marks does not list (002 was never applied).
+ALTER TABLE marks
+    ADD COLUMN term_id INT NULL AFTER subject_id,
+    ADD COLUMN attempt INT NOT NULL DEFAULT 1 AFTER term_id;
+UPDATE marks SET term_id = (SELECT id FROM terms WHERE code = 'T1');
+ALTER TABLE marks
+    MODIFY term_id INT NOT NULL,
+    ADD CONSTRAINT fk_marks_term FOREIGN KEY (term_id) REFERENCES terms (id),
+    ADD CONSTRAINT uq_mark_per_term UNIQUE (student_id, term_id, subject_id),
+    DROP INDEX uq_mark_per_subject,
+    DROP INDEX ix_marks_student_result,
+    DROP INDEX ix_marks_subject_marks;
+
+-- per-student result join of the current term (covering) and per-subject
+-- analytics / toppers within a term
+CREATE INDEX ix_marks_student_term_result ON marks (student_id, term_id, subject_id, marks, grade, grade_points);
+CREATE INDEX ix_marks_term_subject_marks ON marks (term_id, subject_id, marks);
+
+-- archive tier: superseded attempts and the marks of archived terms, clustered
+-- by student for transcripts
+CREATE TABLE mark_archive (
+    student_id INT NOT NULL,
+    term_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    attempt INT NOT NULL,
+    marks INT NOT NULL,
+    grade VARCHAR(4) NOT NULL,
+    grade_points FLOAT NOT NULL,
+    created_by INT NOT NULL,
+    created_at DATETIME NULL,
+    superseded BOOL NOT NULL DEFAULT FALSE,
+    archived_at DATETIME NOT NULL,
+    PRIMARY KEY (student_id, term_id, subject_id, attempt)
+);
@@ -0,0 +1,5 @@
+-- Submission time of the mark in effect (same as models.py; `python -m app.migrations` applies this idempotently).
+USE srms_db;
+
+-- the write-behind queue skips entries submitted before the row's last write
+ALTER TABLE marks ADD COLUMN updated_at DATETIME(6) NULL;